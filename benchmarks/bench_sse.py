@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the server-sent events parser.
+
+Replays the recorded provider streams in benchmarks/data through
+src.providers.sse at several read sizes, reporting MB/s and events/s for
+parsing alone ("sse") and for parsing plus JSON decoding of every event
+("sse+json"). The previous ``iter_lines``-based decoding ("lines+json") is
+included as a reference point. "parse+<backend>" rows decode the events
+the way the providers do, with their stream parsers and each installed
+backend of src.providers.codec.
+
+Usage:
+    python benchmarks/bench_sse.py [--repeat N] [--read-size BYTES ...]
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import requests
+
+from src.providers import anthropic, codec, openai
+from src.providers.sse import ServerSentEvent, iter_sse_events
+
+DATA_DIR = Path(__file__).parent / "data"
+# Recording -> the stream parser of its provider
+RECORDINGS: Dict[str, Callable[[ServerSentEvent], Optional[str]]] = {
+    "openai_chat.sse": openai._parse_openai_event,
+    "anthropic_messages.sse": anthropic._parse_anthropic_event,
+}
+
+
+def chunked(payload: bytes, read_size: int) -> List[bytes]:
+    """Split a payload into network-sized reads."""
+    return [payload[i : i + read_size] for i in range(0, len(payload), read_size)]
+
+
+def parse_with_sse(payload: bytes, read_size: int) -> int:
+    """Parse the payload with the incremental SSE parser; return the event count."""
+    count = 0
+    for _ in iter_sse_events(chunked(payload, read_size)):
+        count += 1
+    return count
+
+
+def decode_with_sse(payload: bytes, read_size: int) -> int:
+    """Parse events and decode their JSON payloads, as the providers do."""
+    count = 0
+    for event in iter_sse_events(chunked(payload, read_size)):
+        if event.data != "[DONE]":
+            json.loads(event.data)
+        count += 1
+    return count
+
+
+def decode_with_codec(
+    backend: str, parse_event: Callable[[ServerSentEvent], Optional[str]]
+) -> Callable[[bytes, int], int]:
+    """
+    Return a parse decoding events as the providers do, with a JSON backend.
+
+    Raises:
+        ImportError: If the backend isn't installed
+    """
+    codec.use(backend)
+
+    def decode(payload: bytes, read_size: int) -> int:
+        # Selected for every run, as the other rows select other backends
+        codec.use(backend)
+        count = 0
+        for event in iter_sse_events(chunked(payload, read_size)):
+            if event.data != "[DONE]":
+                parse_event(event)
+            count += 1
+        return count
+
+    return decode
+
+
+def decode_with_iter_lines(payload: bytes, read_size: int) -> int:
+    """Decode the payload the way the providers did before the SSE parser."""
+    response = requests.Response()
+    response.raw = io.BytesIO(payload)
+    count = 0
+    for line in response.iter_lines(chunk_size=read_size):
+        if line:
+            line_str = line.decode("utf-8")
+            if line_str == "data: [DONE]":
+                count += 1
+            elif line_str.startswith("data: "):
+                json.loads(line_str[6:])
+                count += 1
+    return count
+
+
+def measure(
+    parse: Callable[[bytes, int], int], payload: bytes, read_size: int, rounds: int
+):
+    """Run the parse several times, returning (best seconds, events)."""
+    best = float("inf")
+    events = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        events = parse(payload, read_size)
+        best = min(best, time.perf_counter() - start)
+    return best, events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--repeat", type=int, default=50, help="times to replay each recording"
+    )
+    parser.add_argument(
+        "--read-size",
+        type=int,
+        nargs="+",
+        default=[512, 4096, 16384, 65536],
+        help="bytes per simulated network read",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="runs per measurement, best is kept"
+    )
+    args = parser.parse_args()
+
+    print(f"{'recording':<24} {'parser':<14} {'read':>7} {'MB/s':>9} {'events/s':>12}")
+    for name, parse_event in RECORDINGS.items():
+        payload = (DATA_DIR / name).read_bytes() * args.repeat
+        megabytes = len(payload) / 1e6
+        parsers = [
+            ("sse", parse_with_sse),
+            ("sse+json", decode_with_sse),
+            ("lines+json", decode_with_iter_lines),
+        ]
+        for backend in codec.BACKENDS:
+            try:
+                parsers.append(
+                    (f"parse+{backend}", decode_with_codec(backend, parse_event))
+                )
+            except ImportError:
+                continue
+        for read_size in args.read_size:
+            for label, parse in parsers:
+                seconds, events = measure(parse, payload, read_size, args.rounds)
+                print(
+                    f"{name:<24} {label:<14} {read_size:>7} "
+                    f"{megabytes / seconds:>9.1f} {events / seconds:>12,.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
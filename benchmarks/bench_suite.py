@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for lask's client-side hot paths.
+
+Runs lask against the local stand-in providers of benchmarks/mock_servers.py
+and reports:
+
+- sse.<format>: stream decoding throughput, SSE framing plus JSON decoding
+  of every event (MB/s)
+- decode.<backend>.<format>: JSON decoding alone, per installed JSON backend
+  of src.providers.codec (MB/s)
+- encode.<backend>: encoding the request body of a long REPL conversation
+  (µs/request)
+- overhead.<provider>: CPU time lask's calling thread spends per streamed
+  token, from building the request to the last delta (µs/token)
+- render.<mode>: cost of writing one delta through OutputSink, piped or to a
+  terminal (µs/chunk)
+- ttft.<provider>: time to first token beyond the server's own latency (ms)
+
+Each measurement keeps the best of several rounds. With --save-baseline the
+results are stored; later runs are compared against the baseline and every
+metric that got worse by more than the tolerance is flagged, with exit
+status 1. Baselines are machine-specific and only compared when recorded
+with the same stream profile; on noisy machines, raise --rounds before
+lowering --tolerance.
+
+Usage:
+    python benchmarks/bench_suite.py --save-baseline
+    python benchmarks/bench_suite.py [--rate 150 --jitter 0.01] [--tolerance 0.5]
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_servers import (
+    FakeBedrockClient,
+    ServerProcess,
+    StreamProfile,
+    anthropic_events,
+    openai_events,
+    response_texts,
+)
+from src.config import LaskConfig, ProviderConfig
+from src.output import OutputSink
+from src.providers import (
+    anthropic,
+    aws,
+    azure,
+    call_provider_api,
+    codec,
+    openai,
+    sse,
+)
+
+# Returns the text of one stream event
+ParseEvent = Callable[[sse.ServerSentEvent], Optional[str]]
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+PROVIDERS = ["openai", "azure", "anthropic", "aws"]
+
+
+class Metric(NamedTuple):
+    """One benchmark result."""
+
+    value: float
+    unit: str
+    # Throughputs improve upwards, costs and latencies downwards
+    higher_is_better: bool = False
+
+
+def best_of(rounds: int, run: Callable[[], float]) -> float:
+    """Run a measurement several times and keep the lowest result."""
+    return min(run() for _ in range(max(rounds, 1)))
+
+
+def _stream_formats(
+    profile: StreamProfile,
+) -> Dict[str, Tuple[List[Tuple[bytes, int]], ParseEvent]]:
+    """Each stream format's encoded events and the parser of its events."""
+    return {
+        "openai": (openai_events(profile), openai._parse_openai_event),
+        "azure": (openai_events(profile, azure=True), azure._parse_azure_event),
+        "anthropic": (anthropic_events(profile), anthropic._parse_anthropic_event),
+    }
+
+
+def measure_sse(profile: StreamProfile, rounds: int) -> Dict[str, Metric]:
+    """
+    Measure how fast each stream format is decoded into text deltas.
+
+    Args:
+        profile (StreamProfile): The response shape
+        rounds (int): Runs per measurement
+
+    Returns:
+        Dict[str, Metric]: MB/s per stream format
+    """
+    results = {}
+    for name, (events, parse) in _stream_formats(profile).items():
+        stream = b"".join(event for event, _ in events)
+        # Replay the stream until there is about a megabyte to decode
+        payload = stream * max(1, 1_000_000 // len(stream))
+        reads = [
+            payload[i : i + sse.DEFAULT_READ_SIZE]
+            for i in range(0, len(payload), sse.DEFAULT_READ_SIZE)
+        ]
+
+        def run() -> float:
+            start = time.perf_counter()
+            for event in sse.iter_sse_events(reads):
+                if event.data != "[DONE]":
+                    parse(event)
+            return time.perf_counter() - start
+
+        seconds = best_of(rounds, run)
+        results[f"sse.{name}"] = Metric(len(payload) / 1e6 / seconds, "MB/s", True)
+    return results
+
+
+class _Terminal(io.StringIO):
+    """A text stream that claims to be a terminal."""
+
+    def isatty(self) -> bool:
+        return True
+
+
+def measure_render(profile: StreamProfile, rounds: int) -> Dict[str, Metric]:
+    """
+    Measure the cost of writing deltas through OutputSink.
+
+    Args:
+        profile (StreamProfile): The response shape
+        rounds (int): Runs per measurement
+
+    Returns:
+        Dict[str, Metric]: µs per delta, piped and on a terminal
+    """
+    texts = response_texts(profile)
+    # Enough deltas for the clock to resolve the per-delta cost
+    texts = texts * max(1, 100_000 // max(len(texts), 1))
+    results = {}
+    for mode, stream_class in (("pipe", io.StringIO), ("tty", _Terminal)):
+
+        def run() -> float:
+            sink = OutputSink(stream_class())
+            start = time.perf_counter()
+            for text in texts:
+                sink.write(text)
+            sink.close()
+            return time.perf_counter() - start
+
+        seconds = best_of(rounds, run)
+        results[f"render.{mode}"] = Metric(seconds / len(texts) * 1e6, "µs/chunk")
+    return results
+
+
+def measure_codecs(profile: StreamProfile, rounds: int) -> Dict[str, Metric]:
+    """
+    Compare the installed JSON backends on the stream formats and a request.
+
+    The streams are split into events beforehand, so only JSON decoding is
+    measured. The request is a REPL conversation of 40 turns, as it's
+    encoded again for every new turn.
+
+    Args:
+        profile (StreamProfile): The response shape
+        rounds (int): Runs per measurement
+
+    Returns:
+        Dict[str, Metric]: MB/s per backend and stream format, and µs per
+                           request body per backend
+    """
+    streams = {}
+    for name, (events, parse) in _stream_formats(profile).items():
+        stream = b"".join(event for event, _ in events)
+        parsed = [
+            event for event in sse.iter_sse_events([stream]) if event.data != "[DONE]"
+        ]
+        # Replay the events until there is about a megabyte to decode
+        repeat = max(1, 1_000_000 // len(stream))
+        streams[name] = (parsed * repeat, len(stream) * repeat, parse)
+
+    answer = "".join(response_texts(profile))
+    request = {
+        "model": "gpt-4.1-mock",
+        "stream": True,
+        "messages": [
+            {"role": role, "content": answer if role == "assistant" else "Go on."}
+            for _ in range(20)
+            for role in ("user", "assistant")
+        ],
+    }
+
+    results = {}
+    selected = codec.codec()
+    try:
+        for backend in codec.BACKENDS:
+            try:
+                codec.use(backend)
+            except ImportError:
+                continue
+            for name, (events, size, parse) in streams.items():
+
+                def run() -> float:
+                    start = time.perf_counter()
+                    for event in events:
+                        parse(event)
+                    return time.perf_counter() - start
+
+                seconds = best_of(rounds, run)
+                results[f"decode.{backend}.{name}"] = Metric(
+                    size / 1e6 / seconds, "MB/s", True
+                )
+
+            def encode() -> float:
+                start = time.perf_counter()
+                for _ in range(100):
+                    codec.dumps(request)
+                return (time.perf_counter() - start) / 100
+
+            results[f"encode.{backend}"] = Metric(
+                best_of(rounds, encode) * 1e6, "µs/request"
+            )
+    finally:
+        codec.use(selected.name)
+    return results
+
+
+def _provider_calls(
+    server: ServerProcess, profile: StreamProfile
+) -> Dict[str, Callable[[], Iterator[str]]]:
+    """Return a function starting a streamed call, per provider."""
+    config = LaskConfig()
+    for provider in ("openai", "azure", "anthropic"):
+        config.providers[provider] = ProviderConfig(
+            api_key="bench", base_url=server.base_url(provider)
+        )
+    config.providers["azure"].deployment_id = "mock"
+    history = [{"role": "user", "content": "Write a long answer."}]
+    bedrock = FakeBedrockClient(profile)
+
+    def call(provider: str) -> Callable[[], Iterator[str]]:
+        if provider == "aws":
+            # boto3 is replaced by the stand-in client, so the Bedrock
+            # response handling is called directly
+            return lambda: aws.stream_aws_response(
+                bedrock,
+                "anthropic.claude-mock",
+                {"messages": history},
+                ProviderConfig(),
+            )
+        return lambda: call_provider_api(provider, config, "", list(history))
+
+    return {provider: call(provider) for provider in PROVIDERS}
+
+
+def measure_calls(profile: StreamProfile, rounds: int) -> Dict[str, Metric]:
+    """
+    Stream whole responses from the stand-in providers.
+
+    Args:
+        profile (StreamProfile): The response shape and pacing
+        rounds (int): Calls per provider, after one warm-up call
+
+    Returns:
+        Dict[str, Metric]: CPU µs per token and time to first token per provider
+    """
+    results = {}
+    with ServerProcess(profile) as server:
+        for provider, start_call in _provider_calls(server, profile).items():
+            cpu: List[float] = []
+            first_token: List[float] = []
+            # The warm-up call opens the pooled connection
+            for _ in range(max(rounds, 1) + 1):
+                start = time.perf_counter()
+                start_cpu = time.thread_time()
+                first: Optional[float] = None
+                for _chunk in start_call():
+                    if first is None:
+                        first = time.perf_counter() - start
+                cpu.append(time.thread_time() - start_cpu)
+                first_token.append(first if first is not None else float("inf"))
+            results[f"overhead.{provider}"] = Metric(
+                min(cpu[1:]) / max(profile.tokens, 1) * 1e6, "µs/token"
+            )
+            results[f"ttft.{provider}"] = Metric(
+                max(min(first_token[1:]) - profile.latency, 0) * 1e3, "ms"
+            )
+    return results
+
+
+def run_suite(profile: StreamProfile, rounds: int = 5) -> Dict[str, Metric]:
+    """
+    Run every benchmark.
+
+    Args:
+        profile (StreamProfile): The response shape and pacing
+        rounds (int): Runs per measurement
+
+    Returns:
+        Dict[str, Metric]: The results by metric name
+    """
+    results = measure_sse(profile, rounds)
+    results.update(measure_codecs(profile, rounds))
+    results.update(measure_render(profile, rounds))
+    results.update(measure_calls(profile, rounds))
+    return results
+
+
+def compare(
+    results: Dict[str, Metric], baseline: Dict[str, float], tolerance: float
+) -> Dict[str, float]:
+    """
+    Find the metrics that got worse than their baseline.
+
+    Args:
+        results (Dict[str, Metric]): This run's results
+        baseline (Dict[str, float]): Baseline values by metric name
+        tolerance (float): Allowed relative change, e.g. 0.25 for 25%
+
+    Returns:
+        Dict[str, float]: The relative change of each regressed metric
+    """
+    regressions = {}
+    for name, metric in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (metric.value - previous) / previous
+        worse = -change if metric.higher_is_better else change
+        if worse > tolerance:
+            regressions[name] = change
+    return regressions
+
+
+def load_baseline(path: Path, profile: StreamProfile) -> Optional[Dict[str, float]]:
+    """
+    Read a baseline recorded with the same stream profile.
+
+    Args:
+        path (Path): The baseline file
+        profile (StreamProfile): The profile of this run
+
+    Returns:
+        Optional[Dict[str, float]]: Baseline values, or None if there is no
+                                    comparable baseline
+    """
+    try:
+        stored = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read baseline {path}: {e}", file=sys.stderr)
+        return None
+    if stored.get("profile") != profile._asdict():
+        print(
+            f"Warning: Baseline {path} was recorded with a different profile, "
+            "not comparing",
+            file=sys.stderr,
+        )
+        return None
+    return stored.get("metrics", {})
+
+
+def save_baseline(
+    path: Path, profile: StreamProfile, results: Dict[str, Metric]
+) -> None:
+    """Write this run's results as the new baseline."""
+    stored = {
+        "profile": profile._asdict(),
+        "python": sys.version.split()[0],
+        "metrics": {name: metric.value for name, metric in results.items()},
+    }
+    path.write_text(json.dumps(stored, indent=2) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=500, help="tokens per response")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="tokens per second the servers generate (default: unthrottled)",
+    )
+    parser.add_argument(
+        "--chunk-tokens", type=int, default=1, help="tokens per stream event"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds before response headers"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="maximum random delay per event"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="runs per measurement, best is kept"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help=f"baseline file (default: {DEFAULT_BASELINE.name} next to this script)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="relative slowdown flagged as a regression (default: 0.5)",
+    )
+    args = parser.parse_args()
+
+    profile = StreamProfile(
+        tokens=args.tokens,
+        tokens_per_second=args.rate,
+        chunk_tokens=args.chunk_tokens,
+        latency=args.latency,
+        jitter=args.jitter,
+    )
+    results = run_suite(profile, args.rounds)
+    baseline = None if args.save_baseline else load_baseline(args.baseline, profile)
+    regressions = compare(results, baseline or {}, args.tolerance)
+
+    print(f"{'metric':<26} {'value':>10} {'unit':<10} {'baseline':>10} {'change':>8}")
+    for name, metric in results.items():
+        line = f"{name:<26} {metric.value:>10.2f} {metric.unit:<10}"
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += f" {previous:>10.2f} {(metric.value - previous) / previous:>+8.1%}"
+        if name in regressions:
+            line += "  REGRESSION"
+        print(line)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, profile, results)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif regressions:
+        print(
+            f"\n{len(regressions)} metric(s) regressed by more than "
+            f"{args.tolerance:.0%}: {', '.join(regressions)}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,630 @@
+"""
+Local stand-ins for the provider APIs, for benchmarks that must run offline.
+
+MockProviderServer answers on localhost in the streaming formats of the
+OpenAI, Azure OpenAI and Anthropic APIs, sending chunked HTTP responses
+paced like a real model. FakeBedrockClient replaces the boto3 Bedrock
+Runtime client with already-decoded event streams in the formats of the
+Bedrock model families.
+
+    profile = StreamProfile(tokens=500, tokens_per_second=200, latency=0.05)
+    with MockProviderServer(profile) as server:
+        config.providers["openai"].base_url = server.base_url("openai")
+        ...
+"""
+
+import io
+import json
+import multiprocessing
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Endpoint paths of the emulated APIs
+PATHS = {
+    "openai": "/v1/chat/completions",
+    "azure": "/openai/deployments/mock/chat/completions?api-version=2024-06-01",
+    "anthropic": "/v1/messages",
+}
+
+
+def _base_url(port: int, provider: str) -> str:
+    """The base_url setting that points a provider at a server on a port."""
+    # OpenAI's API root includes the version, as in the OpenAI SDKs
+    root = f"http://127.0.0.1:{port}"
+    return root + "/v1" if provider == "openai" else root
+
+
+# Words the generated responses are made of, one token each
+VOCABULARY = (
+    "the quick brown fox jumps over lazy dogs while streaming tokens arrive "
+    "from a model that writes one short word after another until done"
+).split()
+
+
+class StreamProfile(NamedTuple):
+    """How a mock provider generates its response."""
+
+    # Tokens in each response
+    tokens: int = 500
+    # Generation rate; 0 sends every chunk as fast as possible
+    tokens_per_second: float = 0.0
+    # Tokens per stream event
+    chunk_tokens: int = 1
+    # Seconds before the response headers are sent
+    latency: float = 0.0
+    # Up to this many seconds of random extra delay before the headers and
+    # each event
+    jitter: float = 0.0
+    # Seed for the jitter, so runs are repeatable
+    seed: int = 0
+
+
+def response_texts(profile: StreamProfile) -> List[str]:
+    """
+    Split a generated response into the text of each stream event.
+
+    Args:
+        profile (StreamProfile): The response shape
+
+    Returns:
+        List[str]: One string of chunk_tokens words per event
+    """
+    words = [
+        VOCABULARY[i % len(VOCABULARY)] + " " for i in range(max(profile.tokens, 0))
+    ]
+    size = max(profile.chunk_tokens, 1)
+    return ["".join(words[i : i + size]) for i in range(0, len(words), size)]
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    """Encode a JSON payload as one server-sent event."""
+    payload = json.dumps(data, separators=(",", ":"))
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n".encode()
+    return f"data: {payload}\n\n".encode()
+
+
+# Azure OpenAI annotates every chunk with its content filter results
+_CONTENT_FILTER_RESULTS = {
+    category: {"filtered": False, "severity": "safe"}
+    for category in ("hate", "self_harm", "sexual", "violence")
+}
+
+
+def _openai_chunk(
+    delta: Dict[str, Any], finish_reason: Optional[str] = None, azure: bool = False
+) -> Dict[str, Any]:
+    chunk: Dict[str, Any] = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": 1717000000,
+        "model": "gpt-4.1-mock",
+        "choices": [
+            {
+                "index": 0,
+                "delta": delta,
+                "logprobs": None,
+                "finish_reason": finish_reason,
+            }
+        ],
+    }
+    if azure and delta.get("content"):
+        chunk["choices"][0]["content_filter_results"] = _CONTENT_FILTER_RESULTS
+    return chunk
+
+
+def openai_events(
+    profile: StreamProfile, azure: bool = False
+) -> List[Tuple[bytes, int]]:
+    """
+    Build an OpenAI chat completions stream.
+
+    Args:
+        profile (StreamProfile): The response shape
+        azure (bool): Start with the content filter event Azure OpenAI sends
+
+    Returns:
+        List[Tuple[bytes, int]]: Each encoded event and the tokens it carries
+    """
+    events = []
+    if azure:
+        events.append(
+            _sse({"id": "", "choices": [], "prompt_filter_results": [{"index": 0}]})
+        )
+    events.append(_sse(_openai_chunk({"role": "assistant", "content": ""})))
+    paced = [(event, 0) for event in events]
+    paced += [
+        (_sse(_openai_chunk({"content": text}, azure=azure)), len(text.split()))
+        for text in response_texts(profile)
+    ]
+    paced.append((_sse(_openai_chunk({}, "stop")), 0))
+    paced.append((b"data: [DONE]\n\n", 0))
+    return paced
+
+
+def anthropic_messages(profile: StreamProfile) -> List[Dict[str, Any]]:
+    """
+    Build the events of an Anthropic Messages stream as decoded JSON.
+
+    Args:
+        profile (StreamProfile): The response shape
+
+    Returns:
+        List[Dict[str, Any]]: The event payloads, text deltas in the middle
+    """
+    messages: List[Dict[str, Any]] = [
+        {
+            "type": "message_start",
+            "message": {
+                "id": "msg_mock",
+                "type": "message",
+                "role": "assistant",
+                "content": [],
+                "model": "claude-mock",
+                "usage": {"input_tokens": 12, "output_tokens": 1},
+            },
+        },
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        },
+        {"type": "ping"},
+    ]
+    messages += [
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": text},
+        }
+        for text in response_texts(profile)
+    ]
+    messages += [
+        {"type": "content_block_stop", "index": 0},
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn"},
+            "usage": {"output_tokens": profile.tokens},
+        },
+        {"type": "message_stop"},
+    ]
+    return messages
+
+
+def anthropic_events(profile: StreamProfile) -> List[Tuple[bytes, int]]:
+    """
+    Build an Anthropic Messages stream.
+
+    Args:
+        profile (StreamProfile): The response shape
+
+    Returns:
+        List[Tuple[bytes, int]]: Each encoded event and the tokens it carries
+    """
+    return [
+        (_sse(message, message["type"]), _message_tokens(message))
+        for message in anthropic_messages(profile)
+    ]
+
+
+def _message_tokens(message: Dict[str, Any]) -> int:
+    """Count the tokens of text in an Anthropic stream event."""
+    if message["type"] != "content_block_delta":
+        return 0
+    return len(message["delta"]["text"].split())
+
+
+def bedrock_chunks(model_id: str, profile: StreamProfile) -> List[Dict[str, Any]]:
+    """
+    Build the chunks of a Bedrock InvokeModelWithResponseStream stream.
+
+    Args:
+        model_id (str): The model, whose vendor prefix selects the format
+        profile (StreamProfile): The response shape
+
+    Returns:
+        List[Dict[str, Any]]: The decoded chunk payloads
+    """
+    texts = response_texts(profile)
+    vendor = model_id.split(".")[0]
+    if vendor == "anthropic":
+        return anthropic_messages(profile)
+    if vendor == "amazon":
+        return [{"outputText": text, "index": 0} for text in texts] + [
+            {"outputText": "", "index": 0, "completionReason": "FINISH"}
+        ]
+    if vendor == "meta":
+        return [{"generation": text, "stop_reason": None} for text in texts] + [
+            {
+                "generation": "",
+                "stop_reason": "stop",
+                # Bedrock adds this to the last chunk of every family
+                "amazon-bedrock-invocationMetrics": {
+                    "inputTokenCount": 12,
+                    "outputTokenCount": profile.tokens,
+                    "invocationLatency": 250,
+                    "firstByteLatency": 40,
+                },
+            }
+        ]
+    if vendor == "mistral":
+        return [{"outputs": [{"text": text, "stop_reason": None}]} for text in texts]
+    if vendor == "cohere":
+        # The last chunk repeats the whole text
+        return [{"text": text, "is_finished": False} for text in texts] + [
+            {
+                "is_finished": True,
+                "finish_reason": "COMPLETE",
+                "generations": [{"text": "".join(texts)}],
+            }
+        ]
+    raise ValueError(f"No stream format for {model_id}")
+
+
+def converse_events(profile: StreamProfile) -> List[Dict[str, Any]]:
+    """
+    Build the events of a Bedrock ConverseStream stream.
+
+    Args:
+        profile (StreamProfile): The response shape
+
+    Returns:
+        List[Dict[str, Any]]: The events, ending with the usage metadata
+    """
+    events: List[Dict[str, Any]] = [{"messageStart": {"role": "assistant"}}]
+    events += [
+        {"contentBlockDelta": {"delta": {"text": text}, "contentBlockIndex": 0}}
+        for text in response_texts(profile)
+    ]
+    events += [
+        {"contentBlockStop": {"contentBlockIndex": 0}},
+        {"messageStop": {"stopReason": "end_turn"}},
+        {"metadata": _converse_metadata(profile)},
+    ]
+    return events
+
+
+def _converse_metadata(profile: StreamProfile) -> Dict[str, Any]:
+    """The usage and metrics Converse reports for a response."""
+    return {
+        "usage": {
+            "inputTokens": 12,
+            "outputTokens": profile.tokens,
+            "totalTokens": 12 + profile.tokens,
+        },
+        "metrics": {"latencyMs": 250},
+    }
+
+
+def _chunk_tokens(chunk: Dict[str, Any]) -> int:
+    """Count the tokens of text in a Bedrock stream chunk."""
+    if "type" in chunk:
+        return _message_tokens(chunk)
+    if chunk.get("is_finished"):
+        return 0
+    text = chunk.get("outputText", chunk.get("generation", chunk.get("text", "")))
+    if "outputs" in chunk:
+        text = chunk["outputs"][0]["text"]
+    elif "contentBlockDelta" in chunk:
+        text = chunk["contentBlockDelta"]["delta"]["text"]
+    return len(text.split())
+
+
+def _full_response(provider: str, profile: StreamProfile) -> Dict[str, Any]:
+    """The body of a non-streaming response."""
+    text = "".join(response_texts(profile))
+    if provider == "anthropic":
+        return {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": 12, "output_tokens": profile.tokens},
+        }
+    if provider == "amazon":
+        return {"results": [{"outputText": text, "completionReason": "FINISH"}]}
+    if provider == "meta":
+        return {"generation": text, "stop_reason": "stop"}
+    if provider == "mistral":
+        return {"outputs": [{"text": text, "stop_reason": "stop"}]}
+    if provider == "cohere":
+        return {"generations": [{"text": text, "finish_reason": "COMPLETE"}]}
+    return {
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]
+    }
+
+
+class _Pacer:
+    """Spaces out events to match a profile's token rate and jitter."""
+
+    def __init__(self, profile: StreamProfile) -> None:
+        self.profile = profile
+        self.random = random.Random(profile.seed)
+        self.start = time.perf_counter()
+        self.tokens = 0
+
+    def delay(self) -> float:
+        """Random extra delay, up to the profile's jitter."""
+        return self.random.uniform(0, self.profile.jitter) if self.profile.jitter else 0
+
+    def wait_for_headers(self) -> None:
+        """Sleep until the response headers are due, counting from creation."""
+        due = self.start + self.profile.latency + self.delay()
+        time.sleep(max(due - time.perf_counter(), 0))
+        self.start = time.perf_counter()
+
+    def wait_for_event(self, tokens: int) -> None:
+        """Sleep until an event carrying this many tokens is due."""
+        jitter = self.delay()
+        if self.profile.tokens_per_second > 0:
+            # Scheduled from the start, so sleep overshoot doesn't accumulate
+            self.tokens += tokens
+            due = self.start + self.tokens / self.profile.tokens_per_second
+            jitter += due - time.perf_counter()
+        if jitter > 0:
+            time.sleep(jitter)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send each event at once, like real streaming servers (TCP_NODELAY)
+    disable_nagle_algorithm = True
+    server: "MockProviderServer"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        provider = _provider_for_path(self.path)
+        if provider is None:
+            self.send_error(404)
+            return
+        profile = self.server.profile
+        pacer = _Pacer(profile)
+        streaming = bool(request.get("stream"))
+        response = self.server.response(provider, streaming)
+        pacer.wait_for_headers()
+
+        if not streaming:
+            ((body, _),) = response
+            pacer.wait_for_event(profile.tokens)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event, tokens in response:
+            if tokens:
+                pacer.wait_for_event(tokens)
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _provider_for_path(path: str) -> Optional[str]:
+    """Tell which API a request path belongs to."""
+    if path.startswith("/openai/deployments/"):
+        return "azure"
+    if path.startswith("/v1/chat/completions"):
+        return "openai"
+    if path.startswith("/v1/messages"):
+        return "anthropic"
+    return None
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """A localhost HTTP server speaking the OpenAI, Azure and Anthropic APIs."""
+
+    daemon_threads = True
+
+    def __init__(self, profile: StreamProfile = StreamProfile()) -> None:
+        """
+        Args:
+            profile (StreamProfile): How responses are generated; may be
+                                     replaced between requests
+        """
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.profile = profile
+        self._thread: Optional[threading.Thread] = None
+        self._responses: Dict[Tuple[str, bool, StreamProfile], Any] = {}
+
+    def response(self, provider: str, streaming: bool) -> List[Tuple[bytes, int]]:
+        """
+        Return the encoded response for the current profile.
+
+        Responses are encoded once per profile, so the stand-in's own work
+        doesn't count towards the latency lask sees.
+
+        Args:
+            provider (str): "openai", "azure" or "anthropic"
+            streaming (bool): Whether the request asked for a stream
+
+        Returns:
+            List[Tuple[bytes, int]]: Each stream event and the tokens it
+                                     carries; a single entry with the whole
+                                     body when not streaming
+        """
+        key = (provider, streaming, self.profile)
+        if key not in self._responses:
+            if not streaming:
+                body = json.dumps(_full_response(provider, self.profile)).encode()
+                self._responses[key] = [(body, self.profile.tokens)]
+            elif provider == "anthropic":
+                self._responses[key] = anthropic_events(self.profile)
+            else:
+                self._responses[key] = openai_events(
+                    self.profile, azure=provider == "azure"
+                )
+        return self._responses[key]
+
+    def url(self, provider: str) -> str:
+        """
+        Return the endpoint a provider's requests should be sent to.
+
+        Args:
+            provider (str): "openai", "azure" or "anthropic"
+
+        Returns:
+            str: The endpoint URL on this server
+        """
+        return f"http://127.0.0.1:{self.server_port}{PATHS[provider]}"
+
+    def base_url(self, provider: str) -> str:
+        """
+        Return the base_url setting that sends a provider's requests here.
+
+        Args:
+            provider (str): "openai", "azure" or "anthropic"
+
+        Returns:
+            str: The API root on this server
+        """
+        return _base_url(self.server_port, provider)
+
+    def __enter__(self) -> "MockProviderServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _serve(profile: StreamProfile, connection) -> None:
+    """Run a server in a child process, reporting its port to the parent."""
+    server = MockProviderServer(profile)
+    connection.send(server.server_port)
+    server.serve_forever(poll_interval=0.05)
+
+
+class ServerProcess:
+    """
+    Runs a MockProviderServer in a child process.
+
+    Wall-clock measurements are steadier this way, as the server doesn't
+    compete with the client for the interpreter lock.
+    """
+
+    def __init__(self, profile: StreamProfile = StreamProfile()) -> None:
+        """
+        Args:
+            profile (StreamProfile): How responses are generated
+        """
+        self.profile = profile
+        self.port = 0
+        self._process: Optional[multiprocessing.Process] = None
+
+    def url(self, provider: str) -> str:
+        """Return the endpoint a provider's requests should be sent to."""
+        return f"http://127.0.0.1:{self.port}{PATHS[provider]}"
+
+    def base_url(self, provider: str) -> str:
+        """Return the base_url setting that sends a provider's requests here."""
+        return _base_url(self.port, provider)
+
+    def __enter__(self) -> "ServerProcess":
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self.profile, child), daemon=True
+        )
+        self._process.start()
+        self.port = parent.recv()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+
+class FakeBedrockClient:
+    """
+    Stands in for a boto3 bedrock-runtime client.
+
+    Streams are returned as botocore hands them to lask: an iterable of
+    already-decoded ``{"chunk": {"bytes": ...}}`` events, so the binary
+    event stream framing itself is not part of the measurement. The model
+    ID's vendor prefix selects the format, as in bedrock_chunks.
+    """
+
+    def __init__(self, profile: StreamProfile = StreamProfile()) -> None:
+        """
+        Args:
+            profile (StreamProfile): How responses are generated
+        """
+        self.profile = profile
+        # Model ID -> encoded chunks, so the stand-in's own work isn't
+        # measured with lask's
+        self._events: Dict[str, List[Tuple[bytes, int]]] = {}
+        # The request bodies lask sent, decoded
+        self.bodies: List[Dict[str, Any]] = []
+
+    def events(self, model_id: str) -> List[Tuple[bytes, int]]:
+        """Each encoded chunk of a model's stream and the tokens it carries."""
+        if model_id not in self._events:
+            self._events[model_id] = [
+                (json.dumps(chunk).encode(), _chunk_tokens(chunk))
+                for chunk in bedrock_chunks(model_id, self.profile)
+            ]
+        return self._events[model_id]
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str):
+        self.bodies.append(json.loads(body))
+        events = self.events(modelId)
+        pacer = _Pacer(self.profile)
+        pacer.wait_for_headers()
+        return {"body": self._stream(pacer, events)}
+
+    def _stream(
+        self, pacer: _Pacer, events: List[Tuple[bytes, int]]
+    ) -> Iterator[Dict[str, Any]]:
+        for data, tokens in events:
+            if tokens:
+                pacer.wait_for_event(tokens)
+            yield {"chunk": {"bytes": data}}
+
+    def converse_stream(self, modelId: str, **request: Any):
+        self.bodies.append(request)
+        pacer = _Pacer(self.profile)
+        pacer.wait_for_headers()
+        return {"stream": self._converse_stream(pacer)}
+
+    def _converse_stream(self, pacer: _Pacer) -> Iterator[Dict[str, Any]]:
+        # botocore hands over the events decoded
+        for event in converse_events(self.profile):
+            tokens = _chunk_tokens(event)
+            if tokens:
+                pacer.wait_for_event(tokens)
+            yield event
+
+    def converse(self, modelId: str, **request: Any):
+        self.bodies.append(request)
+        pacer = _Pacer(self.profile)
+        pacer.wait_for_headers()
+        pacer.wait_for_event(self.profile.tokens)
+        text = "".join(response_texts(self.profile))
+        return dict(
+            _converse_metadata(self.profile),
+            output={"message": {"role": "assistant", "content": [{"text": text}]}},
+            stopReason="end_turn",
+        )
+
+    def invoke_model(self, modelId: str, body: str):
+        self.bodies.append(json.loads(body))
+        pacer = _Pacer(self.profile)
+        pacer.wait_for_headers()
+        pacer.wait_for_event(self.profile.tokens)
+        response = _full_response(modelId.split(".")[0], self.profile)
+        return {"body": io.BytesIO(json.dumps(response).encode())}
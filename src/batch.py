@@ -0,0 +1,266 @@
+"""
+Batch mode for lask: run every prompt of a JSONL file through the provider.
+
+Each input line is a JSON object with a "prompt" (or a full "messages" list)
+and optionally an "id" and a "provider". Rows are sent on a bounded worker
+pool and results are written as JSON lines, either in input order or as they
+complete. The IDs of finished rows are appended to a checkpoint file, so an
+interrupted run can be started again and only the remaining rows are sent.
+Each provider's configuration is checked before its first row is sent, so a
+missing key stops the run instead of failing every row.
+"""
+
+import contextlib
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from src import providers
+from src.config import LaskConfig
+from src.providers import prompt_cache, registry, resolve_messages
+from src.providers.transport import DEFAULT_POOL_SIZE
+from src.race import hedge_stats, hedged_call
+
+DEFAULT_CONCURRENCY = 4
+# Rows read ahead of the workers, as a multiple of the concurrency
+WINDOW_FACTOR = 4
+
+
+def load_checkpoint(path: Path) -> Set[str]:
+    """
+    Read the IDs of rows completed by previous runs.
+
+    Args:
+        path (Path): The checkpoint file
+
+    Returns:
+        Set[str]: Completed row IDs
+    """
+    if not path.exists():
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def read_rows(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Lazily read the rows of a JSONL prompt file.
+
+    Rows without an "id" get their line number as ID.
+
+    Args:
+        path (Path): The input file
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: The row index and the row
+
+    Raises:
+        ValueError: If a line isn't valid JSON, isn't an object or string, or
+                    has neither prompt nor messages
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        index = 0
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+            if isinstance(row, str):
+                row = {"prompt": row}
+            if not isinstance(row, dict):
+                raise ValueError(f"{path}:{line_number}: expected an object or string")
+            if "prompt" not in row and "messages" not in row:
+                raise ValueError(f"{path}:{line_number}: needs 'prompt' or 'messages'")
+            row["id"] = str(row.get("id", line_number))
+            yield index, row
+            index += 1
+
+
+def check_provider(config: LaskConfig, provider: str) -> None:
+    """
+    Make sure a provider can be called before any row is sent to it.
+
+    Loads the provider's module and builds its request template, which is
+    then cached for the workers.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): A provider or named instance
+
+    Raises:
+        ImportError: If no module handles the provider
+        ValueError: If the provider's configuration is incomplete
+    """
+    module = providers.get_provider_module(provider, config)
+    get_template = getattr(module, "get_template", None)
+    if get_template is not None:
+        get_template(config, **registry.call_kwargs(provider, config))
+
+
+def run_row(config: LaskConfig, row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send one row to its provider and collect the full response.
+
+    Args:
+        config (LaskConfig): Configuration object
+        row (Dict[str, Any]): The input row
+
+    Returns:
+        Dict[str, Any]: The output record with either "response" or "error"
+    """
+    provider = row.get("provider") or config.get("provider", "openai").lower()
+    prompt = row.get("prompt", "")
+    record: Dict[str, Any] = {"id": row["id"], "provider": provider}
+    try:
+        # Always pass a message list so providers don't echo the prompt
+        messages = row.get("messages") or resolve_messages(config, provider, prompt)
+        record["provider"], result = hedged_call(provider, config, prompt, messages)
+        record["response"] = result if isinstance(result, str) else "".join(result)
+    except Exception as e:
+        # In a batch an error only fails this row
+        record["error"] = str(e) or type(e).__name__
+    return record
+
+
+def run_batch(
+    config: LaskConfig,
+    input_path: Path,
+    output: TextIO,
+    checkpoint_path: Path,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+) -> Tuple[int, int]:
+    """
+    Run all rows of a prompt file that aren't in the checkpoint yet.
+
+    Args:
+        config (LaskConfig): Configuration object
+        input_path (Path): JSONL file with the prompts
+        output (TextIO): Where to write the JSONL results
+        checkpoint_path (Path): File recording the IDs of completed rows
+        concurrency (int): Maximum number of requests in flight
+        ordered (bool): Write results in input order instead of completion order
+
+    Returns:
+        Tuple[int, int]: Number of rows completed and number of rows failed
+
+    Raises:
+        ImportError: If a row names a provider no module handles
+        ValueError: If the input is invalid or a provider isn't configured
+    """
+    completed_ids = load_checkpoint(checkpoint_path)
+    # Providers (and their hedges) whose configuration has been checked
+    checked: Set[str] = set()
+
+    # Make sure the shared connection pools can hold every worker's connection
+    for provider_config in config.providers.values():
+        if (provider_config.pool_size or DEFAULT_POOL_SIZE) < concurrency:
+            provider_config.pool_size = concurrency
+
+    succeeded = 0
+    failed = 0
+
+    # Results waiting for earlier rows when writing in input order
+    pending_results: Dict[int, Optional[Dict[str, Any]]] = {}
+    next_index = 0
+
+    # Anything printed while the batch runs goes to stderr, so results written
+    # to stdout stay valid JSONL
+    with (
+        open(checkpoint_path, "a", encoding="utf-8") as checkpoint,
+        contextlib.redirect_stdout(sys.stderr),
+    ):
+
+        def write_record(record: Dict[str, Any]) -> None:
+            nonlocal succeeded, failed
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            if "error" in record:
+                failed += 1
+            else:
+                # Only checkpoint after the result is safely written
+                checkpoint.write(record["id"] + "\n")
+                checkpoint.flush()
+                succeeded += 1
+            print(
+                f"\r[batch] {succeeded} done, {failed} failed",
+                end="",
+                file=sys.stderr,
+                flush=True,
+            )
+
+        def collect(index: int, record: Optional[Dict[str, Any]]) -> None:
+            nonlocal next_index
+            if not ordered:
+                if record is not None:
+                    write_record(record)
+                return
+            pending_results[index] = record
+            while next_index in pending_results:
+                ready = pending_results.pop(next_index)
+                if ready is not None:
+                    write_record(ready)
+                next_index += 1
+
+        in_flight: Dict[Future, int] = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+            def drain(block_until_one: bool) -> None:
+                done, _ = wait(
+                    list(in_flight),
+                    timeout=None if block_until_one else 0,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    collect(in_flight.pop(future), future.result())
+
+            try:
+                for index, row in read_rows(input_path):
+                    if row["id"] in completed_ids:
+                        # Finished in an earlier run; keeps ordering intact
+                        collect(index, None)
+                        continue
+                    # Bound the rows held in memory, including finished rows that
+                    # wait for a slower earlier row when writing in input order
+                    while in_flight and (
+                        len(in_flight) + len(pending_results)
+                        >= concurrency * WINDOW_FACTOR
+                    ):
+                        drain(block_until_one=True)
+                    provider = (
+                        row.get("provider") or config.get("provider", "openai").lower()
+                    )
+                    if provider not in checked:
+                        provider_config = config.get_provider_config(provider)
+                        hedge = provider_config.get(
+                            "hedge_provider", config.hedge_provider
+                        )
+                        for name in filter(None, (provider, hedge)):
+                            check_provider(config, name)
+                        checked.add(provider)
+                    in_flight[executor.submit(run_row, config, row)] = index
+                    drain(block_until_one=False)
+
+                while in_flight:
+                    drain(block_until_one=True)
+            except BaseException:
+                # Don't start queued rows; completed ones are already checkpointed
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    print(file=sys.stderr)
+    stats = hedge_stats()
+    if stats["hedged"]:
+        print(
+            f"[batch] {stats['hedged']} of {stats['requests']} requests hedged, "
+            f"{stats['hedge_won']} answered by the hedge",
+            file=sys.stderr,
+        )
+    usage = prompt_cache.usage_stats()["total"]
+    if usage["cache_read_input_tokens"] or usage["cache_creation_input_tokens"]:
+        print(f"[batch] {prompt_cache.format_usage(usage)}", file=sys.stderr)
+    return succeeded, failed
@@ -0,0 +1,265 @@
+"""
+On-disk response cache for lask.
+
+Responses are stored content-addressed: the key is a SHA-256 over the provider,
+model, sampling parameters and the fully resolved message list, so identical
+prompts map to the same entry no matter which process asks. Entries are
+zlib-compressed JSON files written atomically, which lets several lask
+processes share one cache directory. Eviction removes expired entries and
+then the least recently used ones until the directory fits its size budget.
+It scans every entry, so writers keep a running estimate of the cache's size
+in a small file and only evict once the estimate exceeds the budget.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.config import LaskConfig, default_cache_dir
+from src.locking import file_lock
+
+# Defaults used when the [default] section doesn't override them
+DEFAULT_MAX_SIZE_MB = 100
+DEFAULT_TTL = 7 * 24 * 3600
+
+ENTRY_SUFFIX = ".json.z"
+# Holds the estimated total size of all entries in bytes
+SIZE_FILE = ".size"
+
+
+def make_key(
+    provider: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    messages: List[Dict[str, str]],
+) -> str:
+    """
+    Compute the cache key for a request.
+
+    Args:
+        provider (str): The provider name
+        model (Optional[str]): The model (or model id / deployment) used
+        temperature (Optional[float]): Sampling temperature
+        max_tokens (Optional[int]): Maximum tokens to generate
+        messages (List[Dict[str, str]]): The fully resolved message list
+
+    Returns:
+        str: A hex digest identifying the request
+    """
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": [
+                {"role": m["role"], "content": m["content"]} for m in messages
+            ],
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """A size-bounded, TTL-expiring cache of provider responses."""
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        ttl: float = DEFAULT_TTL,
+    ) -> None:
+        """
+        Args:
+            directory (Optional[Path]): Cache directory, defaults to ~/.cache/lask/responses
+            max_size_mb (float): Size budget for all entries in megabytes
+            ttl (float): Seconds an entry stays valid after it was written
+        """
+        self.directory = directory or default_cache_dir() / "responses"
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.ttl = ttl
+
+    @classmethod
+    def from_config(cls, config: LaskConfig) -> "ResponseCache":
+        """
+        Create a cache using the settings from the [default] section.
+
+        Args:
+            config (LaskConfig): Configuration object
+
+        Returns:
+            ResponseCache: The configured cache
+        """
+        return cls(
+            directory=Path(config.cache_dir).expanduser() if config.cache_dir else None,
+            max_size_mb=config.cache_max_size or DEFAULT_MAX_SIZE_MB,
+            ttl=config.cache_ttl or DEFAULT_TTL,
+        )
+
+    def _path(self, key: str) -> Path:
+        """Return the entry path for a key, sharded by its first two hex digits."""
+        return self.directory / key[:2] / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            Optional[List[str]]: The recorded response chunks, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry: Dict[str, Any] = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error):
+            # Unreadable or corrupt entry; drop it and treat as a miss
+            self._remove(path)
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+
+        # Record the access for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("chunks", [])
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        """
+        Store a response and evict old entries if the cache may be over budget.
+
+        Args:
+            key (str): The cache key
+            chunks (List[str]): The response chunks in order
+        """
+        path = self._path(key)
+        data = zlib.compress(
+            json.dumps(
+                {"created": time.time(), "chunks": chunks}, ensure_ascii=False
+            ).encode("utf-8")
+        )
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            # Write to a temporary file and rename it into place so readers in
+            # other processes never see a partially written entry
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_name, path)
+            except BaseException:
+                self._remove(Path(tmp_name))
+                raise
+            with file_lock(self.directory / ".lock"):
+                size = self._read_size()
+                if size is None or size + len(data) - replaced > self.max_size:
+                    self._evict()
+                else:
+                    self._write_size(size + len(data) - replaced)
+        except OSError as e:
+            print(f"Warning: Could not write response cache: {e}")
+
+    def _read_size(self) -> Optional[int]:
+        """Read the size estimate; None if there is none yet."""
+        try:
+            return int((self.directory / SIZE_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_size(self, size: int) -> None:
+        """Record the size estimate; the caller holds the lock."""
+        (self.directory / SIZE_FILE).write_text(str(size))
+
+    def evict(self) -> None:
+        """Remove expired entries, then least recently used ones until under budget."""
+        with file_lock(self.directory / ".lock"):
+            self._evict()
+
+    def _evict(self) -> None:
+        """Scan and evict entries and reset the size estimate; the caller holds the lock."""
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*/*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            # mtime is refreshed on every hit, so it doubles as last access time
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                self._remove(path)
+                total -= size
+                if total <= self.max_size:
+                    break
+        self._write_size(total)
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        """Delete a file, ignoring races with other processes."""
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def replay(chunks: List[str]) -> Iterator[str]:
+    """
+    Replay cached chunks through the streaming Iterator[str] contract.
+
+    Args:
+        chunks (List[str]): The recorded chunks
+
+    Yields:
+        str: Each chunk in order
+    """
+    yield from chunks
+
+
+def record(iterator: Iterator[str], cache: ResponseCache, key: str) -> Iterator[str]:
+    """
+    Pass a response stream through, storing it once it has completed.
+
+    Interrupted streams are not cached.
+
+    Args:
+        iterator (Iterator[str]): The provider's response stream
+        cache (ResponseCache): Cache to store the response in
+        key (str): The cache key
+
+    Yields:
+        str: Each chunk from the provider
+    """
+    chunks: List[str] = []
+    for chunk in iterator:
+        chunks.append(chunk)
+        yield chunk
+    cache.put(key, chunks)
@@ -2,10 +2,72 @@
 Configuration handling for lask.
 """
 
-from dataclasses import dataclass, field
+import json
+import os
+import zlib
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from typing import Dict, Any, Optional, ClassVar, List
-import configparser
+from typing import Dict, Any, Optional, ClassVar, List, Callable, TypeVar
+
+# Settings that need type conversion when read from the config file
+FLOAT_FIELDS = {
+    "temperature",
+    "timeout",
+    "connect_timeout",
+    "cache_max_size",
+    "cache_ttl",
+    "hedge_delay",
+    "retry_base_delay",
+    "retry_max_delay",
+}
+INT_FIELDS = {
+    "max_tokens",
+    "pool_size",
+    "max_retries",
+    "read_size",
+    "context_budget",
+    "rpm",
+    "tpm",
+}
+BOOL_FIELDS = {"streaming", "cache", "prompt_cache", "sessions", "stats"}
+
+# Bump when the meaning of a snapshot changes without the fields changing
+SNAPSHOT_VERSION = 2
+
+T = TypeVar("T")
+
+
+def default_cache_dir() -> Path:
+    """Return the platform cache directory for lask."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "lask"
+
+
+def convert_value(key: str, value: str) -> Any:
+    """
+    Convert a raw config file value to the type of the setting it belongs to.
+
+    Args:
+        key (str): The setting name
+        value (str): The raw value from the config file
+
+    Returns:
+        Any: The converted value; empty and untyped values are returned unchanged
+
+    Raises:
+        ValueError: If the value can't be converted
+    """
+    if not value:
+        return value
+    if key in FLOAT_FIELDS:
+        return float(value)
+    if key in INT_FIELDS:
+        return int(value)
+    if key in BOOL_FIELDS:
+        return value.lower() == "true"
+    return value
 
 
 @dataclass
@@ -19,16 +81,53 @@ class ProviderConfig:
     streaming: bool = True
     system_prompt: Optional[str] = None
 
+    # Named instances: the provider this section configures, e.g. "openai" for
+    # an OpenAI-compatible server in a [vllm] section
+    type: Optional[str] = None
+    # API root replacing the provider's public endpoint, e.g. http://10.0.0.5:8000/v1
+    base_url: Optional[str] = None
+
     # Provider-specific settings
     # AWS Bedrock specific
     model_id: Optional[str] = None
     region: Optional[str] = None
+    profile: Optional[str] = None  # Named profile from ~/.aws/config
+    endpoint_url: Optional[str] = None  # e.g. a VPC endpoint
+    # "converse" or "invoke_model"; defaults to InvokeModel for the model
+    # families lask knows the formats of, Converse for all others
+    bedrock_api: Optional[str] = None
+
+    # Anthropic models (Anthropic API and Bedrock): cache the stable prompt prefix
+    prompt_cache: Optional[bool] = None
 
     # Azure OpenAI specific
     resource_name: Optional[str] = None
     deployment_id: Optional[str] = None
     api_version: Optional[str] = None
 
+    # HTTP transport settings (requests-based providers)
+    timeout: Optional[float] = None
+    connect_timeout: Optional[float] = None
+    pool_size: Optional[int] = None
+    read_size: Optional[int] = None
+
+    # Retries of rate-limited and failed requests (all providers)
+    max_retries: Optional[int] = None
+    retry_base_delay: Optional[float] = None
+    retry_max_delay: Optional[float] = None
+
+    # Client-side rate limits shared by all lask processes (per provider and model)
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+
+    # Hedging: override the [default] settings for this provider
+    hedge_delay: Optional[float] = None
+    hedge_provider: Optional[str] = None
+
+    # REPL context window: override the [default] settings for this provider
+    context_budget: Optional[int] = None
+    context_strategy: Optional[str] = None
+
     def __getitem__(self, key: str) -> Any:
         """Allow dictionary-like access to attributes."""
         return getattr(self, key) if hasattr(self, key) else None
@@ -50,6 +149,34 @@ class LaskConfig:
     # Default system prompt
     system_prompt: Optional[str] = None
 
+    # Response cache settings
+    cache: bool = False
+    cache_dir: Optional[str] = None
+    cache_max_size: Optional[float] = None  # megabytes
+    cache_ttl: Optional[float] = None  # seconds
+
+    # Hedged requests: send a duplicate if no first chunk arrives in time
+    hedge_delay: Optional[float] = None  # seconds, unset disables hedging
+    hedge_provider: Optional[str] = None  # defaults to the same provider
+
+    # REPL context window: oldest turns are evicted to stay within the budget
+    context_budget: Optional[int] = None  # tokens, defaults to a per-model budget
+    context_strategy: Optional[str] = None  # "drop" (default) or "summarize"
+
+    # REPL sessions saved for --resume and --search
+    sessions: bool = True
+    session_db: Optional[str] = None  # defaults to ~/.local/share/lask/sessions.db
+
+    # Print per-request timings after every response, like --stats
+    stats: bool = False
+    # Append an OpenTelemetry span per provider call to this file, like --trace-file
+    trace_file: Optional[str] = None
+
+    # Per-process cache of resolved provider request templates
+    _templates: Dict[str, Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
     # Class constants
     CONFIG_PATH: ClassVar[Path] = Path.home() / ".lask-config"
     SUPPORTED_PROVIDERS: ClassVar[List[str]] = ["openai", "anthropic", "aws", "azure"]
@@ -70,41 +197,44 @@ class LaskConfig:
         config = cls()
 
         if cls.CONFIG_PATH.exists():
+            # Reuse the parsed result of an earlier run if the file hasn't changed
+            try:
+                raw = cls.CONFIG_PATH.read_bytes()
+                snapshot_key = cls._snapshot_key(raw)
+            except OSError:
+                raw, snapshot_key = b"", None
+            snapshot = cls._load_snapshot(snapshot_key) if snapshot_key else None
+            if snapshot is not None:
+                return snapshot
+
+            # Imported here so runs served from the snapshot don't pay for it
+            import configparser
+
             try:
                 parser = configparser.ConfigParser()
-                parser.read(cls.CONFIG_PATH)
+                parser.read_string(raw.decode("utf-8"), str(cls.CONFIG_PATH))
 
                 # Load default section
                 if "default" in parser:
                     for key, value in parser["default"].items():
                         if hasattr(config, key):
                             # Handle type conversion for specific fields
-                            if key in ["system_prompt"]:
-                                setattr(config, key, value)
-                            else:
-                                setattr(config, key, value)
+                            setattr(config, key, convert_value(key, value))
 
-                # Load provider-specific sections
+                # Load provider sections: built-in providers, named instances
+                # and providers added by plugins
                 for section in parser.sections():
-                    if section != "default" and section in cls.SUPPORTED_PROVIDERS:
+                    if section != "default":
                         provider_config = ProviderConfig()
                         for key, value in parser[section].items():
                             if hasattr(provider_config, key):
                                 # Convert types as needed
-                                if key == "temperature" and value:
-                                    setattr(provider_config, key, float(value))
-                                elif key == "max_tokens" and value:
-                                    setattr(provider_config, key, int(value))
-                                elif key == "streaming" and value:
-                                    setattr(
-                                        provider_config, key, value.lower() == "true"
-                                    )
-                                elif key == "system_prompt" and value:
-                                    setattr(provider_config, key, value)
-                                else:
-                                    setattr(provider_config, key, value)
-                        config.providers[section] = provider_config
+                                setattr(provider_config, key, convert_value(key, value))
+                        # Provider names are matched in lowercase
+                        config.providers[section.lower()] = provider_config
 
+                if snapshot_key:
+                    config._save_snapshot(snapshot_key)
             except configparser.Error:
                 print(
                     f"Warning: Could not parse {cls.CONFIG_PATH}. Using default configuration."
@@ -119,6 +249,129 @@ class LaskConfig:
 
         return config
 
+    @classmethod
+    def snapshot_path(cls) -> Path:
+        """Return where the parsed config file is cached between runs."""
+        return default_cache_dir() / "config-snapshot.json"
+
+    @classmethod
+    def _snapshot_key(cls, raw: bytes) -> str:
+        """
+        Identify a config file's content and the settings schema it was read with.
+
+        Args:
+            raw (bytes): The config file's content
+
+        Returns:
+            str: A key that changes when the file or the known settings change
+        """
+        stat = cls.CONFIG_PATH.stat()
+        schema = ",".join(
+            [f.name for f in fields(cls)] + [f.name for f in fields(ProviderConfig)]
+        )
+        return "{}:{}:{}:{}:{:08x}:{:08x}".format(
+            SNAPSHOT_VERSION,
+            cls.CONFIG_PATH,
+            stat.st_mtime_ns,
+            len(raw),
+            zlib.crc32(raw),
+            zlib.crc32(schema.encode("utf-8")),
+        )
+
+    @classmethod
+    def _load_snapshot(cls, key: str) -> Optional["LaskConfig"]:
+        """
+        Load the configuration saved by an earlier run, if it matches the key.
+
+        Args:
+            key (str): The key of the current config file
+
+        Returns:
+            Optional[LaskConfig]: The configuration, or None if there's no usable snapshot
+        """
+        try:
+            with open(cls.snapshot_path(), "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("key") != key:
+                return None
+            config = cls(**snapshot["default"])
+            config.providers = {
+                name: ProviderConfig(**values)
+                for name, values in snapshot["providers"].items()
+            }
+            return config
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            # Missing, corrupt or written by another version; parse the file instead
+            return None
+
+    def _save_snapshot(self, key: str) -> None:
+        """
+        Save this configuration, as parsed from the config file, for later runs.
+
+        The snapshot lives in the cache directory, which is often backed up
+        or shared more freely than ~/.lask-config, so it never holds secrets:
+        config files with an api_key are parsed on every run instead, and a
+        snapshot left from before a key was added is removed. API keys from
+        the environment are only read when a request is built.
+
+        Args:
+            key (str): The key of the config file this was parsed from
+        """
+        path = self.snapshot_path()
+        if any(provider.api_key for provider in self.providers.values()):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return
+        snapshot = {
+            "key": key,
+            "default": {
+                f.name: getattr(self, f.name)
+                for f in fields(self)
+                if f.init and f.name != "providers"
+            },
+            "providers": {
+                name: vars(provider_config)
+                for name, provider_config in self.providers.items()
+            },
+        }
+        import tempfile
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # mkstemp creates the file readable by the owner only
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, separators=(",", ":"))
+                os.replace(tmp_name, path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except (OSError, TypeError, ValueError):
+            # The snapshot is only an optimization
+            pass
+
+    def request_template(self, provider: str, build: Callable[["LaskConfig"], T]) -> T:
+        """
+        Get the resolved request template of a provider, building it on first use.
+
+        Templates are built once per process from the loaded configuration, so
+        REPL turns and batch rows skip resolving settings again.
+
+        Args:
+            provider (str): The provider name
+            build (Callable[[LaskConfig], T]): Builds the template from this configuration
+
+        Returns:
+            T: The provider's template
+        """
+        template = self._templates.get(provider)
+        if template is None:
+            template = self._templates[provider] = build(self)
+        return template
+
     def get_provider_config(self, provider: str) -> ProviderConfig:
         """
         Get the configuration for a specific provider.
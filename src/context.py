@@ -0,0 +1,240 @@
+"""
+Token-budgeted context window management for REPL conversations.
+
+Every REPL turn sends the whole conversation, so without a limit long
+sessions get slower and more expensive each turn until they overflow the
+model's context window. ContextManager keeps the conversation within a token
+budget by evicting the oldest turns, either dropping them or folding them
+into a running summary. Leading system messages are always kept.
+
+Token counts are estimated from the text length; they don't need to be exact,
+only to keep requests bounded well inside the model's limit.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from src.config import LaskConfig
+
+# Upper bound on the budget when neither the config nor the model sets a lower one
+DEFAULT_CONTEXT_BUDGET = 32000
+# Tokens kept free for the response when deriving a budget from the model window
+DEFAULT_RESPONSE_RESERVE = 4096
+# Rough characters per token for English text and code
+CHARS_PER_TOKEN = 4
+# Per-message overhead for role and formatting tokens
+MESSAGE_OVERHEAD = 4
+
+# Context windows of common models, matched by prefix (longest prefix wins)
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+    "claude": 200000,
+    "anthropic.claude": 200000,
+    "amazon.titan": 8192,
+}
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation so far in a few sentences, keeping names, "
+    "facts, decisions and open questions that later messages may refer to."
+)
+
+
+def estimate_tokens(message: Dict[str, str]) -> int:
+    """
+    Estimate the number of tokens a message takes up in a request.
+
+    Args:
+        message (Dict[str, str]): A conversation message
+
+    Returns:
+        int: The estimated token count
+    """
+    return len(message["content"]) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+
+
+def model_context_window(model: Optional[str]) -> Optional[int]:
+    """
+    Look up the context window of a model.
+
+    Args:
+        model (Optional[str]): The model name or id
+
+    Returns:
+        Optional[int]: The window in tokens, or None if the model is unknown
+    """
+    if not model:
+        return None
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return None
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def context_budget(config: LaskConfig, provider: str, model: Optional[str]) -> int:
+    """
+    Get the token budget for a provider's conversation.
+
+    The ``context_budget`` setting of the provider section or [default] wins;
+    otherwise the model's window minus room for the response is used, capped
+    at DEFAULT_CONTEXT_BUDGET.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The provider name
+        model (Optional[str]): The model the provider uses
+
+    Returns:
+        int: The budget in tokens
+    """
+    provider_config = config.get_provider_config(provider)
+    configured = provider_config.get("context_budget", config.context_budget)
+    if configured:
+        return configured
+
+    window = model_context_window(model)
+    if window is None:
+        return DEFAULT_CONTEXT_BUDGET
+    reserve = provider_config.max_tokens or DEFAULT_RESPONSE_RESERVE
+    return min(max(window - reserve, window // 4), DEFAULT_CONTEXT_BUDGET)
+
+
+class ContextManager:
+    """
+    Keeps a conversation within a token budget by evicting its oldest turns.
+
+    Usage:
+        context = ContextManager(budget=8000)
+        conversation.append({"role": "user", "content": prompt})
+        context.fit(conversation)
+        call_provider_api(provider, config, prompt, conversation)
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        summarize: Optional[Callable[[List[Dict[str, str]]], str]] = None,
+    ) -> None:
+        """
+        Args:
+            budget (int): Maximum estimated tokens to send per request
+            summarize (Optional[Callable[[List[Dict[str, str]]], str]]): Condenses
+                evicted messages into a summary; evicted turns are dropped without one
+        """
+        self.budget = budget
+        self.summarize = summarize
+        # Everything evicted so far, oldest first, for the !context command
+        self.evicted: List[Dict[str, str]] = []
+
+    def usage(self, conversation: List[Dict[str, str]]) -> int:
+        """Estimate the tokens a conversation takes up."""
+        return sum(estimate_tokens(message) for message in conversation)
+
+    def fit(self, conversation: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Evict the oldest turns in place until the conversation fits the budget.
+
+        Leading system messages and the latest message are always kept.
+
+        Args:
+            conversation (List[Dict[str, str]]): The conversation, modified in place
+
+        Returns:
+            List[Dict[str, str]]: The messages evicted by this call
+        """
+        total = self.usage(conversation)
+        if total <= self.budget:
+            return []
+
+        # System messages from setup_conversation stay, the running summary doesn't
+        start = 0
+        while (
+            start < len(conversation)
+            and conversation[start]["role"] == "system"
+            and not conversation[start].get("summary")
+        ):
+            start += 1
+
+        end = start
+        while end < len(conversation) - 1 and total > self.budget:
+            total -= estimate_tokens(conversation[end])
+            end += 1
+            # Evict whole turns so the conversation never starts with an answer
+            while end < len(conversation) - 1 and conversation[end]["role"] != "user":
+                total -= estimate_tokens(conversation[end])
+                end += 1
+
+        evicted = conversation[start:end]
+        if not evicted:
+            return []
+        del conversation[start:end]
+        self.evicted.extend(m for m in evicted if not m.get("summary"))
+
+        if self.summarize is not None:
+            try:
+                summary = self.summarize(evicted)
+            except Exception as e:
+                print(f"Warning: Could not summarize earlier messages: {e}")
+            else:
+                conversation.insert(
+                    start,
+                    {
+                        "role": "system",
+                        "content": f"Summary of the earlier conversation: {summary}",
+                        "summary": "true",
+                    },
+                )
+                # A summary that doesn't fit can only be dropped again next turn
+                if self.usage(conversation) > self.budget:
+                    del conversation[start]
+        return evicted
+
+
+def create_context_manager(config: LaskConfig, providers: List[str]) -> ContextManager:
+    """
+    Create the context manager for a REPL session.
+
+    When several providers are raced, the smallest of their budgets is used.
+    With ``context_strategy = summarize`` evicted turns are summarized by the
+    first provider; otherwise they're dropped.
+
+    Args:
+        config (LaskConfig): Configuration object
+        providers (List[str]): The provider, or the providers being raced
+
+    Returns:
+        ContextManager: The context manager
+    """
+    # Imported here so the one-off path never loads the provider machinery
+    from src.providers import call_provider_api, get_provider_module, resolve_model
+
+    budget = min(
+        context_budget(
+            config,
+            provider,
+            resolve_model(
+                get_provider_module(provider, config),
+                config.get_provider_config(provider),
+            ),
+        )
+        for provider in providers
+    )
+
+    provider = providers[0]
+    strategy = config.get_provider_config(provider).get(
+        "context_strategy", config.context_strategy
+    )
+    if strategy != "summarize":
+        return ContextManager(budget)
+
+    def summarize(messages: List[Dict[str, str]]) -> str:
+        request = messages + [{"role": "user", "content": SUMMARY_PROMPT}]
+        result = call_provider_api(provider, config, SUMMARY_PROMPT, request)
+        return (result if isinstance(result, str) else "".join(result)).strip()
+
+    return ContextManager(budget, summarize=summarize)
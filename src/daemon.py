@@ -0,0 +1,336 @@
+"""
+Resident daemon mode for lask.
+
+`lask --serve` keeps one warm process that holds the parsed configuration,
+the imported provider modules and their pooled keep-alive connections. Plain
+`lask ...` calls find its Unix socket, hand the prompt over and stream the
+response back, so they skip interpreter warm-up, imports and TLS handshakes.
+When no daemon is running, the client falls back to calling the provider
+in-process.
+
+The protocol is one JSON object per line. The client sends a single request:
+
+    {"prompt": "...", "race": ["openai", "anthropic"] or null, "cache": true}
+
+and the daemon answers with any number of
+
+    {"stdout": "..."} / {"stderr": "..."}   output printed while handling it
+    {"chunk": "..."}                        response text
+
+followed by {"done": true}, {"error": "..."} or {"exit": code}.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+from src.config import LaskConfig, default_cache_dir
+
+# How long a client waits for the daemon to accept before running in-process
+CONNECT_TIMEOUT = 0.5
+
+# The handler thread's connection, for output printed while handling a request
+_local = threading.local()
+
+
+def socket_path() -> Path:
+    """
+    Return the path of the daemon's socket.
+
+    LASK_SOCKET overrides it; otherwise the per-user runtime directory is used
+    when there is one, and the lask cache directory when there isn't.
+
+    Returns:
+        Path: The socket path
+    """
+    if os.environ.get("LASK_SOCKET"):
+        return Path(os.environ["LASK_SOCKET"])
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "lask.sock"
+    return default_cache_dir() / "lask.sock"
+
+
+class _RoutedStream:
+    """
+    Stand-in for sys.stdout/sys.stderr in the daemon.
+
+    Output printed by a thread that is handling a request (prompt banners,
+    provider errors, hedge notices) is sent to that request's client; all
+    other output goes to the daemon's own stream.
+    """
+
+    def __init__(self, name: str, stream: TextIO) -> None:
+        self.name = name
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        send: Optional[Callable[[Dict[str, Any]], None]] = getattr(_local, "send", None)
+        if send is None:
+            return self.stream.write(text)
+        if text:
+            send({self.name: text})
+        return len(text)
+
+    def flush(self) -> None:
+        if getattr(_local, "send", None) is None:
+            self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answers one client request."""
+
+    server: "_Server"
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    def handle(self) -> None:
+        # Imported here so clients that only check for a daemon don't load them
+        from src.providers import registry
+        from src.race import hedged_call, race_providers
+
+        try:
+            request = json.loads(self.rfile.readline())
+            prompt: str = request["prompt"]
+            race: Optional[List[str]] = request.get("race")
+        except (ValueError, KeyError, TypeError):
+            # Also reached by a probe that connects and hangs up without a request
+            try:
+                self.send({"error": "Invalid request"})
+            except OSError:
+                pass
+            return
+
+        config = self.server.get_config(cache=request.get("cache", True))
+        _local.send = self.send
+        try:
+            if race:
+                winner, result = race_providers(race, config, prompt)
+                print(f"[race] {winner} won", file=sys.stderr)
+            else:
+                provider = config.get("provider", "openai").lower()
+                if not registry.is_supported(provider, config):
+                    self.send(
+                        {
+                            "error": f"Unsupported provider '{provider}'. Supported providers are: {', '.join(registry.available(config))}"
+                        }
+                    )
+                    return
+                _, result = hedged_call(provider, config, prompt)
+
+            if isinstance(result, str):
+                self.send({"chunk": result})
+            else:
+                try:
+                    for chunk in result:
+                        self.send({"chunk": chunk})
+                finally:
+                    # Releases the provider connection if the client went away
+                    close = getattr(result, "close", None)
+                    if close is not None:
+                        close()
+            self.send({"done": True})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client was interrupted
+            pass
+        except SystemExit as e:
+            # Third-party providers may still exit on errors
+            self.send({"exit": e.code if isinstance(e.code, int) else 1})
+        except Exception as e:
+            self.send({"error": str(e)})
+        finally:
+            _local.send = None
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server holding the warm configuration."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, config: LaskConfig) -> None:
+        super().__init__(str(path), _Handler)
+        self._lock = threading.Lock()
+        self._set_config(config)
+
+    def _set_config(self, config: LaskConfig) -> None:
+        # --no-cache requests get their own copy, so concurrent clients don't
+        # change each other's settings; each copy keeps its request templates
+        uncached = LaskConfig.load() if config.cache else config
+        uncached.cache = False
+        self._configs = {True: config, False: uncached}
+        self._config_mtime = self._mtime()
+
+    @staticmethod
+    def _mtime() -> Optional[int]:
+        try:
+            return LaskConfig.CONFIG_PATH.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def get_config(self, cache: bool) -> LaskConfig:
+        """Get the configuration, reloading it if the config file changed."""
+        with self._lock:
+            if self._mtime() != self._config_mtime:
+                self._set_config(LaskConfig.load())
+            return self._configs[bool(cache)]
+
+
+def create_server(config: LaskConfig, path: Optional[Path] = None) -> _Server:
+    """
+    Bind the daemon's socket, replacing a stale one left by a crashed daemon.
+
+    Args:
+        config (LaskConfig): Configuration object
+        path (Optional[Path]): The socket path, defaults to socket_path()
+
+    Returns:
+        _Server: The bound server
+
+    Raises:
+        RuntimeError: If another daemon is already listening on the socket
+    """
+    path = path or socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        probe = _connect(path)
+        if probe is not None:
+            probe.close()
+            raise RuntimeError(f"A lask daemon is already running on {path}")
+        path.unlink()
+
+    # The daemon answers with the owner's API keys, so only the owner may connect
+    old_umask = os.umask(0o177)
+    try:
+        return _Server(path, config)
+    finally:
+        os.umask(old_umask)
+
+
+def serve(config: LaskConfig) -> None:
+    """
+    Run the daemon in the foreground until interrupted.
+
+    Args:
+        config (LaskConfig): Configuration object
+    """
+    import signal
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: --serve needs Unix domain sockets, which aren't available here")
+        sys.exit(1)
+
+    path = socket_path()
+    try:
+        server = create_server(config, path)
+    except (RuntimeError, OSError) as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+    sys.stdout = _RoutedStream("stdout", sys.stdout)  # type: ignore
+    sys.stderr = _RoutedStream("stderr", sys.stderr)  # type: ignore
+    # Stop cleanly on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print(f"lask daemon listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        print("lask daemon stopped")
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    """Connect to a daemon socket, or return None if nothing is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    # Responses can take arbitrarily long to start
+    sock.settimeout(None)
+    return sock
+
+
+def _iter_messages(sock: socket.socket) -> Iterator[Dict[str, Any]]:
+    """Yield the daemon's messages until it closes the connection."""
+    with sock.makefile("rb") as reader:
+        for line in reader:
+            yield json.loads(line)
+
+
+def run_client(prompt: str, race: Optional[List[str]], cache: bool) -> Optional[int]:
+    """
+    Send a one-off prompt to a running daemon and print its response.
+
+    Args:
+        prompt (str): The user prompt
+        race (Optional[List[str]]): Providers to race, if any
+        cache (bool): Whether the response cache may be used
+
+    Returns:
+        Optional[int]: The exit code, or None if no daemon is running and the
+                       prompt should be handled in-process
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = _connect(socket_path())
+    if sock is None:
+        return None
+
+    from src.output import OutputSink
+
+    with sock:
+        try:
+            request = {"prompt": prompt, "race": race, "cache": cache}
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        except OSError:
+            # The daemon went away between connecting and sending
+            return None
+
+        sink = OutputSink()
+        try:
+            for message in _iter_messages(sock):
+                if "chunk" in message:
+                    sink.write(message["chunk"])
+                elif "stdout" in message:
+                    sink.flush()
+                    sys.stdout.write(message["stdout"])
+                elif "stderr" in message:
+                    sink.flush()
+                    sys.stderr.write(message["stderr"])
+                elif "done" in message:
+                    # Add a newline at the end of the complete response
+                    sink.close()
+                    return 0
+                elif "error" in message:
+                    sink.close(newline=False)
+                    print(f"Error: {message['error']}")
+                    return 1
+                elif "exit" in message:
+                    sink.close(newline=False)
+                    return message["exit"]
+        except (OSError, ValueError):
+            pass
+        sink.close(newline=False)
+        print("Error: The lask daemon closed the connection")
+        return 1
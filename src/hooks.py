@@ -0,0 +1,108 @@
+"""
+Lifecycle hooks around provider calls.
+
+Programs embedding lask can observe every provider call without patching
+the provider modules:
+
+    from src import hooks
+
+    def log(event: hooks.CallEvent) -> None:
+        print(event.name, event.provider, event.size)
+
+    hooks.add_hook(log)
+
+Each call emits, in order: ``request_built``, then ``connection_acquired``
+and ``headers_received`` for every HTTP attempt, ``first_chunk`` and a
+``chunk`` for every piece of text (the first one included), and finally one
+of ``complete``, ``error`` or ``cancelled``. Bedrock calls emit no
+connection events, as botocore manages its connections itself.
+
+Hooks run synchronously on the thread making the call, so they should be
+quick; an exception in a hook is reported once and otherwise ignored.
+"""
+
+import sys
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+EVENTS = (
+    "request_built",
+    "connection_acquired",
+    "headers_received",
+    "first_chunk",
+    "chunk",
+    "complete",
+    "error",
+    "cancelled",
+)
+
+
+class CallEvent(NamedTuple):
+    """A point in the lifecycle of a provider call."""
+
+    # One of EVENTS
+    name: str
+    # Identifies the call within the process; all events of a call share it
+    call_id: int
+    provider: str
+    model: Optional[str]
+    # Monotonic clock (time.perf_counter_ns) for measuring durations
+    monotonic_ns: int
+    # Wall clock time of the event in nanoseconds since the epoch
+    time_ns: int
+    # Characters of text for requests and chunks, bytes received on completion
+    size: Optional[int]
+    # Event details, e.g. "reused" for connection_acquired
+    attributes: Dict[str, Any]
+
+
+Hook = Callable[[CallEvent], None]
+
+_hooks: List[Hook] = []
+_hooks_lock = threading.Lock()
+# Hooks that raised, so each failing hook is only reported once
+_failed: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """
+    Call a function for every event of every provider call.
+
+    Args:
+        hook (Hook): Receives each CallEvent
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """
+    Stop calling a hook added with add_hook().
+
+    Args:
+        hook (Hook): The hook to remove
+    """
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def active() -> bool:
+    """Check whether any hooks are registered."""
+    return bool(_hooks)
+
+
+def emit(event: CallEvent) -> None:
+    """
+    Pass an event to every registered hook.
+
+    Args:
+        event (CallEvent): The event
+    """
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            if hook not in _failed:
+                _failed.append(hook)
+                print(f"Warning: A lask hook failed: {e}", file=sys.stderr)
@@ -0,0 +1,66 @@
+"""
+Cross-process file locking and appending for state shared between lask
+processes.
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on a lock file for the duration of the block.
+
+    The lock file is created if needed and never removed, so every process
+    locks the same inode.
+
+    Args:
+        path (Path): The lock file path
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def append_line(path: Union[str, Path], line: str) -> None:
+    """
+    Append a line to a log file that other processes may be appending to.
+
+    The line is written with a single append-mode write, which keeps lines
+    from concurrent processes whole without taking a lock.
+
+    Args:
+        path (Union[str, Path]): The file, created if needed
+        line (str): The line, including its newline
+
+    Raises:
+        OSError: If the file can't be opened or written
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
@@ -5,6 +5,13 @@ Usage:
     lask                     # Start interactive REPL mode
     lask Your prompt here    # One-off prompt
     echo "Your prompt here" | lask
+    lask --no-cache Your prompt here  # Bypass the response cache
+    lask --batch prompts.jsonl --concurrency 8 --output results.jsonl
+    lask --race openai,anthropic Your prompt here  # Stream the fastest provider
+    lask --serve             # Keep a warm daemon that later calls hand prompts to
+    lask --resume [ID]       # Continue the last (or a given) saved REPL session
+    cat big.log | lask --map-reduce What went wrong?  # Input too large for one prompt
+    lask --search TERM       # Find saved sessions mentioning TERM
 This tool supports multiple LLM providers including OpenAI, Anthropic, and AWS Bedrock.
 Configure your API keys and preferences in the ~/.lask-config file.
 
@@ -16,15 +23,18 @@ Features:
 - Pipe input: You can pipe content into lask as input instead of providing it as a command line argument.
 """
 
+import argparse
 import sys
 import os
-from typing import Union, Iterator, List, Dict
-import readline  # For better input handling in REPL mode
-import atexit
+from pathlib import Path
+from typing import Union, Iterator, List, Dict, Optional
 
-import configparser
+# Modules only some modes need (readline, configparser, batch mode and the
+# HTTP stack) are imported where they're used, to keep one-off runs fast
+from src import metrics
 from src.config import LaskConfig
-from src.providers import call_provider_api
+from src.output import OutputSink
+from src.race import hedge_stats, hedged_call, race_providers
 
 
 def prompt_for_config_creation() -> None:
@@ -47,6 +57,8 @@ def prompt_for_config_creation() -> None:
         print("No configuration file created. You can create one manually later.")
         return
 
+    import configparser
+
     # Create a ConfigParser object
     config = configparser.ConfigParser()
     config["default"] = {
@@ -155,6 +167,9 @@ def setup_readline():
     - Editing with arrow keys
     - Optional Vi editing mode
     """
+    import atexit
+    import readline  # For better input handling in REPL mode
+
     # Set up history file
     history_file = os.path.join(os.path.expanduser("~"), ".lask_history")
 
@@ -272,38 +287,48 @@ def process_response(result: Union[str, Iterator[str]]) -> str:
     Returns:
         str: The full response text
     """
-    full_response = ""
-
+    # Handle streaming vs non-streaming responses
+    if isinstance(result, str):
+        # Non-streaming response
+        print(result)
+        return result
+
+    # Streaming response, written out in batches rather than per chunk
+    sink = OutputSink()
     try:
-        # Handle streaming vs non-streaming responses
-        if isinstance(result, str):
-            # Non-streaming response
-            print(result)
-            full_response = result
-        else:
-            # Streaming response
-            for chunk in result:
-                print(chunk, end="", flush=True)
-                full_response += chunk
-            print()  # Add a newline at the end
+        for chunk in result:
+            sink.write(chunk)
+        sink.close()  # Add a newline at the end
     except KeyboardInterrupt:
         # Handle Ctrl+C during response generation
+        sink.close(newline=False)
         print("\n\nResponse interrupted.")
 
-    return full_response
+    return sink.getvalue()
+
 
+def print_stats() -> None:
+    """Show the timings of the calls finished since the last response, for --stats."""
+    for request_metrics in metrics.drain():
+        # Race losers and hedges that were cut short aren't of interest here
+        if request_metrics.error != "cancelled":
+            print(f"[stats] {request_metrics.format()}", file=sys.stderr)
 
-def handle_repl_command(cmd, conversation):
+
+def handle_repl_command(cmd, conversation, context=None):
     """
     Handle special REPL commands starting with !
 
     Args:
         cmd (str): The command without the ! prefix
         conversation (List): The current conversation history
+        context (Optional[ContextManager]): The session's context manager
 
     Returns:
         bool: True if the command was handled, False otherwise
     """
+    import readline  # Already loaded by setup_readline()
+
     if cmd == "help":
         print("\nREPL Commands:")
         print("  !help     - Show this help")
@@ -311,6 +336,9 @@ def handle_repl_command(cmd, conversation):
         print("  !history  - Show command history")
         print("  !vi       - Switch to Vi editing mode")
         print("  !emacs    - Switch to Emacs editing mode")
+        print("  !hedges   - Show how often hedged requests were sent and won")
+        print("  !context  - Show the context budget and evicted messages")
+        print("  !cache    - Show prompt cache reads and writes (Anthropic models)")
         print("  exit/quit - Exit the REPL")
         return True
     elif cmd == "clear":
@@ -334,6 +362,37 @@ def handle_repl_command(cmd, conversation):
         os.environ["LASK_EDITING_MODE"] = "emacs"
         print("Switched to Emacs editing mode")
         return True
+    elif cmd == "context" and context is not None:
+        print(
+            f"Context: ~{context.usage(conversation)} of {context.budget} tokens "
+            f"in {len(conversation)} messages"
+        )
+        if not context.evicted:
+            print("No messages have been evicted.")
+        else:
+            print(f"Evicted messages ({len(context.evicted)}, oldest first):")
+            for message in context.evicted:
+                preview = " ".join(message["content"].split())
+                if len(preview) > 70:
+                    preview = preview[:67] + "..."
+                print(f"  {message['role']}: {preview}")
+        return True
+    elif cmd == "cache":
+        from src.providers import prompt_cache
+
+        usage = prompt_cache.usage_stats()
+        print(f"Requests with usage reported: {usage['total']['requests']}")
+        print(f"Session: {prompt_cache.format_usage(usage['total'])}")
+        if usage["last"]:
+            print(f"Last request: {prompt_cache.format_usage(usage['last'])}")
+        return True
+    elif cmd == "hedges":
+        stats = hedge_stats()
+        print(
+            f"Hedged calls: {stats['requests']}, duplicates sent: {stats['hedged']}, "
+            f"duplicates that answered first: {stats['hedge_won']}"
+        )
+        return True
     return False
 
 
@@ -359,27 +418,31 @@ def display_repl_help():
     print("- Type '!help' for REPL help")
     print("- Type '!clear' to clear the screen")
     print("- Type '!history' to show command history")
+    print("- Type '!context' to show the context budget and evicted messages")
     print("- Type 'exit' or 'quit' to end the session")
     print("- Press Ctrl+C to interrupt a response")
 
 
-def repl_mode(config: LaskConfig) -> None:
+def repl_mode(
+    config: LaskConfig,
+    race: Optional[List[str]] = None,
+    resume: Optional[str] = None,
+) -> None:
     """
     Run lask in REPL (Read-Eval-Print Loop) mode.
     This mode maintains conversation context between prompts.
 
     Args:
         config (LaskConfig): Configuration object
+        race (Optional[List[str]]): Providers to race on every prompt instead of
+                                    using the configured provider
+        resume (Optional[str]): ID of a saved session to continue, or "last"
     """
     # Determine which provider to use
-    provider: str = config.get("provider", "openai").lower()
+    provider: str = race[0] if race else config.get("provider", "openai").lower()
 
     # Check if provider is supported
-    if provider not in LaskConfig.SUPPORTED_PROVIDERS:
-        print(
-            f"Error: Unsupported provider '{provider}'. Supported providers are: {', '.join(LaskConfig.SUPPORTED_PROVIDERS)}"
-        )
-        sys.exit(1)
+    check_provider(provider, config)
 
     # Configure readline for better line editing
     setup_readline()
@@ -387,9 +450,34 @@ def repl_mode(config: LaskConfig) -> None:
     # Initialize conversation history
     conversation = setup_conversation(config, provider)
 
+    # Keep the conversation sent each turn within the model's token budget
+    from src.context import create_context_manager
+    from src.providers import prompt_cache
+
+    context = create_context_manager(config, race or [provider])
+
+    # Save the session so it can be resumed and searched later
+    session = open_session(config, provider, resume)
+    if session is not None and resume is not None:
+        # Only the latest turns that fit the context budget are read
+        loaded = session.store.load(
+            session.id, context.budget - context.usage(conversation)
+        )
+        conversation.extend(loaded)
+        print(f"Resumed session {session.id} ({len(loaded)} messages loaded)")
+        if not config.sessions:
+            # Read, but not extended
+            session = None
+
+    if config.stats:
+        metrics.keep_finished()
+
     # Display welcome message
     print("\n==== Lask REPL Mode ====")
-    print(f"Using provider: {provider}")
+    if race:
+        print(f"Racing providers: {', '.join(race)}")
+    else:
+        print(f"Using provider: {provider}")
 
     # Show help information
     display_repl_help()
@@ -421,7 +509,7 @@ def repl_mode(config: LaskConfig) -> None:
             # Check for special REPL commands
             if user_input.startswith("!"):
                 cmd = user_input[1:].strip().lower()
-                if handle_repl_command(cmd, conversation):
+                if handle_repl_command(cmd, conversation, context):
                     continue
 
             # Skip empty inputs
@@ -430,24 +518,277 @@ def repl_mode(config: LaskConfig) -> None:
 
             # Add user message to conversation
             conversation.append({"role": "user", "content": user_input})
+            if session is not None:
+                session.save(conversation[-1])
+
+            # Evict the oldest turns if the conversation outgrew its budget
+            evicted = context.fit(conversation)
+            if evicted:
+                print(
+                    f"[context] evicted {len(evicted)} earlier messages to stay within "
+                    f"{context.budget} tokens (see !context)",
+                    file=sys.stderr,
+                )
 
             try:
+                cached_requests = prompt_cache.usage_stats()["total"]["requests"]
+
                 # Call the provider API with the full conversation history
-                result = call_provider_api(provider, config, user_input, conversation)
+                if race:
+                    winner, result = race_providers(
+                        race, config, user_input, conversation
+                    )
+                    print(f"[race] {winner} won", file=sys.stderr)
+                else:
+                    winner, result = hedged_call(
+                        provider, config, user_input, conversation
+                    )
 
                 # Process the response and get the full text
                 full_response = process_response(result)
 
-                # Add assistant's response to conversation history
-                conversation.append({"role": "assistant", "content": full_response})
+                # Add assistant's response to conversation history, noting who answered
+                conversation.append(
+                    {"role": "assistant", "content": full_response, "provider": winner}
+                )
+                if session is not None:
+                    session.save(conversation[-1])
+
+                # Show how much of the prompt Anthropic served from its cache
+                usage = prompt_cache.usage_stats()
+                if usage["total"]["requests"] > cached_requests and (
+                    usage["last"]["cache_read_input_tokens"]
+                    or usage["last"]["cache_creation_input_tokens"]
+                ):
+                    print(
+                        f"[cache] {prompt_cache.format_usage(usage['last'])}",
+                        file=sys.stderr,
+                    )
 
             except Exception as e:
                 print(f"\nError: {str(e)}")
 
+            if config.stats:
+                print_stats()
+
     except KeyboardInterrupt:
         # Handle Ctrl+C at input prompt
         print("\nExiting...")
 
+    if session is not None and session.store is not None and session.id is not None:
+        print(
+            f"Session {session.id} saved. Continue it with: lask --resume {session.id}"
+        )
+
+
+def open_session(config: LaskConfig, provider: str, resume: Optional[str] = None):
+    """
+    Open the saved session a REPL continues or records to.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The provider name
+        resume (Optional[str]): ID of a saved session to continue, or "last"
+
+    Returns:
+        Optional[Session]: The session, or None if sessions aren't saved
+    """
+    if not config.sessions and resume is None:
+        return None
+
+    import sqlite3
+
+    from src.sessions import Session, SessionStore
+
+    try:
+        store = SessionStore.from_config(config)
+    except (OSError, sqlite3.Error) as e:
+        if resume is not None:
+            print(f"Error: Could not open the session store: {e}")
+            sys.exit(1)
+        print(
+            f"Warning: Could not open the session store, not saving this session: {e}"
+        )
+        return None
+
+    if resume is None:
+        return Session(store, provider)
+
+    if resume == "last":
+        info = store.latest()
+        if info is None:
+            print("Error: There are no saved sessions to resume")
+            sys.exit(1)
+    else:
+        info = store.get(int(resume)) if resume.isdigit() else None
+        if info is None:
+            print(f"Error: No saved session with ID '{resume}'")
+            sys.exit(1)
+    return Session(store, provider, info.id)
+
+
+def search_sessions(config: LaskConfig, term: str) -> None:
+    """
+    Print the saved sessions with messages matching a search term.
+
+    Args:
+        config (LaskConfig): Configuration object
+        term (str): Words that must all appear in a message
+    """
+    import sqlite3
+    import time
+
+    from src.sessions import SessionStore
+
+    try:
+        store = SessionStore.from_config(config)
+        results = store.search(term)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: Could not search the session store: {e}")
+        sys.exit(1)
+
+    if not results:
+        print(f"No saved sessions match '{term}'")
+        return
+    for result in results:
+        updated = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(result.session.updated)
+        )
+        print(f"{result.session.id:>6}  {updated}  {result.session.title or ''}")
+        print(f"        {result.snippet}")
+    print("\nContinue a session with: lask --resume ID")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Options must come before the prompt; everything from the first
+    non-option word on is taken as the prompt. Prompts that start with a
+    dash are passed through too: an unrecognized option starts the prompt,
+    and ``--`` ends the options explicitly (``lask -- --help me``).
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse, defaults to sys.argv[1:]
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="lask",
+        description="Ask LLMs right from the terminal.",
+        epilog="Run without a prompt to start an interactive REPL session. "
+        "Use -- before a prompt that starts with a known option.",
+        # A prompt like "--ser..." mustn't start the daemon
+        allow_abbrev=False,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="bypass the response cache for this call",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run a resident daemon that one-off calls hand their prompts to",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="handle the prompt in this process even if a daemon is running",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="last",
+        metavar="ID",
+        help="continue a saved REPL session (default: the most recent one)",
+    )
+    parser.add_argument(
+        "--search",
+        metavar="TERM",
+        help="list saved sessions with messages containing all words of TERM",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print connect, header, first-token and total times after each response",
+    )
+    parser.add_argument(
+        "--trace-file",
+        metavar="FILE",
+        help="append an OpenTelemetry span (OTLP/JSON) per provider call to FILE",
+    )
+    parser.add_argument(
+        "--race",
+        metavar="PROVIDERS",
+        help="comma-separated providers to send each prompt to at once; the first to respond is streamed",
+    )
+    map_reduce = parser.add_argument_group("map-reduce mode")
+    map_reduce.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="answer the prompt about piped input too large for one request, part by part",
+    )
+    map_reduce.add_argument(
+        "--chunk-tokens",
+        type=int,
+        metavar="N",
+        help="estimated tokens of input per request (default: half the context budget)",
+    )
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="run every prompt of a JSONL file; each line has a 'prompt' or 'messages' and an optional 'id'",
+    )
+    batch.add_argument(
+        "--concurrency",
+        type=int,
+        metavar="N",
+        help="number of requests in flight, also for --map-reduce (default: 4)",
+    )
+    batch.add_argument(
+        "--output",
+        metavar="FILE",
+        help="write JSONL results to FILE instead of stdout",
+    )
+    batch.add_argument(
+        "--order",
+        choices=["input", "completion"],
+        default="input",
+        help="write results in input order or as they complete (default: input)",
+    )
+    batch.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        help="file recording completed IDs so a rerun resumes (default: <batch FILE>.checkpoint)",
+    )
+    parser.add_argument("prompt", nargs=argparse.REMAINDER, help="the prompt to send")
+
+    args, unknown = parser.parse_known_args(argv)
+    if unknown:
+        # The first unrecognized option starts the prompt
+        argv = list(sys.argv[1:] if argv is None else argv)
+        start = argv.index(unknown[0])
+        args = parser.parse_args(argv[:start])
+        args.prompt = argv[start:]
+    elif args.prompt[:1] == ["--"]:
+        args.prompt = args.prompt[1:]
+    # A resumed session continues in the REPL, so words after --resume
+    # mustn't be silently dropped or taken as the session ID
+    if args.resume is not None:
+        if args.resume != "last" and not args.resume.isdigit():
+            parser.error(
+                f"argument --resume: invalid session ID '{args.resume}'; "
+                "type the prompt in the resumed REPL session"
+            )
+        if args.prompt:
+            parser.error(
+                "a prompt can't follow --resume; type it in the resumed REPL session"
+            )
+    return args
+
 
 def main() -> None:
     """
@@ -460,11 +801,44 @@ def main() -> None:
     - One-off prompts: lask Your prompt here
     - Pipe input: echo "Your prompt here" | lask
     """
+    args = parse_args()
+
     # Load config from file
     config = LaskConfig.load()
 
+    # Command line flags override the config file
+    if args.no_cache:
+        config.cache = False
+    if args.stats:
+        config.stats = True
+    trace_file = args.trace_file or os.environ.get("LASK_TRACE_FILE")
+    if trace_file:
+        config.trace_file = trace_file
+    if config.trace_file:
+        from src import tracing
+
+        tracing.install(Path(config.trace_file))
+    race = parse_race(args.race, config) if args.race else None
+
+    if args.serve:
+        from src.daemon import serve
+
+        serve(config)
+
+    elif args.batch:
+        process_batch(config, args)
+
+    elif args.search:
+        search_sessions(config, args.search)
+
+    elif args.map_reduce:
+        process_map_reduce(config, args)
+
+    elif args.resume is not None:
+        repl_mode(config, race, resume=args.resume)
+
     # Check if input is coming from a pipe
-    if not sys.stdin.isatty():
+    elif not sys.stdin.isatty():
         # Read from stdin (pipe)
         prompt = sys.stdin.read().strip()
         if not prompt:
@@ -472,10 +846,15 @@ def main() -> None:
             sys.exit(1)
 
         # Process the piped input as a one-off prompt
-        process_one_off_prompt(config, prompt)
+        process_one_off_prompt(
+            config,
+            prompt,
+            race,
+            use_daemon=not (args.no_daemon or config.stats or config.trace_file),
+        )
 
     # If no input from pipe, check command line arguments
-    elif len(sys.argv) < 2:
+    elif not args.prompt:
         # No arguments provided, enter REPL mode
 
         # First check if config file exists
@@ -484,48 +863,226 @@ def main() -> None:
             prompt_for_config_creation()
 
         # Start REPL mode
-        repl_mode(config)
+        repl_mode(config, race)
     else:
         # Get the prompt from command line arguments
-        prompt: str = " ".join(sys.argv[1:])
+        prompt: str = " ".join(args.prompt)
 
         # Process the command line input as a one-off prompt
-        process_one_off_prompt(config, prompt)
+        process_one_off_prompt(
+            config,
+            prompt,
+            race,
+            use_daemon=not (args.no_daemon or config.stats or config.trace_file),
+        )
+
+
+def check_provider(provider: str, config: LaskConfig) -> None:
+    """
+    Exit with an error if no provider module handles a provider name.
+
+    Args:
+        provider (str): A provider or named instance
+        config (LaskConfig): Configuration with the named instances
+    """
+    from src.providers import registry
+
+    if not registry.is_supported(provider, config):
+        print(
+            f"Error: Unsupported provider '{provider}'. Supported providers are: {', '.join(registry.available(config))}"
+        )
+        sys.exit(1)
+
+
+def parse_race(value: str, config: LaskConfig) -> List[str]:
+    """
+    Parse and validate the providers given to --race.
+
+    Args:
+        value (str): Comma-separated provider names
+        config (LaskConfig): Configuration with the named instances
+
+    Returns:
+        List[str]: The providers, in the order given
+    """
+    providers = []
+    for name in value.split(","):
+        name = name.strip().lower()
+        if not name or name in providers:
+            continue
+        check_provider(name, config)
+        providers.append(name)
+    if not providers:
+        print("Error: --race needs at least one provider")
+        sys.exit(1)
+    return providers
+
+
+def process_batch(config: LaskConfig, args: argparse.Namespace) -> None:
+    """
+    Run a JSONL prompt file in batch mode and exit.
+
+    Args:
+        config (LaskConfig): Configuration object
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    from src.batch import DEFAULT_CONCURRENCY, run_batch
+
+    input_path = Path(args.batch)
+    if not input_path.exists():
+        print(f"Error: Batch file not found: {input_path}")
+        sys.exit(1)
+    concurrency: int = (
+        DEFAULT_CONCURRENCY if args.concurrency is None else args.concurrency
+    )
+    if concurrency < 1:
+        print("Error: --concurrency must be at least 1")
+        sys.exit(1)
+
+    checkpoint_path = Path(args.checkpoint or f"{input_path}.checkpoint")
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        _, failed = run_batch(
+            config,
+            input_path,
+            output,
+            checkpoint_path,
+            concurrency=concurrency,
+            ordered=args.order == "input",
+        )
+    except (ImportError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nBatch interrupted. Run the same command again to resume.")
+        sys.exit(130)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    sys.exit(1 if failed else 0)
 
 
-def process_one_off_prompt(config: LaskConfig, prompt: str) -> None:
+def process_map_reduce(config: LaskConfig, args: argparse.Namespace) -> None:
+    """
+    Answer the prompt about piped input part by part and exit.
+
+    Args:
+        config (LaskConfig): Configuration object
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import io
+
+    from src.context import context_budget
+    from src.mapreduce import DEFAULT_CONCURRENCY, map_reduce
+    from src.providers import get_provider_module, resolve_model
+
+    if sys.stdin.isatty():
+        print("Error: --map-reduce reads its input from a pipe")
+        sys.exit(1)
+
+    provider: str = config.get("provider", "openai").lower()
+    check_provider(provider, config)
+
+    concurrency: int = (
+        DEFAULT_CONCURRENCY if args.concurrency is None else args.concurrency
+    )
+    chunk_tokens: int = args.chunk_tokens or (
+        context_budget(
+            config,
+            provider,
+            resolve_model(
+                get_provider_module(provider, config),
+                config.get_provider_config(provider),
+            ),
+        )
+        // 2
+    )
+    if concurrency < 1 or chunk_tokens < 1:
+        print("Error: --concurrency and --chunk-tokens must be at least 1")
+        sys.exit(1)
+
+    # Read stdin line by line; undecodable bytes in logs shouldn't stop the run
+    lines = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="replace")
+    try:
+        result = map_reduce(
+            config,
+            provider,
+            lines,
+            question=" ".join(args.prompt) or None,
+            chunk_tokens=chunk_tokens,
+            concurrency=concurrency,
+        )
+        process_response(result)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nMap-reduce interrupted.")
+        sys.exit(130)
+
+
+def process_one_off_prompt(
+    config: LaskConfig,
+    prompt: str,
+    race: Optional[List[str]] = None,
+    use_daemon: bool = False,
+) -> None:
     """
     Process a one-off prompt without maintaining conversation context.
 
     Args:
         config (LaskConfig): Configuration object
         prompt (str): The user prompt
+        race (Optional[List[str]]): Providers to race instead of using the
+                                    configured provider
+        use_daemon (bool): Hand the prompt to a running `lask --serve` daemon if
+                           there is one
     """
+    if use_daemon:
+        from src.daemon import run_client
+
+        exit_code = run_client(prompt, race, config.cache)
+        if exit_code is not None:
+            if exit_code:
+                sys.exit(exit_code)
+            return
+
     # Determine which provider to use
-    provider: str = config.get("provider", "openai").lower()
+    provider: str = race[0] if race else config.get("provider", "openai").lower()
 
     # Check if provider is supported
-    if provider not in LaskConfig.SUPPORTED_PROVIDERS:
-        print(
-            f"Error: Unsupported provider '{provider}'. Supported providers are: {', '.join(LaskConfig.SUPPORTED_PROVIDERS)}"
-        )
-        sys.exit(1)
+    check_provider(provider, config)
+
+    if config.stats:
+        metrics.keep_finished()
 
     try:
         # Call the appropriate API based on the provider using the provider modules
-        result: Union[str, Iterator[str]] = call_provider_api(provider, config, prompt)
+        result: Union[str, Iterator[str]]
+        if race:
+            winner, result = race_providers(race, config, prompt)
+            print(f"[race] {winner} won", file=sys.stderr)
+        else:
+            _, result = hedged_call(provider, config, prompt)
 
         # Handle streaming vs non-streaming responses
         if isinstance(result, str):
             # Non-streaming response - full text is returned at once
             print(result)
         else:
-            # Streaming response - print chunks as they arrive in real-time
-            # This provides immediate feedback as the LLM generates content
-            for chunk in result:
-                # Print without buffering and without newline to create a continuous output
-                print(chunk, end="", flush=True)
-            print()  # Add a newline at the end of the complete response
+            # Streaming response - show chunks as they arrive in real-time,
+            # coalescing bursts of tiny deltas into fewer writes
+            sink = OutputSink()
+            try:
+                for chunk in result:
+                    sink.write(chunk)
+            finally:
+                # Add a newline at the end of the complete response
+                sink.close()
+
+        if config.stats:
+            print_stats()
 
     except ImportError as e:
         print(f"Error: {str(e)}")
@@ -0,0 +1,295 @@
+"""
+Map-reduce over piped input that is too large for a single prompt.
+
+`lask --map-reduce "question" < big.log` reads stdin as a stream and cuts it
+into chunks that fit the model's context, ending chunks at paragraph or
+line breaks. Every chunk is asked the question on a bounded worker pool
+(map), and the partial answers are combined into one answer (reduce), in
+several rounds if they don't fit a single prompt. Only the chunks in flight
+and the partial answers are held in memory.
+"""
+
+import itertools
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.config import LaskConfig
+from src.context import CHARS_PER_TOKEN
+from src.providers import resolve_messages
+from src.providers.transport import DEFAULT_POOL_SIZE
+from src.race import hedged_call
+
+DEFAULT_CONCURRENCY = 4
+# Chunks read ahead of the workers, as a multiple of the concurrency
+WINDOW_FACTOR = 2
+
+DEFAULT_QUESTION = "Summarize the input."
+
+MAP_PROMPT = (
+    "{question}\n\n"
+    "The input is split into parts; this is part {number}. Answer for this part "
+    "only, in a form that can be combined with the answers for the other parts. "
+    "If the part has nothing relevant, say so in one line.\n\n"
+    "{chunk}"
+)
+
+REDUCE_PROMPT = (
+    "{question}\n\n"
+    "Below are answers for consecutive parts of an input too large to read at "
+    "once. Combine them into a single answer for the whole input.\n\n"
+    "{answers}"
+)
+
+
+def iter_chunks(lines: Iterable[str], max_chars: int) -> Iterator[str]:
+    """
+    Group lines into chunks of at most max_chars characters.
+
+    Chunks end at a paragraph break (a blank line) when there is one in the
+    second half of the chunk, otherwise at a line break. Lines longer than a
+    chunk are split.
+
+    Args:
+        lines (Iterable[str]): The input lines, with their line endings
+        max_chars (int): Maximum characters per chunk
+
+    Yields:
+        str: The chunks, skipping ones that are only whitespace
+    """
+    parts: List[str] = []
+    size = 0
+    # Lines and characters up to the last paragraph break in the chunk
+    paragraph_end = 0
+    paragraph_size = 0
+
+    def flush(count: int) -> Iterator[str]:
+        nonlocal parts, size, paragraph_end, paragraph_size
+        chunk = "".join(parts[:count])
+        parts = parts[count:]
+        size -= len(chunk)
+        paragraph_end = paragraph_size = 0
+        if chunk.strip():
+            yield chunk
+
+    for line in lines:
+        while len(line) > max_chars:
+            yield from flush(len(parts))
+            if line[:max_chars].strip():
+                yield line[:max_chars]
+            line = line[max_chars:]
+
+        while parts and size + len(line) > max_chars:
+            if paragraph_end and paragraph_size >= max_chars // 2:
+                yield from flush(paragraph_end)
+            else:
+                yield from flush(len(parts))
+
+        parts.append(line)
+        size += len(line)
+        if not line.strip():
+            paragraph_end = len(parts)
+            paragraph_size = size
+
+    yield from flush(len(parts))
+
+
+def ask(config: LaskConfig, provider: str, prompt: str) -> Union[str, Iterator[str]]:
+    """
+    Send a single prompt without printing it.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The provider name
+        prompt (str): The prompt
+
+    Returns:
+        Union[str, Iterator[str]]: The response
+    """
+    # Always pass a message list so providers don't echo the prompt
+    messages = resolve_messages(config, provider, prompt)
+    _, result = hedged_call(provider, config, prompt, messages)
+    return result
+
+
+def ask_text(config: LaskConfig, provider: str, prompt: str) -> str:
+    """Send a single prompt and return the whole response."""
+    result = ask(config, provider, prompt)
+    return result if isinstance(result, str) else "".join(result)
+
+
+def _progress(message: str) -> None:
+    """Show a progress line on stderr, overwriting it on terminals."""
+    if sys.stderr.isatty():
+        print(f"\r[map-reduce] {message}", end="", file=sys.stderr, flush=True)
+
+
+def run_prompts(
+    config: LaskConfig,
+    provider: str,
+    prompts: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Tuple[List[str], int]:
+    """
+    Send every prompt, with at most `concurrency` requests in flight.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The provider name
+        prompts (Iterable[str]): The prompts, built as they're needed
+        concurrency (int): Maximum number of requests in flight
+
+    Returns:
+        Tuple[List[str], int]: The answers in prompt order, and the number of
+                               prompts that failed
+    """
+    answers: Dict[int, str] = {}
+    failed = 0
+    read = 0
+    in_flight: Dict[Future, int] = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def drain(block_until_one: bool) -> None:
+            nonlocal failed
+            done, _ = wait(
+                list(in_flight),
+                timeout=None if block_until_one else 0,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    answers[index] = future.result()
+                except Exception as e:
+                    # An error here only loses a chunk
+                    failed += 1
+                    print(
+                        f"\nWarning: Part {index + 1} failed: {str(e) or type(e).__name__}",
+                        file=sys.stderr,
+                    )
+            _progress(f"{read} parts read, {len(answers)} answered, {failed} failed")
+
+        try:
+            for index, prompt in enumerate(prompts):
+                # Bound the prompts held in memory
+                while len(in_flight) >= concurrency * WINDOW_FACTOR:
+                    drain(block_until_one=True)
+                in_flight[executor.submit(ask_text, config, provider, prompt)] = index
+                read += 1
+                drain(block_until_one=False)
+
+            while in_flight:
+                drain(block_until_one=True)
+        except BaseException:
+            # Don't start queued chunks
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return [answers[index] for index in sorted(answers)], failed
+
+
+def group_answers(answers: List[str], max_chars: int) -> List[str]:
+    """
+    Join consecutive answers into reduce inputs of at most max_chars characters.
+
+    Args:
+        answers (List[str]): The answers, in input order
+        max_chars (int): Maximum characters per group
+
+    Returns:
+        List[str]: The groups; an answer longer than max_chars is a group of its own
+    """
+    groups: List[str] = []
+    current: List[str] = []
+    size = 0
+    for number, answer in enumerate(answers, 1):
+        text = f"Part {number}:\n{answer.strip()}\n\n"
+        if current and size + len(text) > max_chars:
+            groups.append("".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        groups.append("".join(current))
+    return groups
+
+
+def map_reduce(
+    config: LaskConfig,
+    provider: str,
+    lines: Iterable[str],
+    question: Optional[str] = None,
+    chunk_tokens: int = 8000,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Union[str, Iterator[str]]:
+    """
+    Answer a question about input too large for a single prompt.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The provider name
+        lines (Iterable[str]): The input, line by line
+        question (Optional[str]): The question, defaults to a summary request
+        chunk_tokens (int): Estimated tokens of input per request
+        concurrency (int): Maximum number of requests in flight
+
+    Returns:
+        Union[str, Iterator[str]]: The final answer, streamed if the provider streams
+
+    Raises:
+        ValueError: If the input is empty or every part failed
+    """
+    question = question or DEFAULT_QUESTION
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+
+    # Make sure the shared connection pools can hold every worker's connection
+    for provider_config in config.providers.values():
+        if (provider_config.pool_size or DEFAULT_POOL_SIZE) < concurrency:
+            provider_config.pool_size = concurrency
+
+    chunks = iter_chunks(lines, max_chars)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError("The input is empty")
+    second = next(chunks, None)
+    if second is None:
+        # Small enough to ask directly
+        return ask(config, provider, f"{question}\n\n{first}")
+
+    def map_prompts() -> Iterator[str]:
+        for index, chunk in enumerate(itertools.chain([first, second], chunks)):
+            yield MAP_PROMPT.format(question=question, number=index + 1, chunk=chunk)
+
+    answers, failed = run_prompts(config, provider, map_prompts(), concurrency)
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    if not answers:
+        raise ValueError("Every part of the input failed")
+    print(
+        f"[map-reduce] {len(answers) + failed} parts, {failed} failed; combining answers",
+        file=sys.stderr,
+    )
+
+    # Reduce in rounds until the answers fit a single prompt
+    groups = group_answers(answers, max_chars)
+    while len(groups) > 1:
+        answers, _ = run_prompts(
+            config,
+            provider,
+            (REDUCE_PROMPT.format(question=question, answers=g) for g in groups),
+            concurrency,
+        )
+        if sys.stderr.isatty():
+            print(file=sys.stderr)
+        if not answers:
+            raise ValueError("Every attempt to combine the answers failed")
+        reduced = group_answers(answers, max_chars)
+        if len(reduced) >= len(groups):
+            # Answers as long as a chunk can't be combined any further
+            groups = ["".join(reduced)]
+            break
+        groups = reduced
+    return ask(
+        config, provider, REDUCE_PROMPT.format(question=question, answers=groups[0])
+    )
@@ -0,0 +1,473 @@
+"""
+Per-request latency and throughput metrics.
+
+With ``--stats`` (or ``stats = true`` in [default]) every provider call is
+timed phase by phase and summarized on stderr after the response:
+
+    [stats] openai gpt-4.1: connect 48 ms, headers 412 ms, first token 415 ms,
+            63 tokens/s, total 2.31 s, 9.6 KB in 141 chunks
+
+Setting ``LASK_METRICS_FILE`` appends the same numbers for every call as one
+JSON line each, including failed and cancelled calls.
+
+The transports report into the metrics of the call running in the current
+thread or task (see current()), so the provider modules need no changes:
+connection setup is timed by the pooled connections themselves, header
+arrival comes from the HTTP client and bytes are counted as they're read.
+Connection time covers DNS, TCP and TLS, and is zero when a pooled
+connection was reused. Token rates are estimated from the text length;
+providers that report token usage and model latency, like Bedrock, add
+them with add_usage().
+
+The same measuring points emit the lifecycle events of src.hooks while
+hooks are registered.
+"""
+
+import itertools
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
+
+from src import hooks
+
+METRICS_FILE_ENV = "LASK_METRICS_FILE"
+
+# Rough characters per token, as in src.context
+CHARS_PER_TOKEN = 4
+
+# The metrics of the call being made in this thread or task
+_current: ContextVar[Optional["RequestMetrics"]] = ContextVar(
+    "lask_request_metrics", default=None
+)
+
+# Calls finished since the last drain(), kept only while --stats is on
+_finished: List["RequestMetrics"] = []
+_finished_lock = threading.Lock()
+_keep_finished = False
+
+_call_ids = itertools.count(1)
+
+
+def enabled(stats: bool = False) -> bool:
+    """
+    Check whether provider calls need to be measured.
+
+    Args:
+        stats (bool): Whether --stats is on
+
+    Returns:
+        bool: True with --stats, LASK_METRICS_FILE or registered hooks
+    """
+    return stats or hooks.active() or bool(os.environ.get(METRICS_FILE_ENV))
+
+
+def _is_cancellation(error: BaseException) -> bool:
+    """Check whether a call ended because it was abandoned rather than failed."""
+    if isinstance(error, (GeneratorExit, KeyboardInterrupt)):
+        return True
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is not None and isinstance(error, asyncio.CancelledError):
+        return True
+    # Imported here, as the transport itself reports into these metrics
+    from src.providers.transport import RequestCancelled
+
+    return isinstance(error, RequestCancelled)
+
+
+class RequestMetrics:
+    """Timings and counters of one provider call; times are seconds from its start."""
+
+    def __init__(self, provider: str, model: Optional[str]) -> None:
+        """
+        Args:
+            provider (str): The provider name
+            model (Optional[str]): The model the provider uses
+        """
+        self.provider = provider
+        self.model = model
+        self.call_id = next(_call_ids)
+        self.started_ns = time.time_ns()
+        self.started = self.started_ns / 1e9
+        self._start_ns = time.perf_counter_ns()
+        self._start = self._start_ns / 1e9
+        # DNS, TCP and TLS setup of new connections; zero when one was reused
+        self.connect: float = 0.0
+        self.connections = 0
+        self.connect_measured = True
+        self.headers: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.total: Optional[float] = None
+        self.bytes = 0
+        self.chunks = 0
+        self.chars = 0
+        self._first_chars = 0
+        self.retries = 0
+        # Token counts and model latency reported by the provider, if it does
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.provider_latency: Optional[float] = None
+        self.streaming = False
+        self.error: Optional[str] = None
+
+    def elapsed(self) -> float:
+        """Seconds since the call started."""
+        return time.perf_counter() - self._start
+
+    def _emit(
+        self,
+        name: str,
+        size: Optional[int] = None,
+        at: Optional[float] = None,
+        **attributes: Any,
+    ) -> None:
+        """Pass a lifecycle event to the hooks, if there are any."""
+        if not hooks.active():
+            return
+        monotonic_ns = time.perf_counter_ns() if at is None else int(at * 1e9)
+        hooks.emit(
+            hooks.CallEvent(
+                name,
+                self.call_id,
+                self.provider,
+                self.model,
+                monotonic_ns,
+                self.started_ns + monotonic_ns - self._start_ns,
+                size,
+                attributes,
+            )
+        )
+
+    def request_built(self, size: int, messages: int) -> None:
+        """
+        Record that the request is ready to be sent.
+
+        Args:
+            size (int): Characters of message text
+            messages (int): Number of messages
+        """
+        self._emit("request_built", size, messages=messages)
+
+    def add_connect(self, seconds: float) -> None:
+        """Record the setup time of a new connection."""
+        self.connect += seconds
+        self.connections += 1
+        self._emit(
+            "connection_acquired", reused=False, connect_ms=round(seconds * 1000, 3)
+        )
+
+    def connection_reused(self) -> None:
+        """Record that a pooled connection was taken for a request."""
+        self._emit("connection_acquired", reused=True)
+
+    def mark_headers(self, at: Optional[float] = None) -> None:
+        """
+        Record the arrival of the response headers.
+
+        Args:
+            at (Optional[float]): perf_counter() time of the arrival, defaults to now
+        """
+        at = at if at is not None else time.perf_counter()
+        self.headers = at - self._start
+        self._emit("headers_received", at=at)
+
+    def add_chunk(self, chunk: str) -> None:
+        """Record a chunk of response text."""
+        if self.first_token is None:
+            self.first_token = self.elapsed()
+            self._first_chars = len(chunk)
+            self._emit("first_chunk", len(chunk))
+        self.chunks += 1
+        self.chars += len(chunk)
+        self._emit("chunk", len(chunk))
+
+    def add_usage(
+        self,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        latency: Optional[float] = None,
+    ) -> None:
+        """
+        Record the token usage and latency reported by the provider.
+
+        Args:
+            input_tokens (Optional[int]): Tokens of the request
+            output_tokens (Optional[int]): Tokens of the response
+            latency (Optional[float]): Seconds the provider took, by its own clock
+        """
+        if input_tokens is not None:
+            self.input_tokens = input_tokens
+        if output_tokens is not None:
+            self.output_tokens = output_tokens
+        if latency is not None:
+            self.provider_latency = latency
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Record the end of the call and report it."""
+        if self.total is not None:
+            return
+        self.total = self.elapsed()
+        if error is None:
+            self._emit(
+                "complete",
+                self.bytes,
+                chunks=self.chunks,
+                chars=self.chars,
+                input_tokens=self.input_tokens,
+                output_tokens=self.output_tokens,
+            )
+        elif _is_cancellation(error):
+            self.error = "cancelled"
+            self._emit("cancelled", self.bytes, chunks=self.chunks)
+        else:
+            self.error = str(error) or type(error).__name__
+            self._emit(
+                "error",
+                self.bytes,
+                error=self.error,
+                error_type=type(error).__name__,
+                status=getattr(error, "status", None),
+            )
+        _report(self)
+
+    @property
+    def tokens(self) -> int:
+        """Tokens of response text, as reported or else estimated."""
+        if self.output_tokens is not None:
+            return self.output_tokens
+        return self.chars // CHARS_PER_TOKEN
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """
+        Estimated generation speed: for streams, the tokens after the first
+        chunk over the time they took; otherwise all tokens over the whole call.
+        """
+        if self.total is None or self.first_token is None:
+            return None
+        if not self.streaming:
+            return self.tokens / self.total if self.total > 0 else None
+        duration = self.total - self.first_token
+        if self.chunks < 2 or duration <= 0:
+            return None
+        return (self.chars - self._first_chars) / CHARS_PER_TOKEN / duration
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Get the metrics as written to LASK_METRICS_FILE.
+
+        Returns:
+            Dict[str, Any]: Times in milliseconds; unknown values are None
+        """
+
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        rate = self.tokens_per_second
+        return {
+            "time": round(self.started, 3),
+            "provider": self.provider,
+            "model": self.model,
+            "streaming": self.streaming,
+            "connect_ms": ms(self.connect) if self.connect_measured else None,
+            "connections": self.connections,
+            "headers_ms": ms(self.headers),
+            "first_token_ms": ms(self.first_token),
+            "total_ms": ms(self.total),
+            "tokens": self.tokens,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "provider_latency_ms": ms(self.provider_latency),
+            "tokens_per_s": None if rate is None else round(rate, 1),
+            "bytes": self.bytes,
+            "chunks": self.chunks,
+            "retries": self.retries,
+            "error": self.error,
+        }
+
+    def format(self) -> str:
+        """
+        Describe the metrics as shown by --stats.
+
+        Returns:
+            str: A one-line summary
+        """
+        parts = []
+        if not self.connect_measured:
+            parts.append("connect n/a")
+        elif self.connections:
+            parts.append(f"connect {self.connect * 1000:.0f} ms")
+        else:
+            parts.append("connection reused")
+        if self.headers is not None:
+            parts.append(f"headers {self.headers * 1000:.0f} ms")
+        if self.first_token is not None:
+            parts.append(f"first token {self.first_token * 1000:.0f} ms")
+        rate = self.tokens_per_second
+        if rate is not None:
+            parts.append(f"{rate:.0f} tokens/s")
+        if self.total is not None:
+            parts.append(f"total {self.total:.2f} s")
+        if self.provider_latency is not None:
+            parts.append(f"model {self.provider_latency * 1000:.0f} ms")
+        if self.input_tokens is not None or self.output_tokens is not None:
+            parts.append(
+                f"{self.input_tokens or 0} tokens in, {self.output_tokens or 0} out"
+            )
+        parts.append(f"{_format_bytes(self.bytes)} in {self.chunks} chunks")
+        if self.retries:
+            parts.append(f"{self.retries} retries")
+        if self.error:
+            parts.append(f"failed: {self.error}")
+        name = f"{self.provider} {self.model}" if self.model else self.provider
+        return f"{name}: " + ", ".join(parts)
+
+
+def _format_bytes(count: int) -> str:
+    """Format a byte count for humans."""
+    if count < 1024:
+        return f"{count} B"
+    if count < 1024 * 1024:
+        return f"{count / 1024:.1f} KB"
+    return f"{count / (1024 * 1024):.1f} MB"
+
+
+def keep_finished(enabled: bool = True) -> None:
+    """Keep finished calls for drain(), as --stats does."""
+    global _keep_finished
+    _keep_finished = enabled
+
+
+def drain() -> List[RequestMetrics]:
+    """
+    Take the calls that finished since the last drain.
+
+    Returns:
+        List[RequestMetrics]: The calls, in the order they finished
+    """
+    with _finished_lock:
+        finished = list(_finished)
+        _finished.clear()
+    return finished
+
+
+def _report(metrics: RequestMetrics) -> None:
+    """Keep a finished call for --stats and append it to LASK_METRICS_FILE."""
+    if _keep_finished:
+        with _finished_lock:
+            _finished.append(metrics)
+
+    path = os.environ.get(METRICS_FILE_ENV)
+    if not path:
+        return
+    import json
+
+    from src.locking import append_line
+
+    line = json.dumps(metrics.as_dict(), ensure_ascii=False) + "\n"
+    try:
+        append_line(path, line)
+    except OSError as e:
+        print(f"Warning: Could not write metrics to {path}: {e}", file=sys.stderr)
+
+
+def current() -> Optional[RequestMetrics]:
+    """Get the metrics of the call running in this thread or task, if it's measured."""
+    return _current.get()
+
+
+def measure(
+    metrics: RequestMetrics, call: Callable[[], Union[str, Iterator[str]]]
+) -> Union[str, Iterator[str]]:
+    """
+    Make a provider call with its metrics recorded.
+
+    Args:
+        metrics (RequestMetrics): The metrics to record into
+        call (Callable[[], Union[str, Iterator[str]]]): Makes the call
+
+    Returns:
+        Union[str, Iterator[str]]: The call's result; streams are measured
+                                   until they're exhausted or closed
+    """
+    token = _current.set(metrics)
+    try:
+        result = call()
+    except BaseException as e:
+        metrics.finish(e)
+        raise
+    finally:
+        _current.reset(token)
+
+    if isinstance(result, str):
+        metrics.add_chunk(result)
+        metrics.finish()
+        return result
+    metrics.streaming = True
+    return _measure_stream(metrics, iter(result))
+
+
+def _measure_stream(metrics: RequestMetrics, chunks: Iterator[str]) -> Iterator[str]:
+    """Yield a stream's chunks, making the metrics current while each is produced."""
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            # Streams send their request lazily and may be consumed by
+            # several threads (races), so set the metrics for every step
+            token = _current.set(metrics)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            finally:
+                _current.reset(token)
+            metrics.add_chunk(chunk)
+            yield chunk
+    except BaseException as e:
+        # Including GeneratorExit: the consumer stopped early, e.g. a race loser
+        error = e
+        raise
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        metrics.finish(error)
+
+
+async def ameasure(
+    metrics: RequestMetrics, chunks: AsyncIterator[str]
+) -> AsyncIterator[str]:
+    """
+    Yield the chunks of an async provider call with its metrics recorded.
+
+    Args:
+        metrics (RequestMetrics): The metrics to record into
+        chunks (AsyncIterator[str]): The call's chunks
+
+    Yields:
+        str: The chunks
+    """
+    metrics.streaming = True
+    error: Optional[BaseException] = None
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            metrics.add_chunk(chunk)
+            yield chunk
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        metrics.finish(error)
@@ -0,0 +1,127 @@
+"""
+Output handling for streamed responses.
+
+Fast models emit hundreds of tiny deltas per second. Writing and flushing each
+one costs a syscall per token, so OutputSink coalesces them: on a terminal it
+flushes once a time or size threshold is reached, and when piped it only writes
+once a large buffer has accumulated. A timer shows text that is still pending
+when the model pauses mid-answer.
+"""
+
+import sys
+import threading
+import time
+from typing import List, Optional, TextIO
+
+# Flush to a terminal at least this often while text is pending (seconds)
+DEFAULT_FLUSH_INTERVAL = 0.05
+# ...or as soon as this many characters are pending
+DEFAULT_FLUSH_SIZE = 512
+# When not writing to a terminal, hand text to the stream in blocks this large
+DEFAULT_PIPE_BUFFER_SIZE = 65536
+
+
+class OutputSink:
+    """
+    Collects streamed response text and writes it out in batches.
+
+    Usage:
+        sink = OutputSink()
+        for chunk in stream:
+            sink.write(chunk)
+        sink.close()
+        full_text = sink.getvalue()
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        pipe_buffer_size: int = DEFAULT_PIPE_BUFFER_SIZE,
+    ) -> None:
+        """
+        Args:
+            stream (Optional[TextIO]): Where to write, defaults to sys.stdout
+            flush_interval (float): Maximum delay before pending text is shown on a terminal
+            flush_size (int): Pending characters that trigger a flush on a terminal
+            pipe_buffer_size (int): Pending characters that trigger a write when piped
+        """
+        self.stream = stream if stream is not None else sys.stdout
+        try:
+            self.interactive = self.stream.isatty()
+        except (AttributeError, ValueError):
+            self.interactive = False
+
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size if self.interactive else pipe_buffer_size
+
+        self._parts: List[str] = []
+        self._pending: List[str] = []
+        self._pending_size = 0
+        # Start "overdue" so the first delta is shown immediately
+        self._last_flush = float("-inf")
+        # Flushes pending text if no further chunk arrives in time
+        self._timer: Optional[threading.Timer] = None
+        # The timer flushes from its own thread
+        self._lock = threading.Lock()
+
+    def write(self, chunk: str) -> None:
+        """
+        Add a chunk of response text.
+
+        Args:
+            chunk (str): The text delta
+        """
+        if not chunk:
+            return
+        with self._lock:
+            self._parts.append(chunk)
+            self._pending.append(chunk)
+            self._pending_size += len(chunk)
+
+            if self._pending_size >= self.flush_size:
+                self._flush()
+            elif self.interactive:
+                delay = self._last_flush + self.flush_interval - time.monotonic()
+                if delay <= 0:
+                    self._flush()
+                elif self._timer is None:
+                    self._timer = threading.Timer(delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def flush(self) -> None:
+        """Write all pending text to the stream."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Write all pending text; the caller holds the lock."""
+        if self._timer is not None:
+            # A no-op when called from the timer itself
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending.clear()
+            self._pending_size = 0
+        self.stream.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self, newline: bool = True) -> None:
+        """
+        Write any pending text and finish the response.
+
+        Args:
+            newline (bool): Whether to end the output with a newline
+        """
+        with self._lock:
+            if newline:
+                self._pending.append("\n")
+            self._flush()
+
+    def getvalue(self) -> str:
+        """Return all text written so far."""
+        with self._lock:
+            return "".join(self._parts)
@@ -6,32 +6,66 @@ Providers handle communication with various LLM APIs and support both:
 - Conversation history for multi-turn dialogues in REPL mode
 """
 
-from importlib import import_module
-from typing import Union, Iterator, List, Dict, Optional
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 from types import ModuleType
 
-from src.config import LaskConfig
+from src import hooks, metrics
+from src.config import LaskConfig, ProviderConfig
+from src.providers import registry
 
+if TYPE_CHECKING:
+    from src.ratelimit import RateLimiter
 
-def get_provider_module(provider_name: str) -> ModuleType:
+
+class RequestTemplate(NamedTuple):
+    """
+    A provider's request settings, resolved once from the configuration.
+
+    Built by each provider module's build_template() and cached per process
+    with LaskConfig.request_template(), so every request starts from it
+    instead of resolving API keys, defaults and system prompts again.
+    """
+
+    url: str
+    headers: Mapping[str, str]
+    # Fields sent in every request body (model, stream, sampling parameters)
+    body: Mapping[str, Any]
+    system_prompt: Optional[str]
+    # Model or deployment, as shown when prompting
+    model: str
+
+
+def get_provider_module(
+    provider_name: str, config: Optional[LaskConfig] = None
+) -> ModuleType:
     """
-    Dynamically import and return the provider module based on provider name.
+    Get the module handling a provider, importing it on first use.
 
     Args:
-        provider_name (str): The name of the provider (e.g., 'openai', 'anthropic', 'aws', 'azure')
+        provider_name (str): The name of the provider (e.g., 'openai', 'anthropic', 'aws',
+                             'azure'), a plugin provider or a named instance
+        config (Optional[LaskConfig]): Configuration with the named instances
 
     Returns:
-        ModuleType: The imported provider module
+        ModuleType: The provider module
 
     Raises:
         ImportError: If the provider module cannot be imported
     """
-    try:
-        return import_module(f"src.providers.{provider_name}")
-    except ImportError:
-        raise ImportError(
-            f"Provider '{provider_name}' is not supported. Make sure the module exists."
-        )
+    return registry.load(registry.provider_type(provider_name, config))
 
 
 def call_provider_api(
@@ -58,5 +92,289 @@ def call_provider_api(
     Raises:
         ImportError: If the provider is not supported
     """
-    provider_module = get_provider_module(provider_name)
-    return provider_module.call_api(config, prompt, conversation_history)
+    provider_module = get_provider_module(provider_name, config)
+    conversation_history = strip_metadata(conversation_history)
+    if not config.cache:
+        return _send(
+            provider_module, provider_name, config, prompt, conversation_history
+        )
+
+    # Imported here so uncached calls don't pay for the cache machinery
+    from src import cache
+
+    provider_config = config.get_provider_config(provider_name)
+    key = cache.make_key(
+        provider_name,
+        resolve_model(provider_module, provider_config),
+        provider_config.temperature,
+        provider_config.max_tokens,
+        resolve_messages(config, provider_name, prompt, conversation_history),
+    )
+    response_cache = cache.ResponseCache.from_config(config)
+
+    chunks = response_cache.get(key)
+    if chunks is not None:
+        if provider_config.get("streaming", True):
+            return cache.replay(chunks)
+        return "".join(chunks)
+
+    result = _send(provider_module, provider_name, config, prompt, conversation_history)
+    if isinstance(result, str):
+        response_cache.put(key, [result])
+        return result
+    return cache.record(result, response_cache, key)
+
+
+async def acall_provider_api(
+    provider_name: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Call the appropriate provider API from async code.
+
+    The async counterpart of call_provider_api: requests run on a shared
+    event-loop HTTP client, so many prompts can be in flight at once without
+    a thread each. Requires the optional httpx dependency.
+
+    Args:
+        provider_name (str): The name of the provider
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             in the format {"role": "...", "content": "..."}
+                                                             If provided, uses this for context.
+
+    Yields:
+        str: Chunks of the response as they arrive
+
+    Raises:
+        ImportError: If the provider is not supported or httpx is not installed
+    """
+    provider_module = get_provider_module(provider_name, config)
+    conversation_history = strip_metadata(conversation_history)
+    if not config.cache:
+        async for chunk in _asend(
+            provider_module, provider_name, config, prompt, conversation_history
+        ):
+            yield chunk
+        return
+
+    # Imported here so uncached calls don't pay for the cache machinery
+    from src import cache
+
+    provider_config = config.get_provider_config(provider_name)
+    key = cache.make_key(
+        provider_name,
+        resolve_model(provider_module, provider_config),
+        provider_config.temperature,
+        provider_config.max_tokens,
+        resolve_messages(config, provider_name, prompt, conversation_history),
+    )
+    response_cache = cache.ResponseCache.from_config(config)
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        for chunk in cached:
+            yield chunk
+        return
+
+    chunks: List[str] = []
+    async for chunk in _asend(
+        provider_module, provider_name, config, prompt, conversation_history
+    ):
+        chunks.append(chunk)
+        yield chunk
+    # Only complete responses are cached
+    response_cache.put(key, chunks)
+
+
+def _start_metrics(
+    provider_module: ModuleType,
+    provider_name: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+) -> Optional[metrics.RequestMetrics]:
+    """Start measuring a call if --stats, LASK_METRICS_FILE or a hook asks for it."""
+    if not metrics.enabled(config.stats):
+        return None
+    request_metrics = metrics.RequestMetrics(
+        provider_name,
+        resolve_model(provider_module, config.get_provider_config(provider_name)),
+    )
+    if hooks.active():
+        messages = resolve_messages(config, provider_name, prompt, conversation_history)
+        request_metrics.request_built(
+            sum(len(m["content"]) for m in messages), len(messages)
+        )
+    return request_metrics
+
+
+def _send(
+    provider_module: ModuleType,
+    provider_name: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+) -> Union[str, Iterator[str]]:
+    """Send a request to a provider once its rate limits allow, measuring it if asked to."""
+    limit = _rate_limit(provider_name, config, prompt, conversation_history)
+    # Named instances are called with the name of their config section
+    kwargs = registry.call_kwargs(provider_name, config)
+
+    def call() -> Union[str, Iterator[str]]:
+        return provider_module.call_api(config, prompt, conversation_history, **kwargs)
+
+    if limit is not None:
+        from src.providers import retry
+
+        limiter, tokens = limit
+        limiter.acquire(tokens)
+        # Retries are requests too, so each one waits for the limits again
+        call = partial(retry.before_retries, partial(limiter.acquire, tokens), call)
+
+    request_metrics = _start_metrics(
+        provider_module, provider_name, config, prompt, conversation_history
+    )
+    if request_metrics is None:
+        return call()
+    return metrics.measure(request_metrics, call)
+
+
+async def _asend(
+    provider_module: ModuleType,
+    provider_name: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+) -> AsyncIterator[str]:
+    """Send a request to a provider from async code, see _send()."""
+    limit = _rate_limit(provider_name, config, prompt, conversation_history)
+    chunks = provider_module.acall_api(
+        config,
+        prompt,
+        conversation_history,
+        **registry.call_kwargs(provider_name, config),
+    )
+    if limit is not None:
+        from src.providers import retry
+
+        limiter, tokens = limit
+        await limiter.aacquire(tokens)
+        chunks = retry.abefore_retries(
+            partial(limiter.aacquire, tokens),
+            chunks,
+            partial(limiter.acquire, tokens),
+        )
+    request_metrics = _start_metrics(
+        provider_module, provider_name, config, prompt, conversation_history
+    )
+    if request_metrics is not None:
+        chunks = metrics.ameasure(request_metrics, chunks)
+    async for chunk in chunks:
+        yield chunk
+
+
+def _rate_limit(
+    provider_name: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+) -> Optional[Tuple["RateLimiter", int]]:
+    """
+    Get the provider's rate limiter, if it has limits (rpm and tpm settings),
+    and the estimated tokens each attempt of this request takes from it.
+    """
+    provider_config = config.get_provider_config(provider_name)
+    if not provider_config.rpm and not provider_config.tpm:
+        return None
+
+    # Imported here so unlimited providers don't load the limiter
+    from src import ratelimit
+
+    limiter = ratelimit.RateLimiter.from_config(config, provider_name)
+    if limiter is None:
+        return None
+    return limiter, ratelimit.request_tokens(
+        resolve_messages(config, provider_name, prompt, conversation_history),
+        provider_config.max_tokens,
+    )
+
+
+def strip_metadata(
+    messages: Optional[List[Dict[str, str]]],
+) -> Optional[List[Dict[str, str]]]:
+    """
+    Drop lask's own bookkeeping keys (such as "provider") from messages.
+
+    The REPL records extra keys on conversation messages; provider APIs
+    reject unknown message fields, so only role and content are sent.
+
+    Args:
+        messages (Optional[List[Dict[str, str]]]): The conversation messages
+
+    Returns:
+        Optional[List[Dict[str, str]]]: The messages as the APIs expect them
+    """
+    if messages is None or all(len(m) == 2 for m in messages):
+        return messages
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+
+def resolve_messages(
+    config: LaskConfig,
+    provider_name: str,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Build the message list a provider will send for a prompt.
+
+    Mirrors what the provider modules do: the conversation history is used
+    as-is when given, otherwise the system prompt (provider-specific first,
+    then the default) is followed by the user prompt.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider_name (str): The name of the provider
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+
+    Returns:
+        List[Dict[str, str]]: The resolved messages
+    """
+    if conversation_history is not None:
+        return conversation_history
+
+    messages: List[Dict[str, str]] = []
+    provider_system_prompt = config.get_provider_config(provider_name).system_prompt
+    if provider_system_prompt is not None:
+        messages.append({"role": "system", "content": provider_system_prompt})
+    elif config.system_prompt is not None:
+        messages.append({"role": "system", "content": config.system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def resolve_model(
+    provider_module: ModuleType, provider_config: ProviderConfig
+) -> Optional[str]:
+    """
+    Get the model a provider will use: the configured model, model id or
+    deployment, falling back to the provider module's DEFAULT_MODEL.
+
+    Args:
+        provider_module (ModuleType): The provider module
+        provider_config (ProviderConfig): The provider's configuration
+
+    Returns:
+        Optional[str]: The model name, if one can be determined
+    """
+    return (
+        provider_config.model
+        or provider_config.model_id
+        or provider_config.deployment_id
+        or getattr(provider_module, "DEFAULT_MODEL", None)
+    )
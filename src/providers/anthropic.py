@@ -3,57 +3,114 @@ Anthropic provider module for lask
 """
 
 import os
-import sys
-import json
-from typing import Dict, Any, Optional, Union, Iterator, List
+from functools import partial
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Union, Iterator, AsyncIterator, List, Tuple
 import requests
 
-from src.config import LaskConfig
+from src.config import LaskConfig, ProviderConfig
+from src.providers import RequestTemplate, codec, prompt_cache, retry, sse, transport
 
+API_URL = "https://api.anthropic.com/v1/messages"
+DEFAULT_MODEL = "claude-3-opus-20240229"
 
-def call_api(
-    config: LaskConfig,
-    prompt: str,
-    conversation_history: Optional[List[Dict[str, str]]] = None,
-) -> Union[str, Iterator[str]]:
+
+def build_template(config: LaskConfig, provider: str = "anthropic") -> RequestTemplate:
     """
-    Call the Anthropic API with the given prompt.
+    Resolve the Anthropic request settings from the configuration.
 
     Args:
         config (LaskConfig): Configuration object
-        prompt (str): The user prompt
-        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
-                                                             for multi-turn dialogues
+        provider (str): The config section to use, the name of a named
+                        instance or "anthropic"
 
     Returns:
-        Union[str, Iterator[str]]: The response from the Anthropic API,
-                                  either full text or a stream iterator
+        RequestTemplate: The settings every Anthropic request starts from
 
     Raises:
-        Exception: If there's an error calling the Anthropic API
+        ValueError: If no API key is configured for api.anthropic.com
     """
     # Get provider-specific config
-    anthropic_config = config.get_provider_config("anthropic")
+    anthropic_config = config.get_provider_config(provider)
+
+    # Gateways and proxies take the same path under their own API root
+    url = API_URL
+    if anthropic_config.base_url:
+        url = anthropic_config.base_url.rstrip("/") + "/v1/messages"
 
-    # Get API key
+    # Get API key; a server at a base_url may not need one
     api_key: Optional[str] = os.getenv("ANTHROPIC_API_KEY") or anthropic_config.api_key
-    if not api_key:
-        print(
-            "Error: Please set the ANTHROPIC_API_KEY environment variable or add 'api_key' under [anthropic] section in ~/.lask-config"
+    if not api_key and not anthropic_config.base_url:
+        raise ValueError(
+            f"Please set the ANTHROPIC_API_KEY environment variable or add 'api_key' under [{provider}] section in ~/.lask-config"
         )
-        sys.exit(1)
 
     # Get model (Claude by default)
-    model: str = anthropic_config.model or "claude-3-opus-20240229"
+    model: str = anthropic_config.model or DEFAULT_MODEL
 
     # Check if streaming is enabled (default to True)
     streaming: bool = anthropic_config.get("streaming", True)
 
-    headers: Dict[str, str] = {
-        "x-api-key": api_key,
-        "anthropic-version": "2023-06-01",
-        "Content-Type": "application/json",
+    body: Dict[str, Any] = {
+        "model": model,
+        "max_tokens": anthropic_config.max_tokens or 4096,
+        "stream": streaming,
     }
+    if anthropic_config.temperature is not None:
+        body["temperature"] = anthropic_config.temperature
+
+    headers = {"anthropic-version": "2023-06-01", "Content-Type": "application/json"}
+    if api_key:
+        headers["x-api-key"] = api_key
+
+    return RequestTemplate(
+        url=url,
+        headers=MappingProxyType(headers),
+        body=MappingProxyType(body),
+        # The provider's system prompt overrides the default one
+        system_prompt=(
+            anthropic_config.system_prompt
+            if anthropic_config.system_prompt is not None
+            else config.system_prompt
+        ),
+        model=model,
+    )
+
+
+def get_template(config: LaskConfig, provider: str = "anthropic") -> RequestTemplate:
+    """
+    Get the request template of the Anthropic provider or a named instance.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The config section to use
+
+    Returns:
+        RequestTemplate: The cached template
+    """
+    return config.request_template(provider, partial(build_template, provider=provider))
+
+
+def build_request(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "anthropic",
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Build the headers and body of an Anthropic messages request.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, Any]]: Request headers and request data
+    """
+    template = get_template(config, provider)
 
     # If conversation history is provided, use that instead of building new messages
     if conversation_history is not None:
@@ -62,41 +119,125 @@ def call_api(
         messages = []
 
         # Add system prompt if available
-        provider_system_prompt = anthropic_config.system_prompt
-        default_system_prompt = config.system_prompt
-
-        # For Anthropic, system prompts are handled differently
-        # Claude uses a "system" role message at the start of the conversation
-        if provider_system_prompt is not None:
-            messages.append({"role": "system", "content": provider_system_prompt})
-        elif default_system_prompt is not None:
-            messages.append({"role": "system", "content": default_system_prompt})
+        if template.system_prompt is not None:
+            messages.append({"role": "system", "content": template.system_prompt})
 
         # Add user message
         messages.append({"role": "user", "content": prompt})
 
-    data: Dict[str, Any] = {
-        "model": model,
-        "messages": messages,
-        "max_tokens": anthropic_config.max_tokens or 4096,
-        "stream": streaming,
-    }
+    # Claude takes system prompts as a top-level field, and caches the
+    # stable prefix of the request at the cache_control breakpoints
+    system, messages = prompt_cache.build_messages(
+        messages,
+        cache=config.get_provider_config(provider).get("prompt_cache", True),
+    )
 
-    if anthropic_config.temperature is not None:
-        data["temperature"] = anthropic_config.temperature
+    data: Dict[str, Any] = dict(template.body)
+    if system is not None:
+        data["system"] = system
+    data["messages"] = messages
 
     # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
     if conversation_history is None:
-        print(f"Prompting Anthropic API with model {model}: {prompt}\n")
+        api = "Anthropic API" if provider == "anthropic" else provider
+        print(f"Prompting {api} with model {template.model}: {prompt}\n")
+
+    return dict(template.headers), data
+
+
+def call_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "anthropic",
+) -> Union[str, Iterator[str]]:
+    """
+    Call the Anthropic API with the given prompt.
 
-    if streaming:
-        return stream_anthropic_response(headers, data)
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
+
+    Returns:
+        Union[str, Iterator[str]]: The response from the Anthropic API,
+                                  either full text or a stream iterator
+
+    Raises:
+        Exception: If there's an error calling the Anthropic API
+    """
+    anthropic_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    url = get_template(config, provider).url
+
+    if data["stream"]:
+        return stream_anthropic_response(headers, data, anthropic_config, url)
     else:
-        return non_streaming_anthropic_response(headers, data)
+        return non_streaming_anthropic_response(headers, data, anthropic_config, url)
+
+
+async def acall_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "anthropic",
+) -> AsyncIterator[str]:
+    """
+    Call the Anthropic API with the given prompt from async code.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
+
+    Yields:
+        str: Chunks of the response as they arrive; the full text as a single
+             chunk when streaming is disabled
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status or a stream
+                             error event after retrying
+    """
+    # Imported here so the synchronous path doesn't load asyncio
+    from src.providers import async_transport
+
+    anthropic_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    url = get_template(config, provider).url
+
+    if data["stream"]:
+
+        async def attempt() -> AsyncIterator[str]:
+            async for event in async_transport.aiter_events(
+                url, anthropic_config, headers, data
+            ):
+                if event.event in _DECODED_EVENTS:
+                    text = _parse_anthropic_event(event)
+                    if text:
+                        yield text
+
+        # Failures before the first chunk are retried transparently
+        async for text in retry.astream(attempt, anthropic_config, url):
+            yield text
+    else:
+        result = await retry.acall(
+            lambda: async_transport.apost_json(url, anthropic_config, headers, data),
+            anthropic_config,
+            url,
+        )
+        prompt_cache.record_usage(result.get("usage"))
+        yield result["content"][0]["text"]
 
 
 def stream_anthropic_response(
-    headers: Dict[str, str], data: Dict[str, Any]
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
+    url: Optional[str] = None,
 ) -> Iterator[str]:
     """
     Stream the response from Anthropic API.
@@ -104,38 +245,93 @@ def stream_anthropic_response(
     Args:
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
+        url (Optional[str]): The messages endpoint, defaults to API_URL
 
     Yields:
         str: Chunks of the response as they arrive
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
-    response = requests.post(
-        "https://api.anthropic.com/v1/messages", headers=headers, json=data, stream=True
-    )
+    read_size = provider_config.read_size if provider_config else None
+    url = url or API_URL
+
+    def attempt() -> Iterator[str]:
+        response = transport.post(
+            url, provider_config, headers=headers, data=codec.dumps(data), stream=True
+        )
+        # Always release the pooled connection, even if the consumer stops early
+        with response:
+            retry.check_response(response)
+            yield from _iter_anthropic_deltas(response, read_size)
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
-
-    for line in response.iter_lines():
-        if line:
-            line_str = line.decode("utf-8")
-            # Skip the "data: [DONE]" message
-            if line_str == "data: [DONE]":
-                continue
-            # Skip empty data lines
-            if line_str.startswith("data: "):
-                json_str = line_str[6:]  # Remove "data: " prefix
-                try:
-                    chunk = json.loads(json_str)
-                    if "type" in chunk and chunk["type"] == "content_block_delta":
-                        if "delta" in chunk and "text" in chunk["delta"]:
-                            yield chunk["delta"]["text"]
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse JSON: {json_str}")
+    # Failures before the first chunk are retried transparently
+    yield from retry.stream(attempt, provider_config, url)
+
+
+# Event types whose payload needs decoding; ping, content_block_start and friends
+# carry no text and are skipped without parsing their JSON. message_start
+# carries the input token usage, including prompt cache reads and writes.
+_DECODED_EVENTS = {"content_block_delta", "error", "message", "message_start"}
+
+# Stream error types that are worth retrying if no text has arrived yet
+_RETRYABLE_STREAM_ERRORS = {"overloaded_error", "rate_limit_error", "api_error"}
+
+
+def _iter_anthropic_deltas(
+    response: requests.Response, read_size: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yield text deltas from an Anthropic server-sent event stream.
+
+    Raises:
+        retry.ProviderError: If the stream reports an error event
+    """
+    for event in sse.iter_response_events(response, read_size):
+        if event.event in _DECODED_EVENTS:
+            text = _parse_anthropic_event(event)
+            if text:
+                yield text
+
+
+def _parse_anthropic_event(event: sse.ServerSentEvent) -> Optional[str]:
+    """
+    Return the text delta carried by one stream event, if any.
+
+    Raises:
+        retry.ProviderError: If the event reports a stream error
+    """
+    try:
+        # Text deltas make up most of a stream, so only their text is decoded
+        if event.event == "content_block_delta":
+            return codec.delta_decoder("delta", "text")(event.data)
+        chunk = codec.loads(event.data)
+    except codec.DecodeError:
+        print(f"Warning: Could not parse JSON: {event.data}")
+        return None
+
+    chunk_type = chunk.get("type")
+    if chunk_type == "content_block_delta":
+        return chunk.get("delta", {}).get("text")
+    if chunk_type == "message_start":
+        prompt_cache.record_usage(chunk.get("message", {}).get("usage"))
+        return None
+    if chunk_type == "error":
+        error = chunk.get("error", {})
+        raise retry.ProviderError(
+            f"Anthropic stream error: {error.get('type')} {error.get('message')}",
+            # Overloaded and rate limited streams can be sent again
+            retryable=error.get("type") in _RETRYABLE_STREAM_ERRORS,
+        )
+    return None
 
 
 def non_streaming_anthropic_response(
-    headers: Dict[str, str], data: Dict[str, Any]
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
+    url: Optional[str] = None,
 ) -> str:
     """
     Get a non-streaming response from Anthropic API.
@@ -143,20 +339,28 @@ def non_streaming_anthropic_response(
     Args:
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data without streaming
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
+        url (Optional[str]): The messages endpoint, defaults to API_URL
 
     Returns:
         str: The full response
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
     # Disable streaming for non-streaming request
     data["stream"] = False
+    url = url or API_URL
 
-    response: requests.Response = requests.post(
-        "https://api.anthropic.com/v1/messages", headers=headers, json=data
-    )
+    def attempt() -> requests.Response:
+        return retry.check_response(
+            transport.post(
+                url, provider_config, headers=headers, data=codec.dumps(data)
+            )
+        )
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
+    response: requests.Response = retry.call(attempt, provider_config, url)
 
-    result: Dict[str, Any] = response.json()
+    result: Dict[str, Any] = codec.loads(response.content)
+    prompt_cache.record_usage(result.get("usage"))
     return result["content"][0]["text"]
@@ -0,0 +1,231 @@
+"""
+Asynchronous HTTP transport for the provider modules' ``acall_api`` functions.
+
+Uses one ``httpx.AsyncClient`` per event loop, so any number of concurrent
+streams share pooled keep-alive connections (multiplexed over HTTP/2 when the
+``h2`` package is installed) without a thread per request. httpx is an
+optional dependency and is only imported when the async API is used.
+"""
+
+import asyncio
+import contextvars
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, TypeVar
+
+from src import metrics
+from src.config import ProviderConfig
+from src.providers import codec, retry, sse
+from src.providers.transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE
+
+T = TypeVar("T")
+
+# One client per running event loop; clients can't be shared between loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _import_httpx():
+    """Import httpx, explaining how to install it if it's missing."""
+    try:
+        import httpx  # type: ignore
+    except ImportError:
+        raise ImportError(
+            "httpx is required for the async API. Install it with: pip install httpx "
+            "or install lask with async support: pip install lask[async]"
+        )
+    return httpx
+
+
+def get_async_client():
+    """
+    Get the shared ``httpx.AsyncClient`` for the running event loop.
+
+    Returns:
+        httpx.AsyncClient: A pooled client bound to the current loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        httpx = _import_httpx()
+        try:
+            import h2  # type: ignore # noqa: F401
+
+            http2 = True
+        except ImportError:
+            http2 = False
+        client = httpx.AsyncClient(
+            http2=http2,
+            # Every in-flight stream needs its own HTTP/1.1 connection, so only
+            # the number of idle connections kept around is bounded
+            limits=httpx.Limits(
+                max_connections=None, max_keepalive_connections=DEFAULT_POOL_SIZE
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose_client() -> None:
+    """Close the client of the running event loop, if one was created."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _trace_extensions() -> Dict[str, Any]:
+    """
+    Build httpx request extensions that report connection setup or reuse and
+    header arrival to the metrics of the current call, if it's measured.
+    """
+    request_metrics = metrics.current()
+    if request_metrics is None:
+        return {}
+    connect_started: Optional[float] = None
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        nonlocal connect_started
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            connect_started = now
+        elif event.endswith(".send_request_headers.started"):
+            if connect_started is None:
+                request_metrics.connection_reused()
+            else:
+                # DNS lookup, TCP handshake and, for HTTPS, the TLS handshake
+                request_metrics.add_connect(now - connect_started)
+        elif event.endswith(".receive_response_headers.complete"):
+            request_metrics.mark_headers(now)
+
+    return {"trace": trace}
+
+
+def _get_timeout(provider_config: Optional[ProviderConfig]):
+    """Build an httpx timeout from the provider's connect and read timeouts."""
+    httpx = _import_httpx()
+    if provider_config is None:
+        return httpx.Timeout(None, connect=DEFAULT_CONNECT_TIMEOUT)
+    return httpx.Timeout(
+        provider_config.timeout,
+        connect=provider_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+    )
+
+
+async def apost_json(
+    url: str,
+    provider_config: Optional[ProviderConfig],
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    POST a JSON request and return the decoded JSON response.
+
+    Args:
+        url (str): The URL to post to
+        provider_config (Optional[ProviderConfig]): Provider settings for timeouts
+        headers (Dict[str, str]): Request headers
+        data (Dict[str, Any]): Request body
+
+    Returns:
+        Dict[str, Any]: The decoded response body
+
+    Raises:
+        retry.ProviderError: If the response status isn't 200
+    """
+    response = await get_async_client().post(
+        url,
+        headers=headers,
+        content=codec.dumps(data),
+        timeout=_get_timeout(provider_config),
+        extensions=_trace_extensions(),
+    )
+    retry.check_response(response)
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.bytes += len(response.content)
+    return codec.loads(response.content)
+
+
+async def aiter_events(
+    url: str,
+    provider_config: Optional[ProviderConfig],
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+) -> AsyncIterator[sse.ServerSentEvent]:
+    """
+    POST a streaming request and yield its server-sent events.
+
+    The connection is returned to the pool when the stream ends or the
+    consumer closes the iterator.
+
+    Args:
+        url (str): The URL to post to
+        provider_config (Optional[ProviderConfig]): Provider settings for timeouts
+        headers (Dict[str, str]): Request headers
+        data (Dict[str, Any]): Request body
+
+    Yields:
+        sse.ServerSentEvent: Events as soon as they are complete
+
+    Raises:
+        retry.ProviderError: If the response status isn't 200
+    """
+    client = get_async_client()
+    request_metrics = metrics.current()
+    async with client.stream(
+        "POST",
+        url,
+        headers=headers,
+        content=codec.dumps(data),
+        timeout=_get_timeout(provider_config),
+        extensions=_trace_extensions(),
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            retry.check_response(response)
+        parser = sse.SSEParser()
+        async for chunk in response.aiter_bytes():
+            if request_metrics is not None:
+                request_metrics.bytes += len(chunk)
+            for event in parser.feed(chunk):
+                yield event
+        for event in parser.close():
+            yield event
+
+
+_SENTINEL = object()
+
+
+async def aiter_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterator from async code, one item per executor call.
+
+    Used for SDKs without an asyncio API (boto3), so the event loop is never
+    blocked while waiting for the next item.
+
+    Args:
+        iterator (Iterator[T]): The blocking iterator
+
+    Yields:
+        T: Each item of the iterator
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Executor threads don't inherit the task's context (the metrics
+            # of the current call), so run each step in a copy of it
+            item = await loop.run_in_executor(
+                None, contextvars.copy_context().run, next, iterator, _SENTINEL
+            )
+            if item is _SENTINEL:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # Still running in the executor after a cancellation
+                pass
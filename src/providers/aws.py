@@ -1,18 +1,113 @@
 """
 AWS Bedrock provider module for lask
+
+Models are called through one of two Bedrock APIs: InvokeModel, with the
+request and stream formats of each model family (see bedrock_models), or
+Converse, which takes the same messages and inference settings for every
+model and reports token usage and latency with each response.
 """
 
-import sys
-import json
-from typing import Dict, Any, cast, Union, Iterator, List, Optional
+import contextvars
+import threading
+from typing import (
+    Callable,
+    Dict,
+    Any,
+    Union,
+    Iterator,
+    AsyncIterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src import metrics
+from src.config import LaskConfig, ProviderConfig
+from src.providers import bedrock_models, codec, prompt_cache, retry, transport
+from src.providers.transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+)
+
+DEFAULT_MODEL = "anthropic.claude-3-sonnet-20240229-v1:0"
+DEFAULT_REGION = "us-east-1"
+
+# Values of the bedrock_api setting
+BEDROCK_APIS = ("converse", "invoke_model")
+
+# Converse's equivalent of a cache_control breakpoint
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# One bedrock-runtime client per (region, profile, endpoint); boto3 clients are
+# thread-safe once created, but creating them isn't, hence the lock
+_clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(aws_config: ProviderConfig) -> Any:
+    """
+    Get the shared Bedrock Runtime client for a provider config, creating it if needed.
+
+    Creating a client loads the botocore service model and resolves
+    credentials, which takes hundreds of milliseconds, so clients are kept
+    for the lifetime of the process. The pool and retry settings of the first
+    caller for a region, profile and endpoint are used.
 
-from src.config import LaskConfig
+    Args:
+        aws_config (ProviderConfig): The [aws] provider settings
+
+    Returns:
+        botocore.client.BaseClient: A bedrock-runtime client
+    """
+    key = (
+        aws_config.region or DEFAULT_REGION,
+        aws_config.profile,
+        # base_url is accepted as well, like for the other providers
+        aws_config.endpoint_url or aws_config.base_url,
+    )
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _create_client(aws_config, *key)
+                _clients[key] = client
+    return client
+
+
+def _create_client(
+    aws_config: ProviderConfig,
+    region: str,
+    profile: Optional[str],
+    endpoint_url: Optional[str],
+) -> Any:
+    """Create a bedrock-runtime client with pooled keep-alive connections and client-side rate limiting."""
+    import boto3  # type: ignore
+    from botocore.config import Config  # type: ignore
+
+    client_config = Config(
+        max_pool_connections=aws_config.get("pool_size", DEFAULT_POOL_SIZE),
+        tcp_keepalive=True,
+        connect_timeout=aws_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        # Retries are left to src.providers.retry, which also covers errors
+        # inside response streams; adaptive mode still slows the client down
+        # when Bedrock throttles
+        retries={"mode": "adaptive", "total_max_attempts": 1},
+    )
+    if aws_config.timeout is not None:
+        client_config = client_config.merge(Config(read_timeout=aws_config.timeout))
+
+    session = boto3.Session(profile_name=profile, region_name=region)
+    return session.client(
+        service_name="bedrock-runtime", endpoint_url=endpoint_url, config=client_config
+    )
 
 
 def call_api(
     config: LaskConfig,
     prompt: str,
     conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "aws",
 ) -> Union[str, Iterator[str]]:
     """
     Call the AWS Bedrock API with the given prompt.
@@ -22,6 +117,7 @@ def call_api(
         prompt (str): The user prompt
         conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
                                                              for multi-turn dialogues
+        provider (str): The config section to use, for named instances
 
     Returns:
         Union[str, Iterator[str]]: The response from the AWS Bedrock API,
@@ -29,101 +125,170 @@ def call_api(
 
     Raises:
         ImportError: If boto3 is not installed
+        ValueError: If bedrock_api names an unknown API
         Exception: If there's an error calling the AWS Bedrock API
     """
     # We import boto3 only when needed to avoid requiring it for users who don't use AWS
     try:
-        import boto3  # type: ignore
+        import boto3  # type: ignore # noqa: F401 - checks that boto3 is installed
     except ImportError:
-        print("Error: boto3 is required for AWS Bedrock.")
-        print("Install it with: pip install boto3")
-        print("Or install lask with AWS support: pip install lask[aws]")
-        sys.exit(1)
+        raise ImportError(
+            "boto3 is required for AWS Bedrock. Install it with: pip install boto3 "
+            "(or install lask with AWS support: pip install lask[aws])"
+        ) from None
 
     # Get provider-specific config
-    aws_config = config.get_provider_config("aws")
+    aws_config = config.get_provider_config(provider)
 
     # Get the model ID
-    model_id: str = aws_config.model_id or "anthropic.claude-3-sonnet-20240229-v1:0"
-    region: str = aws_config.region or "us-east-1"
+    model_id: str = aws_config.model_id or DEFAULT_MODEL
 
     # Check if streaming is enabled (default to True)
     streaming: bool = aws_config.get("streaming", True)
 
-    # Create a Bedrock Runtime client
-    bedrock = boto3.client(service_name="bedrock-runtime", region_name=region)
+    # Reuse the process-wide Bedrock Runtime client
+    bedrock = get_client(aws_config)
 
-    # Prepare the request body based on the model provider
-    body: Dict[str, Any] = {}
+    # The request and response formats depend on the model's family
+    family = bedrock_models.model_family(model_id)
 
-    # Get system prompts
-    provider_system_prompt = aws_config.system_prompt
-    default_system_prompt = config.system_prompt
-
-    if "anthropic" in model_id:
-        # If conversation history is provided, use that instead of building new messages
-        if conversation_history is not None:
-            messages = conversation_history
-        else:
-            messages = []
-
-            # Add system prompt if available
-            if provider_system_prompt is not None:
-                messages.append({"role": "system", "content": provider_system_prompt})
-            elif default_system_prompt is not None:
-                messages.append({"role": "system", "content": default_system_prompt})
-
-            # Add user message
-            messages.append({"role": "user", "content": prompt})
-
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": aws_config.max_tokens or 4096,
-            "messages": messages,
-            "stream": streaming,
-        }
-        if aws_config.temperature is not None:
-            body["temperature"] = aws_config.temperature
-    elif "amazon" in model_id:
-        # For Amazon models, we might need to prepend the system prompt to the input text
-        input_text = prompt
-        if provider_system_prompt is not None:
-            input_text = f"System: {provider_system_prompt}\n\nUser: {prompt}"
-        elif default_system_prompt is not None:
-            input_text = f"System: {default_system_prompt}\n\nUser: {prompt}"
-
-        body = {
-            "inputText": input_text,
-            "textGenerationConfig": {"maxTokenCount": aws_config.max_tokens or 4096},
-        }
-        if aws_config.temperature is not None:
-            body["textGenerationConfig"]["temperature"] = aws_config.temperature
+    # If conversation history is provided, use that instead of building new messages
+    if conversation_history is not None:
+        messages = conversation_history
     else:
-        # Default format for other models
-        system_text = ""
-        if provider_system_prompt is not None:
-            system_text = f"System: {provider_system_prompt}\n\n"
-        elif default_system_prompt is not None:
-            system_text = f"System: {default_system_prompt}\n\n"
-
-        body = {
-            "prompt": f"{system_text}User: {prompt}",
-            "max_tokens": aws_config.max_tokens or 4096,
-        }
-        if aws_config.temperature is not None:
-            body["temperature"] = aws_config.temperature
+        messages = []
+
+        # Add system prompt if available
+        if aws_config.system_prompt is not None:
+            messages.append({"role": "system", "content": aws_config.system_prompt})
+        elif config.system_prompt is not None:
+            messages.append({"role": "system", "content": config.system_prompt})
+
+        # Add user message
+        messages.append({"role": "user", "content": prompt})
+
+    # Models without a known InvokeModel format are called through Converse
+    default_api = (
+        "converse" if family is bedrock_models.DEFAULT_FAMILY else "invoke_model"
+    )
+    api = aws_config.get("bedrock_api", default_api).lower()
+    if api not in BEDROCK_APIS:
+        raise ValueError(
+            f"Unknown bedrock_api '{api}' in the [{provider}] section. "
+            f"Use one of: {', '.join(BEDROCK_APIS)}"
+        )
 
     # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
     if conversation_history is None:
         print(f"Prompting AWS Bedrock with model {model_id}: {prompt}\n")
 
-    if streaming and "anthropic" in model_id:
-        return stream_aws_response(bedrock, model_id, body)
+    if api == "converse":
+        request = build_converse_request(messages, aws_config, model_id)
+        if streaming:
+            return stream_converse_response(bedrock, model_id, request, aws_config)
+        return non_streaming_converse_response(bedrock, model_id, request, aws_config)
+
+    body = family.build_body(messages, aws_config, model_id)
+    if streaming and family.stream_text is not None:
+        return stream_aws_response(bedrock, model_id, body, aws_config)
+    else:
+        return non_streaming_aws_response(bedrock, model_id, body, aws_config)
+
+
+async def acall_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "aws",
+) -> AsyncIterator[str]:
+    """
+    Call the AWS Bedrock API with the given prompt from async code.
+
+    boto3 has no asyncio API, so the blocking calls run on the event loop's
+    default executor and each stream chunk is awaited from there.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
+
+    Yields:
+        str: Chunks of the response as they arrive; the full text as a single
+             chunk when streaming is disabled
+    """
+    # Imported here so the synchronous path doesn't load asyncio
+    import asyncio
+
+    from src.providers import async_transport
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        contextvars.copy_context().run,
+        call_api,
+        config,
+        prompt,
+        conversation_history,
+        provider,
+    )
+    if isinstance(result, str):
+        yield result
     else:
-        return non_streaming_aws_response(bedrock, model_id, body)
+        async for chunk in async_transport.aiter_in_thread(result):
+            yield chunk
 
 
-def stream_aws_response(bedrock, model_id: str, body: Dict[str, Any]) -> Iterator[str]:
+def _metrics_for_headers() -> Optional[metrics.RequestMetrics]:
+    """
+    Mark the response headers of a Bedrock call as received now, in its
+    metrics if it's measured.
+
+    botocore pools its own connections, so their setup isn't measured; the
+    headers have arrived when invoke_model returns.
+    """
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.connect_measured = False
+        request_metrics.mark_headers()
+    return request_metrics
+
+
+def _open_stream(send: Callable[[], Any]) -> Any:
+    """
+    Start a Bedrock streaming call inside the calling thread's cancel scope.
+
+    The event stream's HTTP body is registered with the scope, so a race or
+    hedge that this call loses closes it instead of reading it to the end.
+    Non-streaming calls can't be cut off: botocore doesn't expose their
+    connection while they're in flight.
+
+    Args:
+        send (Callable[[], Any]): Makes the boto3 call
+
+    Returns:
+        Any: The boto3 response
+
+    Raises:
+        RequestCancelled: If the scope was cancelled before or during the call
+    """
+    if transport.cancelled():
+        raise transport.RequestCancelled()
+    response = send()
+    for key in ("body", "stream"):
+        raw = getattr(response.get(key), "_raw_stream", None)
+        if raw is not None:
+            transport.register_raw(raw)
+    return response
+
+
+def stream_aws_response(
+    bedrock,
+    model_id: str,
+    body: Dict[str, Any],
+    aws_config: Optional[ProviderConfig] = None,
+) -> Iterator[str]:
     """
     Stream the response from AWS Bedrock API.
 
@@ -131,38 +296,59 @@ def stream_aws_response(bedrock, model_id: str, body: Dict[str, Any]) -> Iterato
         bedrock: The boto3 bedrock-runtime client
         model_id (str): The model ID to use
         body (Dict[str, Any]): Request body
+        aws_config (Optional[ProviderConfig]): Provider settings for retries
 
     Yields:
         str: Chunks of the response as they arrive
+
+    Raises:
+        botocore.exceptions.ClientError: If Bedrock still reports an error after retrying
     """
-    try:
-        # Ensure streaming is enabled
+    family = bedrock_models.model_family(model_id)
+    if family.stream_text is None:
+        raise ValueError(f"Bedrock model {model_id} has no stream format")
+    # Families that select streaming in the body need it enabled
+    if family.stream_field:
         body["stream"] = True
 
-        response = bedrock.invoke_model_with_response_stream(
-            modelId=model_id, body=json.dumps(body)
+    def attempt() -> Iterator[str]:
+        response = _open_stream(
+            lambda: bedrock.invoke_model_with_response_stream(
+                modelId=model_id, body=codec.dumps(body)
+            )
         )
+        request_metrics = _metrics_for_headers()
 
         stream_body = response.get("body")
         if stream_body:
             for event in stream_body:
                 chunk_data = event.get("chunk", {})
                 if chunk_data and "bytes" in chunk_data:
-                    chunk = json.loads(chunk_data["bytes"])
-
-                    # Extract content based on model provider
-                    if "anthropic" in model_id:
-                        if chunk.get("type") == "content_block_delta":
-                            if "delta" in chunk and "text" in chunk["delta"]:
-                                yield chunk["delta"]["text"]
-                # Add support for other model types as needed
-
-    except Exception as e:
-        print(f"Error streaming from AWS Bedrock: {str(e)}")
-        sys.exit(1)
-
-
-def non_streaming_aws_response(bedrock, model_id: str, body: Dict[str, Any]) -> str:
+                    if request_metrics is not None:
+                        request_metrics.bytes += len(chunk_data["bytes"])
+                    chunk = codec.loads(chunk_data["bytes"])
+                    text = family.stream_text(chunk)
+                    if text:
+                        yield text
+                    # Bedrock adds the call's usage to the last chunk
+                    invocation = chunk.get("amazon-bedrock-invocationMetrics")
+                    if invocation and request_metrics is not None:
+                        request_metrics.add_usage(
+                            invocation.get("inputTokenCount"),
+                            invocation.get("outputTokenCount"),
+                            _seconds(invocation.get("invocationLatency")),
+                        )
+
+    # Throttling and other failures before the first chunk are retried
+    yield from retry.stream(attempt, aws_config, "bedrock-runtime")
+
+
+def non_streaming_aws_response(
+    bedrock,
+    model_id: str,
+    body: Dict[str, Any],
+    aws_config: Optional[ProviderConfig] = None,
+) -> str:
     """
     Get a non-streaming response from AWS Bedrock API.
 
@@ -170,41 +356,187 @@ def non_streaming_aws_response(bedrock, model_id: str, body: Dict[str, Any]) ->
         bedrock: The boto3 bedrock-runtime client
         model_id (str): The model ID to use
         body (Dict[str, Any]): Request body
+        aws_config (Optional[ProviderConfig]): Provider settings for retries
 
     Returns:
         str: The full response
+
+    Raises:
+        botocore.exceptions.ClientError: If Bedrock still reports an error after retrying
     """
-    try:
-        # Ensure streaming is disabled for non-streaming request
-        if "stream" in body:
-            body["stream"] = False
+    # Ensure streaming is disabled for non-streaming request
+    if "stream" in body:
+        body["stream"] = False
 
-        response = bedrock.invoke_model(modelId=model_id, body=json.dumps(body))
+    def attempt() -> Dict[str, Any]:
+        response = bedrock.invoke_model(modelId=model_id, body=codec.dumps(body))
+        request_metrics = _metrics_for_headers()
         response_body_stream = response.get("body")
         if not response_body_stream:
             raise Exception("Empty response from AWS Bedrock")
+        raw = response_body_stream.read()
+        if request_metrics is not None:
+            request_metrics.bytes += len(raw)
+        return codec.loads(raw)
+
+    response_body: Dict[str, Any] = retry.call(attempt, aws_config, "bedrock-runtime")
+
+    return bedrock_models.model_family(model_id).response_text(response_body)
+
+
+def _seconds(milliseconds: Optional[float]) -> Optional[float]:
+    """Convert a latency reported in milliseconds."""
+    return None if milliseconds is None else milliseconds / 1000
+
+
+def build_converse_request(
+    messages: List[Dict[str, str]], aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    """
+    Build the arguments of a Converse or ConverseStream call.
 
-        response_body: Dict[str, Any] = json.loads(response_body_stream.read())
-
-        # Extract the content based on the model provider
-        if "anthropic" in model_id:
-            content = response_body.get("content", [])
-            if content and len(content) > 0:
-                return content[0].get("text", "")
-            return ""
-        elif "amazon" in model_id:
-            results = response_body.get("results", [])
-            if results and len(results) > 0:
-                return results[0].get("outputText", "")
-            return ""
+    The whole conversation is sent, with consecutive messages of the same
+    role merged, as Converse requires alternating roles. For Anthropic
+    models, cache points are placed where the InvokeModel requests get
+    cache_control breakpoints.
+
+    Args:
+        messages (List[Dict[str, str]]): The conversation, system prompt included
+        aws_config (ProviderConfig): The provider settings
+        model_id (str): The model ID
+
+    Returns:
+        Dict[str, Any]: messages, system and inferenceConfig arguments
+    """
+    cache = aws_config.get(
+        "prompt_cache",
+        bedrock_models.model_family(model_id)
+        is bedrock_models.MODEL_FAMILIES["anthropic."]
+        and prompt_cache.bedrock_supports_caching(model_id),
+    )
+    system, rest = prompt_cache.build_messages(messages, cache)
+
+    def blocks(content: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        if isinstance(content, str):
+            return [{"text": content}]
+        converted: List[Dict[str, Any]] = []
+        for block in content:
+            converted.append({"text": block["text"]})
+            if "cache_control" in block:
+                converted.append(CACHE_POINT)
+        return converted
+
+    turns: List[Dict[str, Any]] = []
+    for message in rest:
+        if turns and turns[-1]["role"] == message["role"]:
+            turns[-1]["content"] += blocks(message["content"])
         else:
-            return cast(
-                str,
-                response_body.get(
-                    "completion",
-                    response_body.get("generated_text", str(response_body)),
-                ),
+            turns.append(
+                {"role": message["role"], "content": blocks(message["content"])}
             )
-    except Exception as e:
-        print(f"Error calling AWS Bedrock: {str(e)}")
-        sys.exit(1)
+
+    request: Dict[str, Any] = {"messages": turns}
+    if system is not None:
+        request["system"] = blocks(system)
+
+    # Without max_tokens, each model's own default applies
+    inference: Dict[str, Any] = {}
+    if aws_config.max_tokens is not None:
+        inference["maxTokens"] = aws_config.max_tokens
+    if aws_config.temperature is not None:
+        inference["temperature"] = aws_config.temperature
+    if inference:
+        request["inferenceConfig"] = inference
+    return request
+
+
+def _record_converse_usage(
+    metadata: Dict[str, Any], request_metrics: Optional[metrics.RequestMetrics]
+) -> None:
+    """Record the usage and latency of a Converse response or stream metadata event."""
+    usage = metadata.get("usage") or {}
+    prompt_cache.record_usage(
+        {
+            "input_tokens": usage.get("inputTokens"),
+            "cache_read_input_tokens": usage.get("cacheReadInputTokens"),
+            "cache_creation_input_tokens": usage.get("cacheWriteInputTokens"),
+        }
+    )
+    if request_metrics is not None:
+        request_metrics.add_usage(
+            usage.get("inputTokens"),
+            usage.get("outputTokens"),
+            _seconds((metadata.get("metrics") or {}).get("latencyMs")),
+        )
+
+
+def stream_converse_response(
+    bedrock,
+    model_id: str,
+    request: Dict[str, Any],
+    aws_config: Optional[ProviderConfig] = None,
+) -> Iterator[str]:
+    """
+    Stream the response of the Bedrock ConverseStream API.
+
+    Args:
+        bedrock: The boto3 bedrock-runtime client
+        model_id (str): The model ID to use
+        request (Dict[str, Any]): Arguments from build_converse_request
+        aws_config (Optional[ProviderConfig]): Provider settings for retries
+
+    Yields:
+        str: Chunks of the response as they arrive
+
+    Raises:
+        botocore.exceptions.ClientError: If Bedrock still reports an error after retrying
+    """
+
+    def attempt() -> Iterator[str]:
+        response = _open_stream(
+            lambda: bedrock.converse_stream(modelId=model_id, **request)
+        )
+        request_metrics = _metrics_for_headers()
+
+        for event in response.get("stream") or []:
+            if "contentBlockDelta" in event:
+                text = event["contentBlockDelta"].get("delta", {}).get("text")
+                if text:
+                    yield text
+            elif "metadata" in event:
+                _record_converse_usage(event["metadata"], request_metrics)
+
+    # Throttling and other failures before the first chunk are retried
+    yield from retry.stream(attempt, aws_config, "bedrock-runtime")
+
+
+def non_streaming_converse_response(
+    bedrock,
+    model_id: str,
+    request: Dict[str, Any],
+    aws_config: Optional[ProviderConfig] = None,
+) -> str:
+    """
+    Get a whole response from the Bedrock Converse API.
+
+    Args:
+        bedrock: The boto3 bedrock-runtime client
+        model_id (str): The model ID to use
+        request (Dict[str, Any]): Arguments from build_converse_request
+        aws_config (Optional[ProviderConfig]): Provider settings for retries
+
+    Returns:
+        str: The full response
+
+    Raises:
+        botocore.exceptions.ClientError: If Bedrock still reports an error after retrying
+    """
+
+    def attempt() -> Dict[str, Any]:
+        response = bedrock.converse(modelId=model_id, **request)
+        _record_converse_usage(response, _metrics_for_headers())
+        return response
+
+    response: Dict[str, Any] = retry.call(attempt, aws_config, "bedrock-runtime")
+    content = response.get("output", {}).get("message", {}).get("content", [])
+    return "".join(block.get("text", "") for block in content)
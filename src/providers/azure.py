@@ -3,112 +3,237 @@ Azure OpenAI provider module for lask
 """
 
 import os
-import sys
-import json
-from typing import Dict, Any, Optional, Union, Iterator, List
+from functools import partial
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Union, Iterator, AsyncIterator, List, Tuple
 import requests
 
-from src.config import LaskConfig
+from src.config import LaskConfig, ProviderConfig
+from src.providers import RequestTemplate, codec, retry, sse, transport
 
 
-def call_api(
-    config: LaskConfig,
-    prompt: str,
-    conversation_history: Optional[List[Dict[str, str]]] = None,
-) -> Union[str, Iterator[str]]:
+def build_template(config: LaskConfig, provider: str = "azure") -> RequestTemplate:
     """
-    Call the Azure OpenAI API with the given prompt.
+    Resolve the Azure OpenAI request settings, including the endpoint URL.
 
     Args:
         config (LaskConfig): Configuration object
-        prompt (str): The user prompt
-        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
-                                                             for multi-turn dialogues
+        provider (str): The config section to use, the name of a named
+                        instance or "azure"
 
     Returns:
-        Union[str, Iterator[str]]: The response from the Azure OpenAI API,
-                                  either full text or a stream iterator
+        RequestTemplate: The settings every Azure OpenAI request starts from
 
     Raises:
-        Exception: If there's an error calling the Azure OpenAI API
+        ValueError: If the API key, resource or deployment isn't configured
     """
     # Get provider-specific config
-    azure_config = config.get_provider_config("azure")
+    azure_config = config.get_provider_config(provider)
 
     # Get API key
     api_key: Optional[str] = os.getenv("AZURE_OPENAI_API_KEY") or azure_config.api_key
     if not api_key:
-        print(
-            "Error: Please set the AZURE_OPENAI_API_KEY environment variable or add 'api_key' under [azure] section in ~/.lask-config"
+        raise ValueError(
+            f"Please set the AZURE_OPENAI_API_KEY environment variable or add 'api_key' under [{provider}] section in ~/.lask-config"
         )
-        sys.exit(1)
 
-    # Get required Azure-specific parameters
+    # Get required Azure-specific parameters; a base_url replaces the
+    # resource's endpoint, e.g. for a gateway in front of it
     resource_name: Optional[str] = azure_config.resource_name
-    if not resource_name:
-        print(
-            "Error: Please set 'resource_name' under [azure] section in ~/.lask-config"
+    if not resource_name and not azure_config.base_url:
+        raise ValueError(
+            f"Please set 'resource_name' under [{provider}] section in ~/.lask-config"
         )
-        sys.exit(1)
 
     # Check if streaming is enabled (default to True)
     streaming: bool = azure_config.get("streaming", True)
 
     deployment_id: Optional[str] = azure_config.deployment_id
     if not deployment_id:
-        print(
-            "Error: Please set 'deployment_id' under [azure] section in ~/.lask-config"
+        raise ValueError(
+            f"Please set 'deployment_id' under [{provider}] section in ~/.lask-config"
         )
-        sys.exit(1)
 
     api_version: str = azure_config.api_version or "2023-05-15"
 
     # Construct the API URL
-    endpoint: str = f"https://{resource_name}.openai.azure.com/openai/deployments/{deployment_id}/chat/completions?api-version={api_version}"
+    base_url: str = (
+        azure_config.base_url or f"https://{resource_name}.openai.azure.com"
+    ).rstrip("/")
+    endpoint: str = f"{base_url}/openai/deployments/{deployment_id}/chat/completions?api-version={api_version}"
+
+    body: Dict[str, Any] = {"stream": streaming}
+
+    # Add optional parameters if specified
+    if azure_config.temperature is not None:
+        body["temperature"] = azure_config.temperature
+    if azure_config.max_tokens is not None:
+        body["max_tokens"] = azure_config.max_tokens
+
+    return RequestTemplate(
+        url=endpoint,
+        headers=MappingProxyType(
+            {"api-key": api_key, "Content-Type": "application/json"}
+        ),
+        body=MappingProxyType(body),
+        # The provider's system prompt overrides the default one
+        system_prompt=(
+            azure_config.system_prompt
+            if azure_config.system_prompt is not None
+            else config.system_prompt
+        ),
+        model=deployment_id,
+    )
+
+
+def get_template(config: LaskConfig, provider: str = "azure") -> RequestTemplate:
+    """
+    Get the request template of the Azure OpenAI provider or a named instance.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The config section to use
+
+    Returns:
+        RequestTemplate: The cached template
+    """
+    return config.request_template(provider, partial(build_template, provider=provider))
 
-    headers: Dict[str, str] = {"api-key": api_key, "Content-Type": "application/json"}
+
+def build_request(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "azure",
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Build the headers and body of an Azure OpenAI chat completions request.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, Any]]: Request headers and request data
+    """
+    template = get_template(config, provider)
 
     # If conversation history is provided, use that instead of building new messages
     if conversation_history is not None:
         messages = conversation_history
     else:
         messages = []
+        if template.system_prompt is not None:
+            messages.append({"role": "system", "content": template.system_prompt})
+        messages.append({"role": "user", "content": prompt})
 
-        # Add system prompt if available
-        provider_system_prompt = azure_config.system_prompt
-        default_system_prompt = config.system_prompt
+    data: Dict[str, Any] = dict(template.body)
+    data["messages"] = messages
 
-        if provider_system_prompt is not None:
-            messages.append({"role": "system", "content": provider_system_prompt})
-        elif default_system_prompt is not None:
-            messages.append({"role": "system", "content": default_system_prompt})
+    # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
+    if conversation_history is None:
+        api = "Azure OpenAI API" if provider == "azure" else provider
+        print(f"Prompting {api} with deployment {template.model}: {prompt}\n")
 
-        # Add user message
-        messages.append({"role": "user", "content": prompt})
+    return dict(template.headers), data
 
-    data: Dict[str, Any] = {
-        "messages": messages,
-        "stream": streaming,
-    }
 
-    # Add optional parameters if specified
-    if azure_config.temperature is not None:
-        data["temperature"] = azure_config.temperature
-    if azure_config.max_tokens is not None:
-        data["max_tokens"] = azure_config.max_tokens
+def call_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "azure",
+) -> Union[str, Iterator[str]]:
+    """
+    Call the Azure OpenAI API with the given prompt.
 
-    # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
-    if conversation_history is None:
-        print(f"Prompting Azure OpenAI API with deployment {deployment_id}: {prompt}\n")
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
+
+    Returns:
+        Union[str, Iterator[str]]: The response from the Azure OpenAI API,
+                                  either full text or a stream iterator
+
+    Raises:
+        Exception: If there's an error calling the Azure OpenAI API
+    """
+    azure_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    endpoint = get_template(config, provider).url
+
+    if data["stream"]:
+        return stream_azure_response(endpoint, headers, data, azure_config)
+    else:
+        return non_streaming_azure_response(endpoint, headers, data, azure_config)
+
+
+async def acall_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "azure",
+) -> AsyncIterator[str]:
+    """
+    Call the Azure OpenAI API with the given prompt from async code.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
 
-    if streaming:
-        return stream_azure_response(endpoint, headers, data)
+    Yields:
+        str: Chunks of the response as they arrive; the full text as a single
+             chunk when streaming is disabled
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
+    """
+    # Imported here so the synchronous path doesn't load asyncio
+    from src.providers import async_transport
+
+    azure_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    endpoint = get_template(config, provider).url
+
+    if data["stream"]:
+
+        async def attempt() -> AsyncIterator[str]:
+            async for event in async_transport.aiter_events(
+                endpoint, azure_config, headers, data
+            ):
+                # Read on to the end of the body, see _iter_azure_deltas()
+                if event.data == "[DONE]":
+                    continue
+                content = _parse_azure_event(event)
+                if content:
+                    yield content
+
+        # Failures before the first chunk are retried transparently
+        async for content in retry.astream(attempt, azure_config, endpoint):
+            yield content
     else:
-        return non_streaming_azure_response(endpoint, headers, data)
+        result = await retry.acall(
+            lambda: async_transport.apost_json(endpoint, azure_config, headers, data),
+            azure_config,
+            endpoint,
+        )
+        yield result["choices"][0]["message"]["content"].strip()
 
 
 def stream_azure_response(
-    endpoint: str, headers: Dict[str, str], data: Dict[str, Any]
+    endpoint: str,
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
 ) -> Iterator[str]:
     """
     Stream the response from Azure OpenAI API.
@@ -117,36 +242,63 @@ def stream_azure_response(
         endpoint (str): The Azure OpenAI API endpoint
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
 
     Yields:
         str: Chunks of the response as they arrive
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
-    response = requests.post(endpoint, headers=headers, json=data, stream=True)
-
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
-
-    for line in response.iter_lines():
-        if line:
-            line_str = line.decode("utf-8")
-            # Skip the "data: [DONE]" message
-            if line_str == "data: [DONE]":
-                continue
-            # Skip empty data lines
-            if line_str.startswith("data: "):
-                json_str = line_str[6:]  # Remove "data: " prefix
-                try:
-                    chunk = json.loads(json_str)
-                    delta = chunk.get("choices", [{}])[0].get("delta", {})
-                    if "content" in delta:
-                        yield delta["content"]
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse JSON: {json_str}")
+    read_size = provider_config.read_size if provider_config else None
+
+    def attempt() -> Iterator[str]:
+        response = transport.post(
+            endpoint,
+            provider_config,
+            headers=headers,
+            data=codec.dumps(data),
+            stream=True,
+        )
+        # Always release the pooled connection, even if the consumer stops early
+        with response:
+            retry.check_response(response)
+            yield from _iter_azure_deltas(response, read_size)
+
+    # Failures before the first chunk are retried transparently
+    yield from retry.stream(attempt, provider_config, endpoint)
+
+
+def _iter_azure_deltas(
+    response: requests.Response, read_size: Optional[int] = None
+) -> Iterator[str]:
+    """Yield content deltas from an Azure OpenAI server-sent event stream."""
+    for event in sse.iter_response_events(response, read_size):
+        # The stream ends with a "data: [DONE]" message; reading on to the
+        # end of the body lets the pooled connection be reused
+        if event.data == "[DONE]":
+            continue
+        content = _parse_azure_event(event)
+        if content:
+            yield content
+
+
+def _parse_azure_event(event: sse.ServerSentEvent) -> Optional[str]:
+    """Return the content delta carried by one stream event, if any."""
+    # Only the delta is decoded; the first chunk may carry no choices (e.g.
+    # content filter results)
+    try:
+        return codec.delta_decoder("choices", 0, "delta", "content")(event.data)
+    except codec.DecodeError:
+        print(f"Warning: Could not parse JSON: {event.data}")
+        return None
 
 
 def non_streaming_azure_response(
-    endpoint: str, headers: Dict[str, str], data: Dict[str, Any]
+    endpoint: str,
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
 ) -> str:
     """
     Get a non-streaming response from Azure OpenAI API.
@@ -155,18 +307,25 @@ def non_streaming_azure_response(
         endpoint (str): The Azure OpenAI API endpoint
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data without streaming
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
 
     Returns:
         str: The full response
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
     # Disable streaming for non-streaming request
     data["stream"] = False
 
-    response: requests.Response = requests.post(endpoint, headers=headers, json=data)
+    def attempt() -> requests.Response:
+        return retry.check_response(
+            transport.post(
+                endpoint, provider_config, headers=headers, data=codec.dumps(data)
+            )
+        )
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
+    response: requests.Response = retry.call(attempt, provider_config, endpoint)
 
-    result: Dict[str, Any] = response.json()
+    result: Dict[str, Any] = codec.loads(response.content)
     return result["choices"][0]["message"]["content"].strip()
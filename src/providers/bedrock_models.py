@@ -0,0 +1,279 @@
+"""
+Request and response formats of the model families on AWS Bedrock.
+
+InvokeModel passes the request body through to the model, so every family
+has its own body, stream chunk and response format. Each family is an entry
+in MODEL_FAMILIES, keyed by the start of its model IDs, e.g. ``meta.llama``
+for ``meta.llama3-1-70b-instruct-v1:0``.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.config import ProviderConfig
+from src.providers import prompt_cache
+
+Messages = List[Dict[str, str]]
+
+
+class ModelFamily(NamedTuple):
+    """How one family of Bedrock models is called through InvokeModel."""
+
+    # Builds the request body from the messages, system prompt included
+    build_body: Callable[[Messages, ProviderConfig, str], Dict[str, Any]]
+    # Returns the text delta of a decoded stream chunk, None if it has none;
+    # None for families that can't stream
+    stream_text: Optional[Callable[[Dict[str, Any]], Optional[str]]]
+    # Returns the text of a whole response
+    response_text: Callable[[Dict[str, Any]], str]
+    # Whether the body selects streaming with a "stream" field
+    stream_field: bool = False
+
+
+def _transcript(messages: Messages) -> str:
+    """Render messages as a plain text prompt, for models without a chat format."""
+    if len(messages) == 1 and messages[0]["role"] == "user":
+        return messages[0]["content"]
+    return "\n\n".join(
+        f"{message['role'].capitalize()}: {message['content']}" for message in messages
+    )
+
+
+def _system_and_turns(messages: Messages) -> Tuple[Optional[str], Messages]:
+    """Split off the system prompt, which chat formats place separately."""
+    system = [m["content"] for m in messages if m["role"] == "system"]
+    turns = [m for m in messages if m["role"] != "system"]
+    return ("\n\n".join(system) if system else None), turns
+
+
+def _set_sampling(
+    body: Dict[str, Any],
+    aws_config: ProviderConfig,
+    max_tokens_key: str,
+    default_max_tokens: int,
+) -> Dict[str, Any]:
+    """Add the max token and temperature settings under the family's names."""
+    body[max_tokens_key] = aws_config.max_tokens or default_max_tokens
+    if aws_config.temperature is not None:
+        body["temperature"] = aws_config.temperature
+    return body
+
+
+def _anthropic_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    # Claude takes system prompts as a top-level field, and caches the
+    # stable prefix of the request at the cache_control breakpoints
+    system, anthropic_messages = prompt_cache.build_messages(
+        messages,
+        cache=aws_config.get(
+            "prompt_cache", prompt_cache.bedrock_supports_caching(model_id)
+        ),
+    )
+    body: Dict[str, Any] = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "messages": anthropic_messages,
+    }
+    _set_sampling(body, aws_config, "max_tokens", 4096)
+    if system is not None:
+        body["system"] = system
+    return body
+
+
+def _anthropic_stream_text(chunk: Dict[str, Any]) -> Optional[str]:
+    kind = chunk.get("type")
+    if kind == "content_block_delta":
+        return chunk.get("delta", {}).get("text")
+    if kind == "message_start":
+        prompt_cache.record_usage(chunk.get("message", {}).get("usage"))
+    return None
+
+
+def _anthropic_response_text(response: Dict[str, Any]) -> str:
+    prompt_cache.record_usage(response.get("usage"))
+    content = response.get("content", [])
+    return content[0].get("text", "") if content else ""
+
+
+def _titan_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    config: Dict[str, Any] = {"maxTokenCount": aws_config.max_tokens or 4096}
+    if aws_config.temperature is not None:
+        config["temperature"] = aws_config.temperature
+    return {"inputText": _transcript(messages), "textGenerationConfig": config}
+
+
+def _titan_response_text(response: Dict[str, Any]) -> str:
+    results = response.get("results", [])
+    return results[0].get("outputText", "") if results else ""
+
+
+def _llama_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    # The Llama 3 chat template, ending with the assistant's open turn
+    prompt = "<|begin_of_text|>"
+    for message in messages:
+        prompt += (
+            f"<|start_header_id|>{message['role']}<|end_header_id|>\n\n"
+            f"{message['content']}<|eot_id|>"
+        )
+    prompt += "<|start_header_id|>assistant<|end_header_id|>\n\n"
+    # Llama generates at most 2048 tokens per request on Bedrock
+    return _set_sampling({"prompt": prompt}, aws_config, "max_gen_len", 2048)
+
+
+def _llama_text(chunk: Dict[str, Any]) -> Optional[str]:
+    return chunk.get("generation")
+
+
+def _mistral_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    # Mistral's instruction format; the system prompt leads the first instruction
+    system, turns = _system_and_turns(messages)
+    prompt = "<s>"
+    for message in turns:
+        if message["role"] == "assistant":
+            prompt += f" {message['content']}</s>"
+        else:
+            content = message["content"]
+            if system is not None:
+                content, system = f"{system}\n\n{content}", None
+            prompt += f"[INST] {content} [/INST]"
+    return _set_sampling({"prompt": prompt}, aws_config, "max_tokens", 4096)
+
+
+def _mistral_text(chunk: Dict[str, Any]) -> Optional[str]:
+    outputs = chunk.get("outputs")
+    return outputs[0].get("text") if outputs else None
+
+
+def _cohere_command_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    return _set_sampling(
+        {"prompt": _transcript(messages)}, aws_config, "max_tokens", 4000
+    )
+
+
+def _cohere_command_stream_text(chunk: Dict[str, Any]) -> Optional[str]:
+    # The last chunk repeats the whole generation
+    if chunk.get("is_finished"):
+        return None
+    generations = chunk.get("generations")
+    if generations:
+        return generations[0].get("text")
+    return chunk.get("text")
+
+
+def _cohere_command_response_text(response: Dict[str, Any]) -> str:
+    generations = response.get("generations", [])
+    return generations[0].get("text", "") if generations else ""
+
+
+def _cohere_chat_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    system, turns = _system_and_turns(messages)
+    roles = {"user": "USER", "assistant": "CHATBOT"}
+    body: Dict[str, Any] = {
+        "message": turns[-1]["content"] if turns else "",
+        "chat_history": [
+            {"role": roles.get(m["role"], "USER"), "message": m["content"]}
+            for m in turns[:-1]
+        ],
+    }
+    if system is not None:
+        body["preamble"] = system
+    return _set_sampling(body, aws_config, "max_tokens", 4000)
+
+
+def _cohere_chat_stream_text(chunk: Dict[str, Any]) -> Optional[str]:
+    if chunk.get("event_type") == "text-generation":
+        return chunk.get("text")
+    return None
+
+
+def _cohere_chat_response_text(response: Dict[str, Any]) -> str:
+    return str(response.get("text", ""))
+
+
+def _default_body(
+    messages: Messages, aws_config: ProviderConfig, model_id: str
+) -> Dict[str, Any]:
+    return _set_sampling(
+        {"prompt": _transcript(messages)}, aws_config, "max_tokens", 4096
+    )
+
+
+def _default_response_text(response: Dict[str, Any]) -> str:
+    return str(
+        response.get("completion", response.get("generated_text", str(response)))
+    )
+
+
+# Model ID prefix -> family; the longest matching prefix wins
+MODEL_FAMILIES: Dict[str, ModelFamily] = {
+    "anthropic.": ModelFamily(
+        _anthropic_body,
+        _anthropic_stream_text,
+        _anthropic_response_text,
+        stream_field=True,
+    ),
+    "amazon.titan-text": ModelFamily(
+        _titan_body, lambda chunk: chunk.get("outputText"), _titan_response_text
+    ),
+    "meta.llama": ModelFamily(
+        _llama_body, _llama_text, lambda response: _llama_text(response) or ""
+    ),
+    "mistral.": ModelFamily(
+        _mistral_body, _mistral_text, lambda response: _mistral_text(response) or ""
+    ),
+    "cohere.command-r": ModelFamily(
+        _cohere_chat_body, _cohere_chat_stream_text, _cohere_chat_response_text
+    ),
+    "cohere.command": ModelFamily(
+        _cohere_command_body,
+        _cohere_command_stream_text,
+        _cohere_command_response_text,
+        stream_field=True,
+    ),
+}
+
+# Models of other families are called with a plain prompt and don't stream
+DEFAULT_FAMILY = ModelFamily(_default_body, None, _default_response_text)
+
+_PREFIXES = sorted(MODEL_FAMILIES, key=len, reverse=True)
+# Model ID -> family, so each ID is matched once
+_families: Dict[str, ModelFamily] = {}
+
+
+def model_family(model_id: str) -> ModelFamily:
+    """
+    Get the family of a Bedrock model.
+
+    Args:
+        model_id (str): A model ID, cross-region inference profile ID
+                        (``us.anthropic...``) or ARN
+
+    Returns:
+        ModelFamily: The family's formats, DEFAULT_FAMILY if it's unknown
+    """
+    family = _families.get(model_id)
+    if family is None:
+        # ARNs end in the model or inference profile ID
+        name = model_id.rsplit("/", 1)[-1].lower()
+        # Inference profile IDs start with their geography
+        candidates = (name, name.partition(".")[2])
+        family = next(
+            (
+                MODEL_FAMILIES[prefix]
+                for candidate in candidates
+                for prefix in _PREFIXES
+                if candidate.startswith(prefix)
+            ),
+            DEFAULT_FAMILY,
+        )
+        _families[model_id] = family
+    return family
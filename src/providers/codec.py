@@ -0,0 +1,224 @@
+"""
+JSON encoding and decoding of provider requests and responses.
+
+Uses msgspec or orjson when one is installed (``pip install lask[fast]``)
+and the standard library otherwise; LASK_JSON selects one explicitly. The
+backend is imported on first use, so one-off runs that are answered from
+the cache don't pay for it.
+
+Most events of a response stream carry nothing but a text delta, so the
+stream parsers decode them with a delta decoder, which returns just the
+field at a path such as ``choices.0.delta.content``. With msgspec, the rest
+of the event is skipped without building Python objects for it; the other
+backends decode the whole event and look the field up.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+JSON_ENV = "LASK_JSON"
+
+# In order of preference
+BACKENDS = ("msgspec", "orjson", "json")
+
+# Errors of every backend subclass ValueError, like json.JSONDecodeError
+DecodeError = ValueError
+
+# Keys and list indexes leading to a field, e.g. ("delta", "text")
+FieldPath = Tuple[Union[str, int], ...]
+DeltaDecoder = Callable[[Union[str, bytes]], Optional[str]]
+
+
+class Codec(NamedTuple):
+    """The functions of one JSON backend."""
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[Union[str, bytes]], Any]
+    # Builds a delta decoder for a field path
+    delta_decoder: Callable[[FieldPath], DeltaDecoder]
+
+
+_codec: Optional[Codec] = None
+# (backend, field path) -> delta decoder
+_delta_decoders: Dict[Tuple[str, FieldPath], DeltaDecoder] = {}
+
+
+def _lookup(value: Any, path: FieldPath) -> Optional[str]:
+    """Follow a field path through decoded JSON; None where it's missing."""
+    for key in path:
+        # Keys only index objects and indexes only lists
+        if type(value) is not (list if isinstance(key, int) else dict):
+            return None
+        try:
+            value = value[key]
+        except (KeyError, IndexError):
+            return None
+    return value if isinstance(value, str) else None
+
+
+def _full_decoder(
+    loads: Callable[[Union[str, bytes]], Any],
+) -> Callable[[FieldPath], DeltaDecoder]:
+    """Build delta decoders that decode the whole event."""
+
+    def delta_decoder(path: FieldPath) -> DeltaDecoder:
+        # The type each step indexes, worked out once per path
+        steps = tuple((key, list if isinstance(key, int) else dict) for key in path)
+
+        def decode(data: Union[str, bytes]) -> Optional[str]:
+            value = loads(data)
+            for key, kind in steps:
+                if type(value) is not kind:
+                    return None
+                try:
+                    value = value[key]
+                except (KeyError, IndexError):
+                    return None
+            return value if type(value) is str else None
+
+        return decode
+
+    return delta_decoder
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _stdlib() -> Codec:
+    return Codec("json", _stdlib_dumps, json.loads, _full_decoder(json.loads))
+
+
+def _orjson() -> Codec:
+    import orjson  # type: ignore
+
+    return Codec("orjson", orjson.dumps, orjson.loads, _full_decoder(orjson.loads))
+
+
+def _msgspec() -> Codec:
+    import msgspec  # type: ignore
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def delta_decoder(path: FieldPath) -> DeltaDecoder:
+        # Only the fields on the path are declared; everything else in the
+        # event is validated as JSON and skipped
+        field_type: Any = Optional[str]
+        for index, key in enumerate(reversed(path)):
+            if isinstance(key, int):
+                field_type = Optional[List[field_type]]
+            else:
+                struct = msgspec.defstruct(
+                    f"_Delta{len(path) - index}", [(key, field_type, None)], gc=False
+                )
+                field_type = Optional[struct]
+        typed = msgspec.json.Decoder(field_type)
+
+        def decode(data: Union[str, bytes]) -> Optional[str]:
+            try:
+                value = typed.decode(data)
+            except msgspec.ValidationError:
+                # Valid JSON of another shape, e.g. a null where an object
+                # was declared
+                return _lookup(decoder.decode(data), path)
+            for key in path:
+                if value is None:
+                    return None
+                if isinstance(key, int):
+                    value = value[key] if len(value) > key else None
+                else:
+                    value = getattr(value, key)
+            return value
+
+        return decode
+
+    return Codec("msgspec", encoder.encode, decoder.decode, delta_decoder)
+
+
+_FACTORIES: Dict[str, Callable[[], Codec]] = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": _stdlib,
+}
+
+
+def use(name: Optional[str] = None) -> Codec:
+    """
+    Select the JSON backend.
+
+    Args:
+        name (Optional[str]): "msgspec", "orjson" or "json"; by default the
+                              first installed one of BACKENDS
+
+    Returns:
+        Codec: The selected backend
+
+    Raises:
+        ImportError: If the named backend isn't installed
+        ValueError: If there is no backend with that name
+    """
+    global _codec
+    if name is not None:
+        if name not in _FACTORIES:
+            raise ValueError(
+                f"Unknown JSON backend '{name}'. Use one of: {', '.join(BACKENDS)}"
+            )
+        _codec = _FACTORIES[name]()
+        return _codec
+    for backend in BACKENDS:
+        try:
+            _codec = _FACTORIES[backend]()
+            return _codec
+        except ImportError:
+            continue
+    raise AssertionError("the standard library backend is always available")
+
+
+def codec() -> Codec:
+    """Get the selected JSON backend, selecting it on first use."""
+    if _codec is None:
+        try:
+            return use(os.environ.get(JSON_ENV) or None)
+        except (ImportError, ValueError) as e:
+            print(f"Warning: {JSON_ENV}: {e}; using the default JSON backend")
+            return use()
+    return _codec
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a request body as UTF-8 JSON."""
+    return codec().dumps(value)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode JSON text.
+
+    Raises:
+        DecodeError: If the data isn't valid JSON
+    """
+    return codec().loads(data)
+
+
+def delta_decoder(*path: Union[str, int]) -> DeltaDecoder:
+    """
+    Get a decoder returning only the string at a field path of a JSON event.
+
+    Args:
+        *path (Union[str, int]): Object keys and list indexes, e.g.
+                                 ``"choices", 0, "delta", "content"``
+
+    Returns:
+        DeltaDecoder: Decodes an event's data; returns None where the path
+                      is missing or doesn't end in a string, and raises
+                      DecodeError for invalid JSON
+    """
+    backend = codec()
+    key = (backend.name, path)
+    decoder = _delta_decoders.get(key)
+    if decoder is None:
+        decoder = _delta_decoders[key] = backend.delta_decoder(path)
+    return decoder
@@ -3,96 +3,228 @@ OpenAI provider module for lask
 """
 
 import os
-import sys
-import json
-from typing import Dict, Any, Optional, Iterator, Union, List
+from functools import partial
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, Union, List, Tuple
 import requests
 
-from src.config import LaskConfig
+from src.config import LaskConfig, ProviderConfig
+from src.providers import RequestTemplate, codec, retry, sse, transport
 
+API_URL = "https://api.openai.com/v1/chat/completions"
+DEFAULT_MODEL = "gpt-4.1"
 
-def call_api(
-    config: LaskConfig,
-    prompt: str,
-    conversation_history: Optional[List[Dict[str, str]]] = None,
-) -> Union[str, Iterator[str]]:
+
+def build_template(config: LaskConfig, provider: str = "openai") -> RequestTemplate:
     """
-    Call the OpenAI API with the given prompt.
+    Resolve the OpenAI request settings from the configuration.
 
     Args:
         config (LaskConfig): Configuration object
-        prompt (str): The user prompt
-        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
-                                                             for multi-turn dialogues
+        provider (str): The config section to use, the name of a named
+                        OpenAI-compatible instance or "openai"
 
     Returns:
-        Union[str, Iterator[str]]: The response from the OpenAI API,
-                                  either full text or a stream iterator
+        RequestTemplate: The settings every OpenAI request starts from
+
+    Raises:
+        ValueError: If no API key is configured for api.openai.com
     """
     # Get provider-specific config
-    openai_config = config.get_provider_config("openai")
+    openai_config = config.get_provider_config(provider)
 
-    # Try to get API key from environment variable first, then from config
-    api_key: Optional[str] = openai_config.api_key or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print(
-            "Error: Please add 'api_key' under [default] or [openai] section in ~/.lask-config, or set the OPENAI_API_KEY environment variable in your shell."
-        )
-        sys.exit(1)
+    # OpenAI-compatible servers take the same path under their own API root
+    url = API_URL
+    if openai_config.base_url:
+        url = openai_config.base_url.rstrip("/") + "/chat/completions"
+
+    # Try to get API key from the config first, then from the environment.
+    # Servers at a base_url get no OpenAI key and may not need one at all.
+    api_key: Optional[str] = openai_config.api_key
+    if not api_key and not openai_config.base_url:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError(
+                f"Please add 'api_key' under [default] or [{provider}] section in ~/.lask-config, or set the OPENAI_API_KEY environment variable in your shell."
+            )
 
     # Get model from config or use default
-    model: str = openai_config.model or "gpt-4.1"
+    model: str = openai_config.model or DEFAULT_MODEL
 
     # Check if streaming is enabled (default to True)
     streaming: bool = openai_config.get("streaming", True)
 
-    headers: Dict[str, str] = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    body: Dict[str, Any] = {"model": model, "stream": streaming}
+
+    # Add optional parameters if specified
+    if openai_config.temperature is not None:
+        body["temperature"] = openai_config.temperature
+    if openai_config.max_tokens is not None:
+        body["max_tokens"] = openai_config.max_tokens
+
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+
+    return RequestTemplate(
+        url=url,
+        headers=MappingProxyType(headers),
+        body=MappingProxyType(body),
+        # The provider's system prompt overrides the default one
+        system_prompt=(
+            openai_config.system_prompt
+            if openai_config.system_prompt is not None
+            else config.system_prompt
+        ),
+        model=model,
+    )
+
+
+def get_template(config: LaskConfig, provider: str = "openai") -> RequestTemplate:
+    """
+    Get the request template of the OpenAI provider or a named instance.
+
+    Args:
+        config (LaskConfig): Configuration object
+        provider (str): The config section to use
+
+    Returns:
+        RequestTemplate: The cached template
+    """
+    return config.request_template(provider, partial(build_template, provider=provider))
+
+
+def build_request(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "openai",
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Build the headers and body of an OpenAI chat completions request.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, Any]]: Request headers and request data
+    """
+    template = get_template(config, provider)
 
     # If conversation history is provided, use that instead of building new messages
     if conversation_history is not None:
         messages = conversation_history
     else:
         messages = []
+        if template.system_prompt is not None:
+            messages.append({"role": "system", "content": template.system_prompt})
+        messages.append({"role": "user", "content": prompt})
 
-        # Add system prompt if available
-        provider_system_prompt = openai_config.system_prompt
-        default_system_prompt = config.system_prompt
+    data: Dict[str, Any] = dict(template.body)
+    data["messages"] = messages
 
-        if provider_system_prompt is not None:
-            messages.append({"role": "system", "content": provider_system_prompt})
-        elif default_system_prompt is not None:
-            messages.append({"role": "system", "content": default_system_prompt})
+    # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
+    if conversation_history is None:
+        api = "OpenAI API" if provider == "openai" else provider
+        print(f"Prompting {api} with model {template.model}: {prompt}\n")
 
-        # Add user message
-        messages.append({"role": "user", "content": prompt})
+    return dict(template.headers), data
 
-    data: Dict[str, Any] = {
-        "model": model,
-        "messages": messages,
-        "stream": streaming,
-    }
 
-    # Add optional parameters if specified
-    if openai_config.temperature is not None:
-        data["temperature"] = openai_config.temperature
-    if openai_config.max_tokens is not None:
-        data["max_tokens"] = openai_config.max_tokens
+def call_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "openai",
+) -> Union[str, Iterator[str]]:
+    """
+    Call the OpenAI API, or an OpenAI-compatible server, with the given prompt.
 
-    # Only print the prompt in one-off mode, not in conversation mode to avoid clutter
-    if conversation_history is None:
-        print(f"Prompting OpenAI API with model {data['model']}: {prompt}\n")
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
 
-    if streaming:
-        return stream_openai_response(headers, data)
+    Returns:
+        Union[str, Iterator[str]]: The response from the OpenAI API,
+                                  either full text or a stream iterator
+    """
+    openai_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    url = get_template(config, provider).url
+
+    if data["stream"]:
+        return stream_openai_response(headers, data, openai_config, url)
     else:
-        return non_streaming_openai_response(headers, data)
+        return non_streaming_openai_response(headers, data, openai_config, url)
+
+
+async def acall_api(
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    provider: str = "openai",
+) -> AsyncIterator[str]:
+    """
+    Call the OpenAI API with the given prompt from async code.
+
+    Args:
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+        provider (str): The config section to use, for named instances
+
+    Yields:
+        str: Chunks of the response as they arrive; the full text as a single
+             chunk when streaming is disabled
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
+    """
+    # Imported here so the synchronous path doesn't load asyncio
+    from src.providers import async_transport
+
+    openai_config = config.get_provider_config(provider)
+    headers, data = build_request(config, prompt, conversation_history, provider)
+    url = get_template(config, provider).url
+
+    if data["stream"]:
+
+        async def attempt() -> AsyncIterator[str]:
+            async for event in async_transport.aiter_events(
+                url, openai_config, headers, data
+            ):
+                # Read on to the end of the body, see _iter_openai_deltas()
+                if event.data == "[DONE]":
+                    continue
+                content = _parse_openai_event(event)
+                if content:
+                    yield content
+
+        # Failures before the first chunk are retried transparently
+        async for content in retry.astream(attempt, openai_config, url):
+            yield content
+    else:
+        result = await retry.acall(
+            lambda: async_transport.apost_json(url, openai_config, headers, data),
+            openai_config,
+            url,
+        )
+        yield result["choices"][0]["message"]["content"].strip()
 
 
 def stream_openai_response(
-    headers: Dict[str, str], data: Dict[str, Any]
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
+    url: Optional[str] = None,
 ) -> Iterator[str]:
     """
     Stream the response from OpenAI API.
@@ -100,60 +232,89 @@ def stream_openai_response(
     Args:
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
+        url (Optional[str]): The chat completions endpoint, defaults to API_URL
 
     Yields:
         str: Chunks of the response as they arrive
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
-    response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers=headers,
-        json=data,
-        stream=True,
-    )
+    read_size = provider_config.read_size if provider_config else None
+    url = url or API_URL
+
+    def attempt() -> Iterator[str]:
+        response = transport.post(
+            url, provider_config, headers=headers, data=codec.dumps(data), stream=True
+        )
+        # Always release the pooled connection, even if the consumer stops early
+        with response:
+            retry.check_response(response)
+            yield from _iter_openai_deltas(response, read_size)
+
+    # Failures before the first chunk are retried transparently
+    yield from retry.stream(attempt, provider_config, url)
+
+
+def _iter_openai_deltas(
+    response: requests.Response, read_size: Optional[int] = None
+) -> Iterator[str]:
+    """Yield content deltas from an OpenAI server-sent event stream."""
+    for event in sse.iter_response_events(response, read_size):
+        # The stream ends with a "data: [DONE]" message; reading on to the
+        # end of the body lets the pooled connection be reused
+        if event.data == "[DONE]":
+            continue
+        content = _parse_openai_event(event)
+        if content:
+            yield content
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
-
-    for line in response.iter_lines():
-        if line:
-            line_str = line.decode("utf-8")
-            # Skip the "data: [DONE]" message
-            if line_str == "data: [DONE]":
-                continue
-            # Skip empty data lines
-            if line_str.startswith("data: "):
-                json_str = line_str[6:]  # Remove "data: " prefix
-                try:
-                    chunk = json.loads(json_str)
-                    delta = chunk.get("choices", [{}])[0].get("delta", {})
-                    if "content" in delta:
-                        yield delta["content"]
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse JSON: {json_str}")
-
-
-def non_streaming_openai_response(headers: Dict[str, str], data: Dict[str, Any]) -> str:
+
+def _parse_openai_event(event: sse.ServerSentEvent) -> Optional[str]:
+    """Return the content delta carried by one stream event, if any."""
+    # Only the delta is decoded; the first chunk may carry no choices (e.g.
+    # content filter results)
+    try:
+        return codec.delta_decoder("choices", 0, "delta", "content")(event.data)
+    except codec.DecodeError:
+        print(f"Warning: Could not parse JSON: {event.data}")
+        return None
+
+
+def non_streaming_openai_response(
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    provider_config: Optional[ProviderConfig] = None,
+    url: Optional[str] = None,
+) -> str:
     """
     Get a non-streaming response from OpenAI API.
 
     Args:
         headers (Dict[str, str]): Request headers
         data (Dict[str, Any]): Request data without streaming
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
+        url (Optional[str]): The chat completions endpoint, defaults to API_URL
 
     Returns:
         str: The full response
+
+    Raises:
+        retry.ProviderError: If the API still returns an error status after retrying
     """
     # Disable streaming for non-streaming request
     data["stream"] = False
+    url = url or API_URL
 
-    response: requests.Response = requests.post(
-        "https://api.openai.com/v1/chat/completions", headers=headers, json=data
-    )
+    def attempt() -> requests.Response:
+        return retry.check_response(
+            transport.post(
+                url, provider_config, headers=headers, data=codec.dumps(data)
+            )
+        )
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.text}")
-        sys.exit(1)
+    response: requests.Response = retry.call(attempt, provider_config, url)
 
-    result: Dict[str, Any] = response.json()
+    result: Dict[str, Any] = codec.loads(response.content)
     return result["choices"][0]["message"]["content"].strip()
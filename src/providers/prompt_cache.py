@@ -0,0 +1,157 @@
+"""
+Prompt caching for Anthropic models, on the Anthropic API and on AWS Bedrock.
+
+Every REPL turn resends the system prompt and the whole conversation. With
+``cache_control`` breakpoints on that stable prefix, Anthropic reuses the
+work done for it on the previous turn, so later turns are processed faster
+and cached input tokens are billed at a fraction of the normal price.
+
+Breakpoints go on the last system block and, once a conversation has an
+answer in it, on the last two user messages: the latest one writes the
+prefix for the next turn, the one before reads what the previous turn
+wrote. Single prompts (one-off calls, batch rows) only cache the system
+prompt, as their messages are unlikely to be sent again. Prefixes below the
+model's minimum cacheable length are simply not cached.
+"""
+
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+EPHEMERAL = {"type": "ephemeral"}
+
+# Bedrock models that reject cache_control
+_BEDROCK_UNSUPPORTED = (
+    "claude-instant",
+    "claude-v2",
+    "claude-3-haiku",
+    "claude-3-sonnet",
+    "claude-3-opus",
+    "claude-3-5-sonnet-20240620",
+)
+
+# Usage counters of this process, for !cache and the batch summary
+_usage_lock = threading.Lock()
+_usage_counts: Dict[str, int] = {
+    "requests": 0,
+    "input_tokens": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+}
+_last_usage: Dict[str, int] = {}
+
+
+def bedrock_supports_caching(model_id: str) -> bool:
+    """
+    Check whether a Bedrock Anthropic model accepts cache_control breakpoints.
+
+    Args:
+        model_id (str): The Bedrock model id
+
+    Returns:
+        bool: False for the older Claude models that reject them
+    """
+    return not any(name in model_id for name in _BEDROCK_UNSUPPORTED)
+
+
+def build_messages(
+    messages: List[Dict[str, str]], cache: bool
+) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Convert lask messages to the Anthropic Messages format.
+
+    System messages become the top-level ``system`` field, since the Messages
+    API has no system role.
+
+    Args:
+        messages (List[Dict[str, str]]): Messages with role and content
+        cache (bool): Whether to add cache_control breakpoints
+
+    Returns:
+        Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]: The system
+            blocks (None without a system prompt) and the remaining messages
+    """
+    system: List[Dict[str, Any]] = [
+        {"type": "text", "text": m["content"]}
+        for m in messages
+        if m["role"] == "system"
+    ]
+    rest: List[Dict[str, Any]] = [m for m in messages if m["role"] != "system"]
+
+    if cache:
+        if system:
+            system[-1]["cache_control"] = EPHEMERAL
+        # Only a conversation's prefix is sent again with the next turn
+        if any(m["role"] == "assistant" for m in rest):
+            user_indexes = [i for i, m in enumerate(rest) if m["role"] == "user"]
+            for i in user_indexes[-2:]:
+                rest[i] = {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": rest[i]["content"],
+                            "cache_control": EPHEMERAL,
+                        }
+                    ],
+                }
+
+    return system or None, rest
+
+
+def record_usage(usage: Optional[Mapping[str, Any]]) -> None:
+    """
+    Record the input token usage reported for one request.
+
+    Args:
+        usage (Optional[Mapping[str, Any]]): The ``usage`` object of a message
+    """
+    if not usage:
+        return
+    counts = {
+        key: usage.get(key) or 0
+        for key in (
+            "input_tokens",
+            "cache_read_input_tokens",
+            "cache_creation_input_tokens",
+        )
+    }
+    with _usage_lock:
+        _usage_counts["requests"] += 1
+        for key, value in counts.items():
+            _usage_counts[key] += value
+        _last_usage.clear()
+        _last_usage.update(counts)
+
+
+def usage_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get the prompt cache counters of this process.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Totals over all requests ("total", which also
+            counts "requests") and the latest request ("last"); token counts
+            are uncached input ("input_tokens"), read from the cache
+            ("cache_read_input_tokens") and written to it
+            ("cache_creation_input_tokens")
+    """
+    with _usage_lock:
+        return {"total": dict(_usage_counts), "last": dict(_last_usage)}
+
+
+def format_usage(counts: Mapping[str, int]) -> str:
+    """
+    Describe token counts as shown by the REPL and batch runs.
+
+    Args:
+        counts (Mapping[str, int]): Token counts as returned by usage_stats()
+
+    Returns:
+        str: A one-line summary
+    """
+    read = counts.get("cache_read_input_tokens", 0)
+    written = counts.get("cache_creation_input_tokens", 0)
+    total = counts.get("input_tokens", 0) + read + written
+    return (
+        f"{read} of {total} input tokens read from the prompt cache, "
+        f"{written} written to it"
+    )
@@ -0,0 +1,180 @@
+"""
+Provider registry: which module handles each provider name.
+
+The built-in providers live in src.providers. Installed packages can add
+providers through the ``lask.providers`` entry point group, naming a module
+with the same interface as the built-in ones (``call_api``, ``acall_api``
+and optionally ``DEFAULT_MODEL``):
+
+    [project.entry-points."lask.providers"]
+    mistral = "lask_mistral.provider"
+
+A config section with a ``type`` setting is a named instance of another
+provider, e.g. an OpenAI-compatible server on the local network:
+
+    [vllm]
+    type = openai
+    base_url = http://10.0.0.5:8000/v1
+    model = meta-llama/Llama-3.1-8B-Instruct
+
+Calls to an instance go to its type's module with ``provider=<section>``, so
+providers that support instances accept that keyword argument and read
+their settings from the named section.
+
+Modules are imported on first use and kept in a dispatch table, so every
+later call is a dictionary lookup.
+"""
+
+from importlib import import_module
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+from src.config import LaskConfig
+
+ENTRY_POINT_GROUP = "lask.providers"
+
+# Built-in provider name -> module
+BUILTIN_PROVIDERS: Dict[str, str] = {
+    name: f"src.providers.{name}" for name in LaskConfig.SUPPORTED_PROVIDERS
+}
+
+# Provider name -> loaded module
+_dispatch: Dict[str, ModuleType] = {}
+# Entry points of installed provider plugins, discovered on first need
+_plugins: Optional[Dict[str, Any]] = None
+
+
+def plugins() -> Dict[str, Any]:
+    """
+    Find the providers registered by installed packages.
+
+    Scanning the installed distributions takes a few milliseconds, so it's
+    only done once, and only for names that aren't built in.
+
+    Returns:
+        Dict[str, Any]: Entry points by provider name
+    """
+    global _plugins
+    if _plugins is None:
+        from importlib.metadata import entry_points
+
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python 3.9 returns a dict of groups
+            found = entry_points().get(ENTRY_POINT_GROUP, [])
+        _plugins = {entry_point.name: entry_point for entry_point in found}
+    return _plugins
+
+
+def register(name: str, module: Any) -> None:
+    """
+    Add or replace a provider from code, e.g. in a program embedding lask.
+
+    Args:
+        name (str): The provider name
+        module (Any): A module or object with call_api and acall_api
+    """
+    _dispatch[name] = module
+
+
+def provider_type(name: str, config: Optional[LaskConfig] = None) -> str:
+    """
+    Get the provider that handles a name.
+
+    Args:
+        name (str): A provider or named instance
+        config (Optional[LaskConfig]): Configuration with the named instances
+
+    Returns:
+        str: The ``type`` of the name's config section, or the name itself
+    """
+    if config is not None:
+        section = config.providers.get(name)
+        if section is not None and section.type:
+            return section.type.lower()
+    return name
+
+
+def load(name: str) -> ModuleType:
+    """
+    Get the module of a provider, importing it on first use.
+
+    Args:
+        name (str): A built-in, plugin or registered provider name
+
+    Returns:
+        ModuleType: The provider module
+
+    Raises:
+        ImportError: If no provider has that name
+    """
+    module = _dispatch.get(name)
+    if module is not None:
+        return module
+
+    if name in BUILTIN_PROVIDERS:
+        module = import_module(BUILTIN_PROVIDERS[name])
+    elif name in plugins():
+        module = plugins()[name].load()
+    else:
+        raise ImportError(
+            f"Provider '{name}' is not supported. Make sure the module exists."
+        )
+    _dispatch[name] = module
+    return module
+
+
+def is_supported(name: str, config: Optional[LaskConfig] = None) -> bool:
+    """
+    Check whether a provider or named instance can be called.
+
+    Args:
+        name (str): A provider or named instance
+        config (Optional[LaskConfig]): Configuration with the named instances
+
+    Returns:
+        bool: True if a module handles it
+    """
+    kind = provider_type(name, config)
+    return kind in BUILTIN_PROVIDERS or kind in _dispatch or kind in plugins()
+
+
+def available(config: Optional[LaskConfig] = None) -> List[str]:
+    """
+    List the names that can be used as providers.
+
+    Args:
+        config (Optional[LaskConfig]): Configuration with the named instances
+
+    Returns:
+        List[str]: Built-in providers, then plugins and named instances
+    """
+    names = list(BUILTIN_PROVIDERS)
+    for name in sorted({*_dispatch, *plugins()}):
+        if name not in names:
+            names.append(name)
+    if config is not None:
+        names += [
+            name
+            for name, section in config.providers.items()
+            if section.type and name not in names
+        ]
+    return names
+
+
+def call_kwargs(name: str, config: LaskConfig) -> Dict[str, str]:
+    """
+    Get the extra arguments for calling a provider module.
+
+    Args:
+        name (str): A provider or named instance
+        config (LaskConfig): Configuration with the named instances
+
+    Returns:
+        Dict[str, str]: ``provider`` naming the config section for named
+                        instances, nothing for the providers themselves
+    """
+    if provider_type(name, config) != name:
+        return {"provider": name}
+    return {}
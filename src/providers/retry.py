@@ -0,0 +1,572 @@
+"""
+Retries for provider requests.
+
+Rate limits (429), overloaded servers (503, Anthropic's 529), other server
+errors, Bedrock throttling and dropped connections are retried; everything
+else (bad requests, authentication, unknown models) fails at once. The wait
+before a retry comes from the server when it says how long to wait
+(Retry-After, retry-after-ms, or the reset time of an exhausted rate limit),
+and otherwise grows exponentially with random jitter, so concurrent batch
+workers don't all retry at the same moment.
+
+Streams are retried only until their first chunk has been received; after
+that a failure is raised, since the consumer has already seen part of the
+response.
+
+Every retry is a request the server counts against its rate limits, so each
+one first runs a before_retry hook, which lask's client-side rate limiter
+uses to charge the attempt. Provider modules don't pass the hook themselves:
+call_provider_api() makes it current for the call with before_retries().
+"""
+
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TypeVar,
+    Union,
+)
+from urllib.parse import urlsplit
+
+from src import metrics
+from src.config import ProviderConfig
+from src.providers import transport
+
+T = TypeVar("T")
+
+# Defaults used when a provider section doesn't override them
+DEFAULT_RETRY_BASE_DELAY = 0.5
+DEFAULT_RETRY_MAX_DELAY = 30.0
+
+# Run before each retry of the current call, see before_retries()
+_before_retry: ContextVar[Optional[Callable[[], None]]] = ContextVar(
+    "lask_before_retry", default=None
+)
+_abefore_retry: ContextVar[Optional[Callable[[], Awaitable[None]]]] = ContextVar(
+    "lask_abefore_retry", default=None
+)
+
+# Rate limited, overloaded or temporarily failing
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+
+# Bedrock error codes worth retrying
+RETRYABLE_AWS_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "ModelStreamErrorException",
+}
+
+# Rate limit headers: (remaining, reset); the reset is only used when nothing remains
+OPENAI_RATE_LIMITS = [
+    ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+    ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+]
+ANTHROPIC_RATE_LIMITS = [
+    (f"anthropic-ratelimit-{kind}-remaining", f"anthropic-ratelimit-{kind}-reset")
+    for kind in ("requests", "tokens", "input-tokens", "output-tokens")
+]
+
+
+class ProviderError(Exception):
+    """An error response from a provider API."""
+
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            message (str): The error, as shown to the user
+            status (Optional[int]): The HTTP status
+            retryable (bool): Whether sending the request again may succeed
+            retry_after (Optional[float]): Seconds the server asked to wait before retrying
+        """
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class RetryPolicy(NamedTuple):
+    """How often and how long to retry a provider's requests."""
+
+    max_retries: int
+    base_delay: float
+    max_delay: float
+    # Shown in retry messages, e.g. the API host
+    label: str
+
+
+def get_policy(provider_config: Optional[ProviderConfig], label: str) -> RetryPolicy:
+    """
+    Get the retry policy for a provider.
+
+    Args:
+        provider_config (Optional[ProviderConfig]): Provider settings
+        label (str): Name shown in retry messages; URLs are shortened to their host
+
+    Returns:
+        RetryPolicy: The policy
+    """
+    label = urlsplit(label).netloc or label
+    if provider_config is None:
+        return RetryPolicy(
+            transport.DEFAULT_MAX_RETRIES,
+            DEFAULT_RETRY_BASE_DELAY,
+            DEFAULT_RETRY_MAX_DELAY,
+            label,
+        )
+    return RetryPolicy(
+        provider_config.get("max_retries", transport.DEFAULT_MAX_RETRIES),
+        provider_config.get("retry_base_delay", DEFAULT_RETRY_BASE_DELAY),
+        provider_config.get("retry_max_delay", DEFAULT_RETRY_MAX_DELAY),
+        label,
+    )
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse a Go-style duration such as "20ms", "1.5s" or "6m0s" into seconds."""
+    total = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+            i += 1
+            continue
+        unit = "ms" if value.startswith("ms", i) else char
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}.get(unit)
+        if scale is None or not number:
+            return None
+        total += float(number) * scale
+        number = ""
+        i += len(unit)
+    return total if not number else None
+
+
+def _parse_time(value: str) -> Optional[float]:
+    """Parse an RFC 3339 timestamp or HTTP date into seconds from now."""
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Get how long the server asked to wait before retrying.
+
+    Args:
+        headers (Mapping[str, str]): Response headers (case-insensitive)
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the server didn't say
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            seconds = _parse_time(value)
+            if seconds is not None:
+                return seconds
+
+    # Otherwise wait for the exhausted rate limits to reset
+    waits = []
+    for remaining, reset in OPENAI_RATE_LIMITS:
+        if headers.get(remaining) == "0" and headers.get(reset):
+            waits.append(_parse_duration(headers[reset]))
+    for remaining, reset in ANTHROPIC_RATE_LIMITS:
+        if headers.get(remaining) == "0" and headers.get(reset):
+            waits.append(_parse_time(headers[reset]))
+    waits = [wait for wait in waits if wait is not None]
+    return max(waits) if waits else None
+
+
+def check_response(response: Any) -> Any:
+    """
+    Raise a ProviderError for an error response.
+
+    Args:
+        response (Any): A requests or httpx response; the body of an httpx
+                        stream must have been read
+
+    Returns:
+        Any: The response, if its status is 200
+
+    Raises:
+        ProviderError: If the status isn't 200
+    """
+    if response.status_code == 200:
+        return response
+    raise ProviderError(
+        f"{response.status_code} {response.text}",
+        status=response.status_code,
+        retryable=response.status_code in RETRYABLE_STATUSES,
+        retry_after=retry_after(response.headers),
+    )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check whether a failed request may succeed when sent again.
+
+    Args:
+        error (BaseException): The error the request failed with
+
+    Returns:
+        bool: True for rate limits, overload, server errors and dropped connections
+    """
+    if isinstance(error, transport.RequestCancelled) or transport.cancelled():
+        # Aborted on purpose, e.g. a race that another provider won
+        return False
+    if isinstance(error, ProviderError):
+        return error.retryable
+
+    # Only check the HTTP libraries that are already loaded
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(
+        error,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    ):
+        return True
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    botocore = sys.modules.get("botocore.exceptions")
+    if botocore is not None and isinstance(
+        error, (botocore.ConnectionError, botocore.HTTPClientError)
+    ):
+        return True
+
+    # botocore ClientError and EventStreamError carry the AWS error code
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        return code in RETRYABLE_AWS_CODES or status in RETRYABLE_STATUSES
+    return False
+
+
+def next_delay(error: BaseException, attempt: int, policy: RetryPolicy) -> float:
+    """
+    Decide whether to retry after an error and how long to wait first.
+
+    Args:
+        error (BaseException): The error of the failed attempt
+        attempt (int): Number of retries made so far
+        policy (RetryPolicy): The provider's retry policy
+
+    Returns:
+        float: Seconds to wait before the next attempt
+
+    Raises:
+        BaseException: The error itself, if it shouldn't be retried
+    """
+    if attempt >= policy.max_retries or not is_retryable(error):
+        raise error
+
+    delay = getattr(error, "retry_after", None)
+    if delay is not None:
+        if delay > policy.max_delay:
+            # Waiting that long is worse than failing
+            raise error
+        # A little jitter so clients told the same time don't retry at once
+        delay += random.uniform(0, min(1.0, delay * 0.1))
+    else:
+        # Exponential backoff with jitter: half fixed, half random
+        ceiling = min(policy.max_delay, policy.base_delay * 2**attempt)
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.retries += 1
+
+    status = getattr(error, "status", None)
+    reason = str(status) if status else type(error).__name__
+    print(
+        f"[retry] {policy.label} {reason}, retrying in {delay:.1f}s "
+        f"({attempt + 1}/{policy.max_retries})",
+        file=sys.stderr,
+    )
+    return delay
+
+
+def call(
+    send: Callable[[], T],
+    provider_config: Optional[ProviderConfig],
+    label: str,
+    before_retry: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    Make a request, retrying it on retryable errors.
+
+    Args:
+        send (Callable[[], T]): Makes one attempt and returns its result
+        provider_config (Optional[ProviderConfig]): Provider settings for the retry policy
+        label (str): Name shown in retry messages
+        before_retry (Optional[Callable[[], None]]): Runs before each retry;
+                                                     defaults to the current call's hook
+
+    Returns:
+        T: The result of the first successful attempt
+    """
+    policy = get_policy(provider_config, label)
+    before_retry = before_retry or _before_retry.get()
+    attempt = 0
+    while True:
+        try:
+            return send()
+        except Exception as e:
+            transport.sleep(next_delay(e, attempt, policy))
+            attempt += 1
+            if before_retry is not None:
+                before_retry()
+
+
+def stream(
+    open_stream: Callable[[], Iterator[T]],
+    provider_config: Optional[ProviderConfig],
+    label: str,
+    before_retry: Optional[Callable[[], None]] = None,
+) -> Iterator[T]:
+    """
+    Stream a response, retrying on retryable errors before its first chunk.
+
+    Args:
+        open_stream (Callable[[], Iterator[T]]): Makes one attempt and returns its stream
+        provider_config (Optional[ProviderConfig]): Provider settings for the retry policy
+        label (str): Name shown in retry messages
+        before_retry (Optional[Callable[[], None]]): Runs before each retry;
+                                                     defaults to the current call's hook
+
+    Yields:
+        T: The chunks of the first attempt that produced one
+    """
+    policy = get_policy(provider_config, label)
+    # Read on the first step, which makes every attempt
+    before_retry = before_retry or _before_retry.get()
+    attempt = 0
+    while True:
+        chunks = open_stream()
+        try:
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                delay = next_delay(e, attempt, policy)
+            else:
+                yield first
+                yield from chunks
+                return
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        transport.sleep(delay)
+        attempt += 1
+        if before_retry is not None:
+            before_retry()
+
+
+async def acall(
+    send: Callable[[], Awaitable[T]],
+    provider_config: Optional[ProviderConfig],
+    label: str,
+    before_retry: Optional[Callable[[], Awaitable[None]]] = None,
+) -> T:
+    """
+    Make a request from async code, retrying it on retryable errors.
+
+    Args:
+        send (Callable[[], Awaitable[T]]): Makes one attempt and returns its result
+        provider_config (Optional[ProviderConfig]): Provider settings for the retry policy
+        label (str): Name shown in retry messages
+        before_retry (Optional[Callable[[], Awaitable[None]]]): Awaited before each
+                                                                retry; defaults to the
+                                                                current call's hook
+
+    Returns:
+        T: The result of the first successful attempt
+    """
+    # Imported here so the synchronous path doesn't load asyncio
+    import asyncio
+
+    policy = get_policy(provider_config, label)
+    before_retry = before_retry or _abefore_retry.get()
+    attempt = 0
+    while True:
+        try:
+            return await send()
+        except Exception as e:
+            await asyncio.sleep(next_delay(e, attempt, policy))
+            attempt += 1
+            if before_retry is not None:
+                await before_retry()
+
+
+async def astream(
+    open_stream: Callable[[], AsyncIterator[T]],
+    provider_config: Optional[ProviderConfig],
+    label: str,
+    before_retry: Optional[Callable[[], Awaitable[None]]] = None,
+) -> AsyncIterator[T]:
+    """
+    Stream a response from async code, retrying on retryable errors before its
+    first chunk.
+
+    Args:
+        open_stream (Callable[[], AsyncIterator[T]]): Makes one attempt and returns its stream
+        provider_config (Optional[ProviderConfig]): Provider settings for the retry policy
+        label (str): Name shown in retry messages
+        before_retry (Optional[Callable[[], Awaitable[None]]]): Awaited before each
+                                                                retry; defaults to the
+                                                                current call's hook
+
+    Yields:
+        T: The chunks of the first attempt that produced one
+    """
+    import asyncio
+
+    policy = get_policy(provider_config, label)
+    before_retry = before_retry or _abefore_retry.get()
+    attempt = 0
+    while True:
+        chunks = open_stream()
+        try:
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                delay = next_delay(e, attempt, policy)
+            else:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+                return
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
+        if before_retry is not None:
+            await before_retry()
+
+
+def before_retries(
+    hook: Callable[[], None], call: Callable[[], Union[str, Iterator[str]]]
+) -> Union[str, Iterator[str]]:
+    """
+    Make a provider call whose retries each run a hook first.
+
+    Args:
+        hook (Callable[[], None]): Runs before each retry
+        call (Callable[[], Union[str, Iterator[str]]]): Makes the call
+
+    Returns:
+        Union[str, Iterator[str]]: The call's result; streams keep the hook
+                                   current while they're consumed
+    """
+    token = _before_retry.set(hook)
+    try:
+        result = call()
+    finally:
+        _before_retry.reset(token)
+    if isinstance(result, str):
+        return result
+    return _stream_before_retries(hook, iter(result))
+
+
+def _stream_before_retries(
+    hook: Callable[[], None], chunks: Iterator[str]
+) -> Iterator[str]:
+    """Yield a stream's chunks, making the hook current while each is produced."""
+    try:
+        while True:
+            # Streams send their request lazily, on the first step
+            token = _before_retry.set(hook)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _before_retry.reset(token)
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+async def abefore_retries(
+    hook: Callable[[], Awaitable[None]],
+    chunks: AsyncIterator[str],
+    sync_hook: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    Consume an async provider stream whose retries each await a hook first.
+
+    Args:
+        hook (Callable[[], Awaitable[None]]): Awaited before each retry
+        chunks (AsyncIterator[str]): The provider's stream
+        sync_hook (Optional[Callable[[], None]]): Runs before each retry made by
+                                                  blocking code on an executor,
+                                                  like the Bedrock calls
+
+    Yields:
+        str: The stream's chunks
+    """
+    try:
+        while True:
+            token = _abefore_retry.set(hook)
+            sync_token = _before_retry.set(sync_hook)
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _before_retry.reset(sync_token)
+                _abefore_retry.reset(token)
+            yield chunk
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
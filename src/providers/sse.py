@@ -0,0 +1,265 @@
+"""
+Incremental Server-Sent Events parser shared by the streaming providers.
+
+Implements the event stream interpretation rules from the HTML specification
+(https://html.spec.whatwg.org/multipage/server-sent-events.html) on raw bytes:
+CRLF, LF and CR line endings, comments, multi-line ``data:`` fields, ``event:``,
+``id:`` and ``retry:`` fields. Bytes can be fed in arbitrarily sized pieces, so
+a network read may end in the middle of a line or even a UTF-8 sequence.
+"""
+
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from src import metrics
+
+# Default number of bytes requested from the socket per read
+DEFAULT_READ_SIZE = 16384
+
+_BOM = b"\xef\xbb\xbf"
+
+
+class ServerSentEvent(NamedTuple):
+    """A single dispatched server-sent event."""
+
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+
+def _new_event(fields: tuple) -> ServerSentEvent:
+    """Build an event from a 4-tuple, skipping the slower keyword-aware constructor."""
+    return tuple.__new__(ServerSentEvent, fields)
+
+
+class SSEParser:
+    """
+    Incremental parser turning a byte stream into ServerSentEvent objects.
+
+    Usage:
+        parser = SSEParser()
+        for chunk in chunks:
+            for event in parser.feed(chunk):
+                ...
+        parser.close()
+    """
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._started = False
+        self._event_type = ""
+        self._data: List[bytes] = []
+        self._last_event_id: Optional[str] = None
+        self._retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[ServerSentEvent]:
+        """
+        Feed raw bytes into the parser.
+
+        Args:
+            chunk (bytes): The next piece of the stream
+
+        Returns:
+            List[ServerSentEvent]: Events completed by this chunk, in order
+        """
+        if not chunk:
+            return []
+
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if not self._started:
+            # Wait until we can tell whether the stream starts with a BOM
+            if len(buffer) < len(_BOM) and _BOM.startswith(buffer):
+                self._buffer = buffer
+                return []
+            if buffer.startswith(_BOM):
+                buffer = buffer[len(_BOM) :]
+            self._started = True
+
+        if b"\r" not in buffer:
+            # Fast path for the usual LF-only streams: split on the blank lines
+            # that terminate events and keep the unfinished event buffered.
+            blocks = buffer.split(b"\n\n")
+            self._buffer = blocks.pop()
+            return self._process_blocks(blocks)
+
+        lines = buffer.splitlines()
+        if buffer.endswith(b"\n"):
+            self._buffer = b""
+        elif buffer.endswith(b"\r"):
+            # A trailing CR may be the first half of a CRLF split across reads
+            self._buffer = lines.pop() + b"\r"
+        else:
+            # The last line is still incomplete
+            self._buffer = lines.pop()
+
+        return self._process_lines(lines)
+
+    def close(self) -> List[ServerSentEvent]:
+        """
+        Signal the end of the stream.
+
+        A line held back because it ended in a bare CR is processed. Per the
+        specification, an event that was not terminated by a blank line when
+        the stream ends is discarded.
+
+        Returns:
+            List[ServerSentEvent]: Events completed by the held-back line
+        """
+        events: List[ServerSentEvent] = []
+        if self._buffer.endswith(b"\r"):
+            events = self._process_lines(self._buffer.splitlines())
+        self._buffer = b""
+        self._event_type = ""
+        self._data = []
+        return events
+
+    def _process_blocks(self, blocks: List[bytes]) -> List[ServerSentEvent]:
+        """Interpret complete LF-separated events, without their trailing blank line."""
+        events: List[ServerSentEvent] = []
+        append = events.append
+        for block in blocks:
+            if not (self._data or self._event_type):
+                # Shortcut the two shapes providers actually send:
+                # "data: ..." and "event: ...\ndata: ..."
+                event_type = "message"
+                data = block
+                if block[:7] == b"event: ":
+                    head, _, data = block.partition(b"\n")
+                    event_type = (
+                        head[7:].decode("utf-8", errors="replace") or event_type
+                    )
+                if data[:6] == b"data: " and b"\n" not in data:
+                    append(
+                        _new_event(
+                            (
+                                event_type,
+                                data[6:].decode("utf-8", errors="replace"),
+                                self._last_event_id,
+                                self._retry,
+                            )
+                        )
+                    )
+                    continue
+
+            block_lines = block.split(b"\n")
+            block_lines.append(b"")
+            events.extend(self._process_lines(block_lines))
+        return events
+
+    def _process_lines(self, lines: List[bytes]) -> List[ServerSentEvent]:
+        """Interpret complete lines (without terminators), returning dispatched events."""
+        events: List[ServerSentEvent] = []
+        data = self._data
+        for line in lines:
+            # data lines are by far the most common, so check for them first
+            if line.startswith(b"data:"):
+                value = line[5:]
+                data.append(value[1:] if value[:1] == b" " else value)
+            elif line.startswith(b"event:"):
+                value = line[6:]
+                self._event_type = (value[1:] if value[:1] == b" " else value).decode(
+                    "utf-8", errors="replace"
+                )
+            elif not line:
+                if data:
+                    events.append(
+                        ServerSentEvent(
+                            self._event_type or "message",
+                            b"\n".join(data).decode("utf-8", errors="replace"),
+                            self._last_event_id,
+                            self._retry,
+                        )
+                    )
+                    data.clear()
+                self._event_type = ""
+            elif line[:1] != b":":
+                # Lines starting with a colon are comments, used as keep-alives
+                self._process_field(line)
+        return events
+
+    def _process_field(self, line: bytes) -> None:
+        """Handle a non-data field line."""
+        field, sep, value = line.partition(b":")
+        if sep and value[:1] == b" ":
+            value = value[1:]
+
+        if field == b"data":
+            # A bare "data" line without a colon appends an empty line
+            self._data.append(value)
+        elif field == b"event":
+            self._event_type = value.decode("utf-8", errors="replace")
+        elif field == b"id":
+            if b"\x00" not in value:
+                self._last_event_id = value.decode("utf-8", errors="replace")
+        elif field == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+        # Any other field is ignored
+
+
+def iter_sse_events(chunks: Iterable[bytes]) -> Iterator[ServerSentEvent]:
+    """
+    Parse an iterable of byte chunks into server-sent events.
+
+    Args:
+        chunks (Iterable[bytes]): Raw bytes as read from the network
+
+    Yields:
+        ServerSentEvent: Events as soon as they are complete
+    """
+    parser = SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def iter_response_bytes(
+    response, read_size: int = DEFAULT_READ_SIZE
+) -> Iterator[bytes]:
+    """
+    Read a streaming response body as raw byte chunks.
+
+    Uses urllib3's ``read1`` when available, which returns as soon as any data
+    has arrived instead of blocking until ``read_size`` bytes are buffered.
+
+    Args:
+        response: A ``requests.Response`` opened with ``stream=True``
+        read_size (int): Maximum number of bytes per read
+
+    Yields:
+        bytes: Body chunks as they arrive
+    """
+    request_metrics = metrics.current()
+    raw = response.raw
+    if not (hasattr(raw, "read1") and hasattr(raw, "decode_content")):
+        for data in response.iter_content(chunk_size=read_size):
+            if request_metrics is not None:
+                request_metrics.bytes += len(data)
+            yield data
+        return
+
+    while True:
+        data = raw.read1(read_size, decode_content=True)
+        if not data:
+            break
+        if request_metrics is not None:
+            request_metrics.bytes += len(data)
+        yield data
+
+
+def iter_response_events(
+    response, read_size: Optional[int] = None
+) -> Iterator[ServerSentEvent]:
+    """
+    Parse the server-sent events of a streaming HTTP response.
+
+    Args:
+        response: A ``requests.Response`` opened with ``stream=True``
+        read_size (Optional[int]): Bytes per read, defaults to DEFAULT_READ_SIZE
+
+    Yields:
+        ServerSentEvent: Events as soon as they are complete
+    """
+    yield from iter_sse_events(
+        iter_response_bytes(response, read_size or DEFAULT_READ_SIZE)
+    )
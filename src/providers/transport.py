@@ -0,0 +1,353 @@
+"""
+Shared HTTP transport for the requests-based providers.
+
+Every provider talks to its API through a keep-alive ``requests.Session``
+that is created once per host and then reused, so consecutive REPL turns and
+concurrent batch calls share pooled TCP/TLS connections instead of paying a
+fresh handshake on every request.
+"""
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src import metrics
+from src.config import ProviderConfig
+
+if TYPE_CHECKING:
+    # requests is imported on first use, see _create_session()
+    import requests
+
+# Defaults used when a provider section doesn't override them
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+# One session per (scheme, host[:port]); guarded by _sessions_lock on creation
+_sessions: Dict[Tuple[str, str], "requests.Session"] = {}
+_sessions_lock = threading.Lock()
+
+# The cancel scope, if any, of the calling thread
+_local = threading.local()
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is made or completed inside a cancelled scope."""
+
+
+class CancelScope:
+    """
+    Tracks the responses opened by one thread so another thread can abort them.
+
+    Cancelling shuts down the sockets of all registered responses, which
+    wakes a thread blocked reading a stream, and makes any later request
+    made in the scope fail with RequestCancelled. It also wakes a thread
+    waiting to retry in sleep().
+    """
+
+    def __init__(self) -> None:
+        self.cancelled = False
+        self._aborts: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def add(self, response: "requests.Response") -> None:
+        """
+        Register a response opened in this scope.
+
+        Raises:
+            RequestCancelled: If the scope was cancelled while the request was in flight
+        """
+        self._add(lambda: _abort(response))
+
+    def add_raw(self, raw: Any) -> None:
+        """
+        Register a urllib3 response opened in this scope, e.g. the body of a
+        boto3 event stream.
+
+        Raises:
+            RequestCancelled: If the scope was cancelled while the request was in flight
+        """
+        self._add(lambda: _abort_raw(raw))
+
+    def _add(self, abort: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._aborts.append(abort)
+                return
+        abort()
+        raise RequestCancelled()
+
+    def cancel(self) -> None:
+        """Abort every response opened in this scope, now and in the future."""
+        with self._lock:
+            self.cancelled = True
+            aborts, self._aborts = self._aborts, []
+        self._event.set()
+        for abort in aborts:
+            abort()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for the scope to be cancelled; True if it was."""
+        return self._event.wait(timeout)
+
+
+def _shutdown(raw: Any) -> None:
+    """Shut down the socket of a urllib3 response so blocked reads return."""
+    connection = getattr(raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _abort(response: "requests.Response") -> None:
+    """Close a response, shutting its socket down so blocked reads return."""
+    _shutdown(response.raw)
+    # The shut down connection isn't returned to the pool
+    response.close()
+
+
+def _abort_raw(raw: Any) -> None:
+    """Close a urllib3 response, shutting its socket down so blocked reads return."""
+    _shutdown(raw)
+    raw.close()
+
+
+@contextmanager
+def cancel_scope(scope: CancelScope) -> Iterator[CancelScope]:
+    """
+    Register every response opened by this thread in the block with a scope.
+
+    Args:
+        scope (CancelScope): The scope to register responses with
+
+    Yields:
+        CancelScope: The scope
+    """
+    previous = getattr(_local, "scope", None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+
+def _create_session(pool_size: int) -> "requests.Session":
+    """
+    Create a session with a sized connection pool.
+
+    urllib3 doesn't retry anything itself: failed connections, read errors and
+    error statuses all surface to src.providers.retry, which retries them up
+    to the provider's max_retries with one backoff policy. Retrying here too
+    would multiply the attempts and stack the backoffs.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections to keep per host
+
+    Returns:
+        requests.Session: The configured session
+    """
+    # Imported here, as requests takes longer to import than the rest of lask
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=0, redirect=False, raise_on_status=False)
+    adapter = _timed_adapter_class(HTTPAdapter)(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _timed_adapter_class(adapter_class: type) -> type:
+    """
+    Subclass a requests adapter so connections report their setup time, or
+    their reuse, to the metrics of the request that takes them.
+    """
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def timed(connection_class: type) -> type:
+        class TimedConnection(connection_class):  # type: ignore[misc, valid-type]
+            def connect(self) -> None:
+                start = time.perf_counter()
+                super().connect()
+                request_metrics = metrics.current()
+                if request_metrics is not None:
+                    # DNS lookup, TCP handshake and, for HTTPS, the TLS handshake
+                    request_metrics.add_connect(time.perf_counter() - start)
+
+        return TimedConnection
+
+    def report_reuse(pool_class: type) -> type:
+        class ReportingPool(pool_class):  # type: ignore[misc, valid-type]
+            def _get_conn(self, timeout: Optional[float] = None) -> Any:
+                connection = super()._get_conn(timeout)
+                request_metrics = metrics.current()
+                if request_metrics is not None and connection.sock is not None:
+                    request_metrics.connection_reused()
+                return connection
+
+        return ReportingPool
+
+    class TimedHTTPConnectionPool(report_reuse(HTTPConnectionPool)):  # type: ignore[misc]
+        ConnectionCls = timed(HTTPConnection)
+
+    class TimedHTTPSConnectionPool(report_reuse(HTTPSConnectionPool)):  # type: ignore[misc]
+        ConnectionCls = timed(HTTPSConnection)
+
+    class TimedAdapter(adapter_class):  # type: ignore[misc, valid-type]
+        def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool,
+                "https": TimedHTTPSConnectionPool,
+            }
+
+    return TimedAdapter
+
+
+def get_session(
+    url: str, provider_config: Optional[ProviderConfig] = None
+) -> "requests.Session":
+    """
+    Get the shared session for the host of the given URL, creating it if needed.
+
+    The pool settings of the provider that first contacts a host are used for
+    the lifetime of the process.
+
+    Args:
+        url (str): The URL that is about to be requested
+        provider_config (Optional[ProviderConfig]): Provider settings for the pool size
+
+    Returns:
+        requests.Session: A keep-alive session for the URL's host
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                pool_size = DEFAULT_POOL_SIZE
+                if provider_config is not None:
+                    pool_size = provider_config.get("pool_size", pool_size)
+                session = _create_session(pool_size)
+                _sessions[key] = session
+    return session
+
+
+def get_timeout(
+    provider_config: Optional[ProviderConfig] = None,
+) -> Tuple[float, Optional[float]]:
+    """
+    Get the (connect, read) timeout for a provider.
+
+    Args:
+        provider_config (Optional[ProviderConfig]): Provider settings
+
+    Returns:
+        Tuple[float, Optional[float]]: Connect timeout and read timeout in seconds.
+                                       A read timeout of None waits indefinitely.
+    """
+    if provider_config is None:
+        return (DEFAULT_CONNECT_TIMEOUT, None)
+    return (
+        provider_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        provider_config.timeout,
+    )
+
+
+def post(
+    url: str, provider_config: Optional[ProviderConfig] = None, **kwargs: Any
+) -> "requests.Response":
+    """
+    Send a POST request through the shared session for the URL's host.
+
+    Args:
+        url (str): The URL to post to
+        provider_config (Optional[ProviderConfig]): Provider settings for pooling and timeouts
+        **kwargs: Passed through to ``requests.Session.post``
+
+    Returns:
+        requests.Response: The response
+
+    Raises:
+        RequestCancelled: If the calling thread's cancel scope was cancelled
+    """
+    kwargs.setdefault("timeout", get_timeout(provider_config))
+    scope: Optional[CancelScope] = getattr(_local, "scope", None)
+    if scope is not None and scope.cancelled:
+        raise RequestCancelled()
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        # Response hooks run once the headers are parsed, before the body is read
+        kwargs["hooks"] = {
+            "response": lambda response, **_: request_metrics.mark_headers()
+        }
+    response = get_session(url, provider_config).post(url, **kwargs)
+    if scope is not None:
+        scope.add(response)
+    if request_metrics is not None and not kwargs.get("stream"):
+        request_metrics.bytes += len(response.content)
+    return response
+
+
+def cancelled() -> bool:
+    """Check whether the calling thread's cancel scope has been cancelled."""
+    scope: Optional[CancelScope] = getattr(_local, "scope", None)
+    return scope is not None and scope.cancelled
+
+
+def register_raw(raw: Any) -> None:
+    """
+    Register a urllib3 response opened outside post(), e.g. by boto3, with
+    the calling thread's cancel scope, if it has one.
+
+    Args:
+        raw (Any): The urllib3 response
+
+    Raises:
+        RequestCancelled: If the scope was cancelled while the request was in flight
+    """
+    scope: Optional[CancelScope] = getattr(_local, "scope", None)
+    if scope is not None:
+        scope.add_raw(raw)
+
+
+def sleep(seconds: float) -> None:
+    """
+    Wait before retrying a request, waking up early if the calling thread's
+    cancel scope is cancelled.
+
+    Args:
+        seconds (float): How long to wait
+
+    Raises:
+        RequestCancelled: If the scope was cancelled
+    """
+    scope: Optional[CancelScope] = getattr(_local, "scope", None)
+    if scope is None:
+        time.sleep(seconds)
+    elif scope.wait(seconds):
+        raise RequestCancelled()
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions and drop them from the cache."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
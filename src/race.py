@@ -0,0 +1,275 @@
+"""
+Race mode and hedged requests for lask.
+
+Racing sends one prompt to several providers at once and keeps the fastest.
+Hedging sends it to a single provider and only sends a duplicate, to the same
+or a backup provider, when no first chunk has arrived after a delay.
+
+Either way every attempt runs on its own thread. The first attempt to
+produce content wins and is streamed; the others are cancelled straight away,
+which shuts down their connections instead of letting them run to completion
+in the background. The exception is a non-streaming Bedrock call, which boto3
+gives no way to interrupt: a losing one runs to completion and is discarded.
+"""
+
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from src.config import LaskConfig
+from src.providers import call_provider_api, resolve_messages, transport
+
+# Hedging counters for the lifetime of the process, see hedge_stats()
+_hedge_counts = {"requests": 0, "hedged": 0, "hedge_won": 0}
+_hedge_lock = threading.Lock()
+
+
+class _Racer(threading.Thread):
+    """One provider attempt, reporting its first chunk to the race."""
+
+    def __init__(
+        self,
+        race: "_Race",
+        provider: str,
+        messages: List[Dict[str, str]],
+    ) -> None:
+        super().__init__(name=f"lask-race-{provider}", daemon=True)
+        self.race = race
+        self.provider = provider
+        self.messages = messages
+        self.scope = transport.CancelScope()
+
+    def run(self) -> None:
+        try:
+            with transport.cancel_scope(self.scope):
+                result = call_provider_api(
+                    self.provider, self.race.config, self.race.prompt, self.messages
+                )
+                if isinstance(result, str):
+                    first: Optional[str] = result
+                    rest: Optional[Iterator[str]] = None
+                else:
+                    # Requests are sent lazily, so this runs inside the scope too
+                    rest = iter(result)
+                    first = next(rest, None)
+            if not first:
+                raise Exception("empty response")
+        except Exception as e:
+            # In a race an error only loses this attempt
+            self.race.results.put((self, None, None, e))
+            return
+
+        if not self.race.claim_win(self, first, rest):
+            # Another attempt won while this one was producing its first chunk
+            close = getattr(rest, "close", None)
+            if close is not None:
+                close()
+
+
+class _Race:
+    """Attempts at answering one prompt, of which the first to respond wins."""
+
+    def __init__(
+        self,
+        config: LaskConfig,
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> None:
+        self.config = config
+        self.prompt = prompt
+        self.conversation_history = conversation_history
+        self.racers: List[_Racer] = []
+        self.errors: List[Tuple[str, BaseException]] = []
+        self.winner: Optional[_Racer] = None
+        # (racer, first chunk, rest of the stream, error) per finished racer
+        self.results: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def start(self, provider: str) -> None:
+        """Send the prompt to one more provider."""
+        # Always pass a message list so providers don't echo the prompt
+        messages = resolve_messages(
+            self.config, provider, self.prompt, self.conversation_history
+        )
+        racer = _Racer(self, provider, messages)
+        self.racers.append(racer)
+        racer.start()
+
+    def claim_win(
+        self, racer: _Racer, first: str, rest: Optional[Iterator[str]]
+    ) -> bool:
+        """Claim the win for an attempt; returns False if another already won."""
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = racer
+        self.results.put((racer, first, rest, None))
+        return True
+
+    def cancel(self, keep: Optional[_Racer] = None) -> None:
+        """Cancel every attempt but the one to keep."""
+        for racer in self.racers:
+            if racer is not keep:
+                racer.scope.cancel()
+
+    def wait(
+        self, timeout: Optional[float] = None
+    ) -> Optional[Tuple[_Racer, Union[str, Iterator[str]]]]:
+        """
+        Wait for the first attempt with content and cancel the others.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait, None waits until decided
+
+        Returns:
+            Optional[Tuple[_Racer, Union[str, Iterator[str]]]]: The winning attempt
+                and its response, or None if the timeout passed first
+
+        Raises:
+            BaseException: The error of the only attempt, if it failed
+            Exception: If several attempts were started and all failed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self.errors) < len(self.racers):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                racer, first, rest, error = self.results.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if error is not None:
+                self.errors.append((racer.provider, error))
+                continue
+            # Abort the losers' connections right away
+            self.cancel(keep=racer)
+            if rest is None:
+                return racer, first
+            return racer, _stream(first, rest)
+
+        if len(self.errors) == 1:
+            raise self.errors[0][1]
+        raise Exception(
+            "All providers failed. "
+            + "; ".join(
+                f"{provider}: {str(error) or type(error).__name__}"
+                for provider, error in self.errors
+            )
+        )
+
+
+def _stream(first: str, rest: Iterator[str]) -> Iterator[str]:
+    """Yield the winning chunk and then the rest of the winner's stream."""
+    try:
+        yield first
+        yield from rest
+    finally:
+        close = getattr(rest, "close", None)
+        if close is not None:
+            close()
+
+
+def race_providers(
+    providers: List[str],
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> Tuple[str, Union[str, Iterator[str]]]:
+    """
+    Send a prompt to several providers at once and return the first to respond.
+
+    Args:
+        providers (List[str]): The providers to race
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+
+    Returns:
+        Tuple[str, Union[str, Iterator[str]]]: The winning provider and its response,
+                                               either full text or a stream iterator
+
+    Raises:
+        Exception: If every provider failed
+    """
+    race = _Race(config, prompt, conversation_history)
+    try:
+        for provider in providers:
+            race.start(provider)
+        racer, result = race.wait()
+    except BaseException:
+        race.cancel()
+        raise
+    return racer.provider, result
+
+
+def hedged_call(
+    provider: str,
+    config: LaskConfig,
+    prompt: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> Tuple[str, Union[str, Iterator[str]]]:
+    """
+    Call a provider, hedging with a duplicate request if the first chunk is slow.
+
+    Uses ``hedge_delay`` and ``hedge_provider`` from the provider section,
+    falling back to the [default] section. Without a hedge delay this is a
+    plain call_provider_api call.
+
+    Args:
+        provider (str): The provider to call
+        config (LaskConfig): Configuration object
+        prompt (str): The user prompt
+        conversation_history (Optional[List[Dict[str, str]]]): List of conversation messages
+                                                             for multi-turn dialogues
+
+    Returns:
+        Tuple[str, Union[str, Iterator[str]]]: The provider that answered and its
+                                               response, either full text or a stream iterator
+    """
+    provider_config = config.get_provider_config(provider)
+    delay = provider_config.get("hedge_delay", config.hedge_delay)
+    if delay is None:
+        return provider, call_provider_api(
+            provider, config, prompt, conversation_history
+        )
+    backup = provider_config.get("hedge_provider", config.hedge_provider) or provider
+
+    race = _Race(config, prompt, conversation_history)
+    try:
+        race.start(provider)
+        decided = race.wait(timeout=delay)
+        hedged = decided is None
+        if hedged:
+            print(
+                f"[hedge] no response from {provider} after {delay:g}s, also sending to {backup}",
+                file=sys.stderr,
+            )
+            race.start(backup)
+            decided = race.wait()
+    except BaseException:
+        race.cancel()
+        raise
+
+    racer, result = decided
+    hedge_won = racer is not race.racers[0]
+    with _hedge_lock:
+        _hedge_counts["requests"] += 1
+        _hedge_counts["hedged"] += hedged
+        _hedge_counts["hedge_won"] += hedge_won
+    return racer.provider, result
+
+
+def hedge_stats() -> Dict[str, int]:
+    """
+    Get the hedging counters of this process.
+
+    Returns:
+        Dict[str, int]: Hedged calls made ("requests"), calls that sent a
+                        duplicate ("hedged") and duplicates that answered first
+                        ("hedge_won")
+    """
+    with _hedge_lock:
+        return dict(_hedge_counts)
@@ -0,0 +1,209 @@
+"""
+Client-side rate limiting shared by all lask processes on a machine.
+
+Many lask processes using one API key (parallel CI jobs, batch runs) can
+together exceed the provider's rate limits and get 429s. With ``rpm``
+(requests per minute) and ``tpm`` (tokens per minute) set in a provider
+section, every request first takes from two token buckets for that
+provider and model, and waits when they are empty instead of failing.
+
+The buckets live in a small JSON file in the cache directory, read and
+written under a file lock, so separate processes draw from the same
+buckets. A request reserves its share right away, even when it has to
+wait: the bucket goes into debt and later requests wait behind it, which
+queues waiting processes in arrival order instead of having them all poll
+for the next free slot. Token costs are estimated from the message text
+plus ``max_tokens``, which providers count against the limit too.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import LaskConfig, default_cache_dir
+from src.context import estimate_tokens
+from src.locking import file_lock
+
+STATE_FILE = "ratelimits.json"
+
+# Waits shorter than this aren't reported on stderr
+REPORT_THRESHOLD = 1.0
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider and model."""
+
+    def __init__(
+        self,
+        key: str,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        directory: Optional[Path] = None,
+    ) -> None:
+        """
+        Args:
+            key (str): Identifies the buckets, e.g. "openai/gpt-4.1"
+            rpm (Optional[int]): Requests per minute, unlimited if unset
+            tpm (Optional[int]): Tokens per minute, unlimited if unset
+            directory (Optional[Path]): Directory of the state file, defaults to ~/.cache/lask
+        """
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.directory = directory or default_cache_dir()
+
+    @classmethod
+    def from_config(cls, config: LaskConfig, provider: str) -> Optional["RateLimiter"]:
+        """
+        Create the rate limiter for a provider's requests.
+
+        Args:
+            config (LaskConfig): Configuration object
+            provider (str): The provider name
+
+        Returns:
+            Optional[RateLimiter]: The limiter, or None if the provider has no limits
+        """
+        provider_config = config.get_provider_config(provider)
+        if not provider_config.rpm and not provider_config.tpm:
+            return None
+
+        # Imported here to avoid a circular import
+        from src.providers import get_provider_module, resolve_model
+
+        model = resolve_model(get_provider_module(provider, config), provider_config)
+        return cls(
+            f"{provider}/{model}" if model else provider,
+            rpm=provider_config.rpm,
+            tpm=provider_config.tpm,
+            directory=Path(config.cache_dir).expanduser() if config.cache_dir else None,
+        )
+
+    def _read(self, path: Path) -> Dict[str, List[float]]:
+        """Read the state of all buckets; a missing or corrupt file means full buckets."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _write(self, path: Path, state: Dict[str, List[float]]) -> None:
+        """Replace the state file atomically, so a crash can't leave half of it."""
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".ratelimits-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Take one request and a number of tokens from the buckets.
+
+        The buckets may go into debt; the caller must then wait before
+        sending the request.
+
+        Args:
+            tokens (int): Estimated tokens the request uses
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        costs = [
+            (f"{self.key}:{unit}", limit, min(cost, limit))
+            for unit, limit, cost in (("rpm", self.rpm, 1), ("tpm", self.tpm, tokens))
+            if limit
+        ]
+        if not costs:
+            return 0.0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / STATE_FILE
+        with file_lock(self.directory / f"{STATE_FILE}.lock"):
+            state = self._read(path)
+            now = time.time()
+
+            # Each bucket is [level, last update, capacity] and refills its
+            # capacity per minute; full buckets are dropped to keep the file small
+            for bucket, (level, updated, capacity) in list(state.items()):
+                level = min(capacity, level + capacity * (now - updated) / 60.0)
+                if level >= capacity:
+                    del state[bucket]
+                else:
+                    state[bucket] = [level, now, capacity]
+
+            wait = 0.0
+            for bucket, limit, cost in costs:
+                # The limit may have changed since the bucket was written
+                level = min(state.get(bucket, [limit])[0], limit) - cost
+                state[bucket] = [level, now, limit]
+                if level < 0:
+                    # A request larger than the bucket only waits for a full one
+                    wait = max(wait, -level * 60.0 / limit)
+            self._write(path, state)
+        return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until a request may be sent.
+
+        Args:
+            tokens (int): Estimated tokens the request uses
+
+        Raises:
+            RequestCancelled: If the request is cancelled while waiting
+        """
+        # Imported here so the limiter doesn't load the HTTP stack itself
+        from src.providers import transport
+
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._report(wait)
+            transport.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """
+        Wait until a request may be sent, from async code.
+
+        Args:
+            tokens (int): Estimated tokens the request uses
+        """
+        import asyncio
+
+        # Taking the file lock blocks, so it's done off the event loop thread
+        loop = asyncio.get_running_loop()
+        wait = await loop.run_in_executor(None, self.reserve, tokens)
+        if wait > 0:
+            self._report(wait)
+            await asyncio.sleep(wait)
+
+    def _report(self, wait: float) -> None:
+        """Tell the user about noticeable waits."""
+        if wait >= REPORT_THRESHOLD:
+            print(
+                f"[rate limit] {self.key} waiting {wait:.1f}s",
+                file=sys.stderr,
+            )
+
+
+def request_tokens(
+    messages: List[Dict[str, str]], max_tokens: Optional[int] = None
+) -> int:
+    """
+    Estimate the tokens a request counts against a tokens-per-minute limit.
+
+    Args:
+        messages (List[Dict[str, str]]): The resolved messages
+        max_tokens (Optional[int]): The response limit, if set
+
+    Returns:
+        int: The estimated tokens
+    """
+    return sum(estimate_tokens(m) for m in messages) + (max_tokens or 0)
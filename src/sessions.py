@@ -0,0 +1,366 @@
+"""
+Persistent REPL sessions for lask.
+
+Every message of a REPL session is appended to an SQLite database in WAL
+mode, one small transaction per message, so saving a turn never rewrites
+earlier ones and a crash loses at most the message being written. Message
+text is indexed with FTS5, which keeps `lask --search` fast over thousands
+of sessions; SQLite builds without FTS5 fall back to a slower LIKE scan.
+
+`lask --resume` reads a session newest message first and stops once the
+context budget is filled, so resuming a long session only loads what will
+actually be sent.
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from src.config import LaskConfig
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    provider TEXT,
+    title TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    provider TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (updated);
+"""
+
+# External-content index over messages.content, kept current by a trigger
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+# Length of session titles taken from the first prompt
+TITLE_LENGTH = 60
+# Longest search snippet shown
+SNIPPET_LENGTH = 120
+
+
+def default_data_dir() -> Path:
+    """Return the platform data directory for lask."""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return Path(base) / "lask"
+
+
+class SessionInfo(NamedTuple):
+    """A stored session."""
+
+    id: int
+    provider: Optional[str]
+    title: Optional[str]
+    created: float
+    updated: float
+
+
+class SearchResult(NamedTuple):
+    """A session with a message matching a search."""
+
+    session: SessionInfo
+    # The matching part of the message, with matches in [brackets]
+    snippet: str
+
+
+class SessionStore:
+    """An append-only store of REPL sessions."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """
+        Args:
+            path (Optional[Path]): Database file, defaults to ~/.local/share/lask/sessions.db
+        """
+        self.path = path or default_data_dir() / "sessions.db"
+        # Sessions hold everything typed at the prompt, so like the daemon
+        # socket and the cache they're readable by the owner only. SQLite
+        # creates the -wal and -shm files with the database file's mode.
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        # Tighten files created by earlier versions
+        for name in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+            try:
+                os.chmod(name, 0o600)
+            except OSError:
+                # Missing, or not ours to change
+                pass
+        self._db = sqlite3.connect(str(self.path))
+        # WAL lets a search run while a REPL is appending; NORMAL sync is
+        # durable across application crashes, which is all history needs
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite was built without FTS5
+            self.fts = False
+
+    @classmethod
+    def from_config(cls, config: LaskConfig) -> "SessionStore":
+        """
+        Open the store configured by ``session_db`` in the [default] section.
+
+        Args:
+            config (LaskConfig): Configuration object
+
+        Returns:
+            SessionStore: The session store
+        """
+        path = Path(config.session_db).expanduser() if config.session_db else None
+        return cls(path)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._db.close()
+
+    def create(self, provider: Optional[str] = None) -> int:
+        """
+        Start a new session.
+
+        Args:
+            provider (Optional[str]): The provider the session uses
+
+        Returns:
+            int: The new session's ID
+        """
+        now = time.time()
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO sessions (provider, created, updated) VALUES (?, ?, ?)",
+                (provider, now, now),
+            )
+        return int(cursor.lastrowid)
+
+    def append(self, session_id: int, message: Dict[str, str]) -> None:
+        """
+        Append a message to a session.
+
+        Args:
+            session_id (int): The session ID
+            message (Dict[str, str]): The message, with role, content and
+                                      optionally the provider that wrote it
+        """
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT INTO messages (session_id, role, content, provider, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    message["role"],
+                    message["content"],
+                    message.get("provider"),
+                    now,
+                ),
+            )
+            # The first prompt becomes the session's title
+            self._db.execute(
+                "UPDATE sessions SET updated = ?, title = coalesce(title, ?) WHERE id = ?",
+                (
+                    now,
+                    " ".join(message["content"].split())[:TITLE_LENGTH]
+                    if message["role"] == "user"
+                    else None,
+                    session_id,
+                ),
+            )
+
+    def get(self, session_id: int) -> Optional[SessionInfo]:
+        """
+        Look up a session.
+
+        Args:
+            session_id (int): The session ID
+
+        Returns:
+            Optional[SessionInfo]: The session, or None if there is none with that ID
+        """
+        row = self._db.execute(
+            "SELECT id, provider, title, created, updated FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        return SessionInfo(*row) if row else None
+
+    def latest(self) -> Optional[SessionInfo]:
+        """
+        Get the most recently updated session.
+
+        Returns:
+            Optional[SessionInfo]: The session, or None if nothing is stored yet
+        """
+        row = self._db.execute(
+            "SELECT id, provider, title, created, updated FROM sessions "
+            "ORDER BY updated DESC LIMIT 1"
+        ).fetchone()
+        return SessionInfo(*row) if row else None
+
+    def iter_messages(
+        self, session_id: int, newest_first: bool = False
+    ) -> Iterator[Dict[str, str]]:
+        """
+        Yield a session's messages, reading them from the database as needed.
+
+        Args:
+            session_id (int): The session ID
+            newest_first (bool): Yield the latest message first
+
+        Yields:
+            Dict[str, str]: Messages with role and content, and the provider
+                            on answers
+        """
+        order = "DESC" if newest_first else "ASC"
+        cursor = self._db.execute(
+            "SELECT role, content, provider FROM messages WHERE session_id = ? "
+            f"ORDER BY id {order}",
+            (session_id,),
+        )
+        for role, content, provider in cursor:
+            message = {"role": role, "content": content}
+            if provider:
+                message["provider"] = provider
+            yield message
+
+    def load(self, session_id: int, budget: int) -> List[Dict[str, str]]:
+        """
+        Load the most recent turns of a session that fit a token budget.
+
+        Args:
+            session_id (int): The session ID
+            budget (int): Estimated tokens the loaded messages may take up
+
+        Returns:
+            List[Dict[str, str]]: The messages, oldest first, starting with a prompt
+        """
+        # Imported here so searching doesn't load the context module
+        from src.context import estimate_tokens
+
+        messages: List[Dict[str, str]] = []
+        used = 0
+        for message in self.iter_messages(session_id, newest_first=True):
+            used += estimate_tokens(message)
+            if used > budget and messages:
+                break
+            messages.append(message)
+        messages.reverse()
+        # Start with a whole turn
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0)
+        return messages
+
+    def search(self, term: str, limit: int = 20) -> List[SearchResult]:
+        """
+        Find the sessions with messages matching a search term.
+
+        Args:
+            term (str): Words that must all appear in a message
+            limit (int): Maximum number of sessions returned
+
+        Returns:
+            List[SearchResult]: Matching sessions, most recent match first
+        """
+        words = term.split()
+        if not words:
+            return []
+
+        # Newest first rather than by relevance: ranking has to score every
+        # match, while this stops reading once `limit` sessions are found
+        if self.fts:
+            # Quote every word so FTS5 query syntax in the term is matched literally
+            query = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+            rows = self._db.execute(
+                "SELECT s.id, s.provider, s.title, s.created, s.updated, "
+                "snippet(messages_fts, 0, '[', ']', '...', 12) "
+                "FROM messages_fts "
+                "JOIN messages m ON m.id = messages_fts.rowid "
+                "JOIN sessions s ON s.id = m.session_id "
+                "WHERE messages_fts MATCH ? ORDER BY messages_fts.rowid DESC",
+                (query,),
+            )
+        else:
+            conditions = " AND ".join("m.content LIKE ?" for _ in words)
+            rows = self._db.execute(
+                "SELECT s.id, s.provider, s.title, s.created, s.updated, m.content "
+                "FROM messages m JOIN sessions s ON s.id = m.session_id "
+                f"WHERE {conditions} ORDER BY m.id DESC",
+                [f"%{word}%" for word in words],
+            )
+
+        results: List[SearchResult] = []
+        seen = set()
+        for row in rows:
+            if row[0] in seen:
+                continue
+            seen.add(row[0])
+            snippet = " ".join(row[5].split())[:SNIPPET_LENGTH]
+            results.append(SearchResult(SessionInfo(*row[:5]), snippet))
+            if len(results) >= limit:
+                break
+        return results
+
+
+class Session:
+    """
+    A REPL session being recorded.
+
+    The session is only created in the store when its first message is
+    saved, so REPLs closed without a prompt don't leave empty sessions.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        provider: Optional[str] = None,
+        session_id: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            store (SessionStore): The store to append to
+            provider (Optional[str]): The provider the session uses
+            session_id (Optional[int]): An existing session to continue
+        """
+        self.store: Optional[SessionStore] = store
+        self.provider = provider
+        self.id = session_id
+
+    def save(self, message: Dict[str, str]) -> None:
+        """
+        Append a message to the session.
+
+        Saving stops with a warning if the database can't be written, so a
+        full disk or a locked database doesn't interrupt the conversation.
+
+        Args:
+            message (Dict[str, str]): The message
+        """
+        if self.store is None:
+            return
+        try:
+            if self.id is None:
+                self.id = self.store.create(self.provider)
+            self.store.append(self.id, message)
+        except sqlite3.Error as e:
+            print(
+                f"Warning: Could not save the session, not saving it any further: {e}"
+            )
+            self.store = None
@@ -0,0 +1,248 @@
+"""
+OpenTelemetry trace export for lask calls.
+
+SpanExporter is a hook (see src.hooks) that turns every provider call into
+one client span and appends it to a local file in the OTLP/JSON format, one
+export request per line, as written by the OpenTelemetry Collector's file
+exporter and read by its ``otlpjsonfile`` receiver. Spans follow the
+GenAI semantic conventions (``gen_ai.*`` attributes) and carry the
+lifecycle events as span events.
+
+When lask runs inside a traced pipeline, the W3C ``TRACEPARENT`` environment
+variable makes its spans children of the caller's span.
+
+    lask --trace-file ~/lask-spans.jsonl "question"
+    LASK_TRACE_FILE=spans.jsonl TRACEPARENT=00-<trace-id>-<span-id>-01 lask ...
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import hooks
+from src.locking import append_line
+
+TRACE_FILE_ENV = "LASK_TRACE_FILE"
+TRACEPARENT_ENV = "TRACEPARENT"
+
+# OTLP span kind and status codes
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Lifecycle events recorded as span events; "chunk" would make spans huge
+SPAN_EVENTS = {"connection_acquired", "headers_received", "first_chunk"}
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_installed: Dict[Path, "SpanExporter"] = {}
+_installed_lock = threading.Lock()
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Parse a W3C traceparent header value.
+
+    Args:
+        value (Optional[str]): e.g. "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+    Returns:
+        Optional[Tuple[str, str]]: The trace ID and parent span ID, or None if
+                                   the value is missing or invalid
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+        return None
+    return match.group(1), match.group(2)
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    """Encode an attribute as an OTLP KeyValue."""
+    if isinstance(value, bool):
+        encoded: Dict[str, Any] = {"boolValue": value}
+    elif isinstance(value, int):
+        # 64-bit integers are strings in OTLP/JSON
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Encode the attributes that have a value."""
+    return [
+        _attribute(key, value) for key, value in values.items() if value is not None
+    ]
+
+
+class SpanExporter:
+    """Writes a span per provider call to an OTLP/JSON lines file."""
+
+    def __init__(self, path: Path, traceparent: Optional[str] = None) -> None:
+        """
+        Args:
+            path (Path): The file spans are appended to
+            traceparent (Optional[str]): W3C traceparent of the calling span,
+                                         defaults to $TRACEPARENT
+        """
+        self.path = path
+        parent = parse_traceparent(
+            traceparent if traceparent is not None else os.environ.get(TRACEPARENT_ENV)
+        )
+        # All calls of one lask process belong to one trace
+        self.trace_id, self.parent_span_id = parent or (os.urandom(16).hex(), None)
+        self._spans: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: hooks.CallEvent) -> None:
+        """Record an event, writing the span when its call has ended."""
+        with self._lock:
+            if event.name == "request_built" or event.call_id not in self._spans:
+                self._spans[event.call_id] = self._start_span(event)
+            span = self._spans[event.call_id]
+
+            if event.name in SPAN_EVENTS:
+                span["events"].append(
+                    {
+                        "timeUnixNano": str(event.time_ns),
+                        "name": event.name,
+                        "attributes": _attributes(
+                            dict(event.attributes, size=event.size)
+                        ),
+                    }
+                )
+            elif event.name == "chunk":
+                span["_chunks"] += 1
+                span["_chars"] += event.size or 0
+            elif event.name in ("complete", "error", "cancelled"):
+                del self._spans[event.call_id]
+                self._end_span(span, event)
+            else:
+                return
+        if event.name in ("complete", "error", "cancelled"):
+            self._write(span)
+
+    def _start_span(self, event: hooks.CallEvent) -> Dict[str, Any]:
+        """Create the span of a call from its first event."""
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": os.urandom(8).hex(),
+            "name": f"chat {event.model}" if event.model else "chat",
+            "kind": SPAN_KIND_CLIENT,
+            "startTimeUnixNano": str(event.time_ns),
+            "attributes": _attributes(
+                {
+                    "gen_ai.operation.name": "chat",
+                    "gen_ai.system": event.provider,
+                    "gen_ai.request.model": event.model,
+                    "lask.call_id": event.call_id,
+                }
+            ),
+            "events": [],
+            "_chunks": 0,
+            "_chars": 0,
+        }
+        if event.name == "request_built":
+            span["attributes"] += _attributes(
+                {
+                    "lask.request.chars": event.size,
+                    "lask.request.messages": event.attributes.get("messages"),
+                }
+            )
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+    def _end_span(self, span: Dict[str, Any], event: hooks.CallEvent) -> None:
+        """Close a span with the call's final event."""
+        span["endTimeUnixNano"] = str(event.time_ns)
+        span["attributes"] += _attributes(
+            {
+                "lask.response.chunks": span.pop("_chunks"),
+                "lask.response.chars": span.pop("_chars"),
+                "lask.response.bytes": event.size,
+                "gen_ai.usage.input_tokens": event.attributes.get("input_tokens"),
+                "gen_ai.usage.output_tokens": event.attributes.get("output_tokens"),
+            }
+        )
+        if event.name == "complete":
+            span["status"] = {"code": STATUS_OK}
+            return
+        if event.name == "cancelled":
+            span["attributes"].append(_attribute("lask.cancelled", True))
+            span["status"] = {"code": STATUS_OK}
+            return
+        span["attributes"] += _attributes(
+            {
+                "error.type": event.attributes.get("error_type"),
+                "http.response.status_code": event.attributes.get("status"),
+            }
+        )
+        span["events"].append(
+            {
+                "timeUnixNano": str(event.time_ns),
+                "name": "exception",
+                "attributes": _attributes(
+                    {
+                        "exception.type": event.attributes.get("error_type"),
+                        "exception.message": event.attributes.get("error"),
+                    }
+                ),
+            }
+        )
+        span["status"] = {
+            "code": STATUS_ERROR,
+            "message": event.attributes.get("error"),
+        }
+
+    def _write(self, span: Dict[str, Any]) -> None:
+        """Append a span to the file as one OTLP/JSON export request."""
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _attributes(
+                            {"service.name": "lask", "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeSpans": [{"scope": {"name": "lask"}, "spans": [span]}],
+                }
+            ]
+        }
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        try:
+            append_line(self.path, line)
+        except OSError as e:
+            print(
+                f"Warning: Could not write trace to {self.path}: {e}", file=sys.stderr
+            )
+
+
+def install(path: Path) -> SpanExporter:
+    """
+    Export spans of all later provider calls to a file.
+
+    Installing the same file twice keeps a single exporter.
+
+    Args:
+        path (Path): The file spans are appended to
+
+    Returns:
+        SpanExporter: The exporter, registered as a hook
+    """
+    path = path.expanduser()
+    with _installed_lock:
+        exporter = _installed.get(path)
+        if exporter is None:
+            exporter = SpanExporter(path)
+            hooks.add_hook(exporter)
+            _installed[path] = exporter
+    return exporter
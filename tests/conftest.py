@@ -1,10 +1,17 @@
 """
-Configure pytest for the lask test suite.
+Shared pytest fixtures.
 """
 
-import sys
-from pathlib import Path
+import pytest
 
-# Add the project root to the Python path so we can import from src
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep config snapshots and other cache files out of the real cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Keep saved sessions out of the real data directory."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
@@ -0,0 +1,95 @@
+"""
+Tests for the asyncio provider API.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import LaskConfig, ProviderConfig
+from src.providers import acall_provider_api, async_transport
+
+httpx = pytest.importorskip("httpx")
+
+
+def run_with_mock_server(handler, coroutine_factory):
+    """Run a coroutine with the shared client answering through handler."""
+
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async_transport._clients[asyncio.get_running_loop()] = client
+        try:
+            return await coroutine_factory()
+        finally:
+            await async_transport.aclose_client()
+
+    return asyncio.run(main())
+
+
+def make_config(streaming: bool) -> LaskConfig:
+    config = LaskConfig()
+    config.providers["openai"] = ProviderConfig(api_key="test", streaming=streaming)
+    return config
+
+
+async def collect(config: LaskConfig, prompt: str) -> str:
+    messages = [{"role": "user", "content": prompt}]
+    return "".join(
+        [
+            chunk
+            async for chunk in acall_provider_api("openai", config, prompt, messages)
+        ]
+    )
+
+
+def test_openai_stream():
+    """Test that streamed deltas are yielded in order."""
+    body = b"".join(
+        b"data: "
+        + json.dumps({"choices": [{"delta": {"content": text}}]}).encode()
+        + b"\n\n"
+        for text in ("Hi", " there")
+    )
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body + b"data: [DONE]\n\n")
+
+    config = make_config(streaming=True)
+    assert run_with_mock_server(handler, lambda: collect(config, "Hello")) == "Hi there"
+
+
+def test_openai_non_streaming():
+    """Test that a non-streaming response is yielded as one chunk."""
+
+    def handler(request):
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": " Hi there "}}]}
+        )
+
+    config = make_config(streaming=False)
+    assert run_with_mock_server(handler, lambda: collect(config, "Hello")) == "Hi there"
+
+
+def test_error_status_raises():
+    """Test that an error status surfaces as an exception."""
+
+    def handler(request):
+        return httpx.Response(401, text="bad key")
+
+    config = make_config(streaming=True)
+    with pytest.raises(Exception, match="401 bad key"):
+        run_with_mock_server(handler, lambda: collect(config, "Hello"))
+
+
+def test_missing_key_raises_in_event_loop(monkeypatch):
+    """Test that configuration errors raise instead of exiting the host's event loop."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        asyncio.run(collect(LaskConfig(), "Hello"))
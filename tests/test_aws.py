@@ -0,0 +1,145 @@
+"""
+Tests for the AWS Bedrock provider's client registry and cancellation.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import ProviderConfig
+from src.providers import aws, transport
+
+
+class FakeConfig:
+    """Stand-in for botocore.config.Config that records its options."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def merge(self, other):
+        return FakeConfig(**{**self.options, **other.options})
+
+
+@pytest.fixture
+def fake_boto3(monkeypatch):
+    """Install fake boto3 and botocore modules and record created clients."""
+    created = []
+
+    def session(profile_name=None, region_name=None):
+        def client(**kwargs):
+            created.append(dict(kwargs, profile=profile_name, region=region_name))
+            return SimpleNamespace(**created[-1])
+
+        return SimpleNamespace(client=client)
+
+    boto3 = ModuleType("boto3")
+    boto3.Session = session
+    botocore = ModuleType("botocore")
+    botocore_config = ModuleType("botocore.config")
+    botocore_config.Config = FakeConfig
+    monkeypatch.setitem(sys.modules, "boto3", boto3)
+    monkeypatch.setitem(sys.modules, "botocore", botocore)
+    monkeypatch.setitem(sys.modules, "botocore.config", botocore_config)
+    monkeypatch.setattr(aws, "_clients", {})
+    return created
+
+
+def test_client_is_shared_per_region_profile_and_endpoint(fake_boto3):
+    """Test that clients are created once per key, also under concurrency."""
+    aws_config = ProviderConfig(region="us-west-2")
+    clients = []
+    threads = [
+        threading.Thread(target=lambda: clients.append(aws.get_client(aws_config)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fake_boto3) == 1
+    assert all(client is clients[0] for client in clients)
+
+    aws.get_client(ProviderConfig(region="us-west-2", profile="work"))
+    aws.get_client(ProviderConfig(region="eu-central-1"))
+    assert len(fake_boto3) == 3
+
+
+def test_client_uses_tuned_botocore_config(fake_boto3):
+    """Test that pool size, keep-alive, retries and timeouts are applied."""
+    aws_config = ProviderConfig(pool_size=4, max_retries=3, timeout=90.0)
+    client = aws.get_client(aws_config)
+
+    assert client.region == aws.DEFAULT_REGION
+    options = client.config.options
+    assert options["max_pool_connections"] == 4
+    assert options["tcp_keepalive"] is True
+    assert options["retries"] == {"mode": "adaptive", "total_max_attempts": 1}
+    assert options["read_timeout"] == 90.0
+
+
+class FakeRaw:
+    """Stand-in for the urllib3 response behind a botocore EventStream."""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEventStream:
+    """Stand-in for a botocore EventStream that stops when its body is closed."""
+
+    def __init__(self, texts):
+        self._raw_stream = FakeRaw()
+        self.texts = texts
+
+    def __iter__(self):
+        for text in self.texts:
+            if self._raw_stream.closed:
+                raise ConnectionError("stream closed")
+            yield {"contentBlockDelta": {"delta": {"text": text}}}
+
+
+class FakeStreamingClient:
+    """Bedrock client whose converse_stream returns a FakeEventStream."""
+
+    def __init__(self):
+        self.calls = 0
+        self.stream = FakeEventStream(["a", "b", "c"])
+
+    def converse_stream(self, **kwargs):
+        self.calls += 1
+        return {"stream": self.stream}
+
+
+def test_cancel_closes_bedrock_stream():
+    """Test that cancelling the scope closes a Bedrock stream's HTTP body."""
+    client = FakeStreamingClient()
+    scope = transport.CancelScope()
+    with transport.cancel_scope(scope):
+        chunks = aws.stream_converse_response(client, "model", {})
+        assert next(chunks) == "a"
+        scope.cancel()
+        assert client.stream._raw_stream.closed
+        with pytest.raises(ConnectionError):
+            next(chunks)
+    assert client.calls == 1
+
+
+def test_cancelled_scope_skips_bedrock_call():
+    """Test that no Bedrock stream is opened once the scope is cancelled."""
+    client = FakeStreamingClient()
+    scope = transport.CancelScope()
+    scope.cancel()
+    with transport.cancel_scope(scope):
+        with pytest.raises(transport.RequestCancelled):
+            list(aws.stream_converse_response(client, "model", {}))
+    assert client.calls == 0
@@ -0,0 +1,136 @@
+"""
+Tests for batch mode over JSONL prompt files.
+"""
+
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.batch import read_rows, run_batch
+from src.config import LaskConfig
+
+ROWS = [
+    {"id": "a", "prompt": "slow"},
+    {"prompt": "fail"},
+    "plain",
+    {"id": "d", "messages": [{"role": "user", "content": "history"}]},
+]
+
+
+def write_rows(tmp_path: Path) -> Path:
+    path = tmp_path / "prompts.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in ROWS) + "\n")
+    return path
+
+
+def fake_provider(fail: bool):
+    """Build a provider module that echoes the last message."""
+    calls = []
+
+    def call_api(config, prompt, conversation_history=None):
+        content = conversation_history[-1]["content"]
+        calls.append(content)
+        if content == "slow":
+            time.sleep(0.05)
+        if content == "fail" and fail:
+            raise Exception("boom")
+        return iter(["re: ", content])
+
+    return SimpleNamespace(call_api=call_api), calls
+
+
+def test_results_in_input_order_and_failures_not_checkpointed(tmp_path):
+    """Test ordered output and that only successful rows are checkpointed."""
+    input_path = write_rows(tmp_path)
+    checkpoint = tmp_path / "prompts.checkpoint"
+    module, _ = fake_provider(fail=True)
+
+    output = io.StringIO()
+    with patch("src.providers.get_provider_module", return_value=module):
+        assert run_batch(LaskConfig(), input_path, output, checkpoint, 4) == (3, 1)
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["id"] for r in records] == ["a", "2", "3", "d"]
+    assert records[0]["response"] == "re: slow"
+    assert records[1]["error"] == "boom"
+    assert records[3]["response"] == "re: history"
+    assert set(checkpoint.read_text().split()) == {"a", "3", "d"}
+
+
+def test_resume_only_runs_remaining_rows(tmp_path):
+    """Test that a rerun skips rows recorded in the checkpoint."""
+    input_path = write_rows(tmp_path)
+    checkpoint = tmp_path / "prompts.checkpoint"
+    checkpoint.write_text("a\n3\nd\n")
+    module, calls = fake_provider(fail=False)
+
+    output = io.StringIO()
+    with patch("src.providers.get_provider_module", return_value=module):
+        assert run_batch(LaskConfig(), input_path, output, checkpoint, 2, False) == (
+            1,
+            0,
+        )
+
+    assert calls == ["fail"]
+    assert json.loads(output.getvalue()) == {
+        "id": "2",
+        "provider": "openai",
+        "response": "re: fail",
+    }
+    assert set(checkpoint.read_text().split()) == {"a", "2", "3", "d"}
+
+
+def test_missing_key_stops_the_run(tmp_path, monkeypatch):
+    """Test that a provider's configuration is checked once, before any row is sent."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    input_path = write_rows(tmp_path)
+    checkpoint = tmp_path / "prompts.checkpoint"
+
+    output = io.StringIO()
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        run_batch(LaskConfig(), input_path, output, checkpoint, 4)
+    assert output.getvalue() == ""
+    assert checkpoint.read_text() == ""
+
+
+def test_provider_output_goes_to_stderr(tmp_path, capsys):
+    """Test that text printed by providers doesn't end up among the results."""
+    input_path = write_rows(tmp_path)
+    module, _ = fake_provider(fail=False)
+    call_api = module.call_api
+
+    def chatty_call_api(config, prompt, conversation_history=None):
+        print("Warning: chatty provider")
+        return call_api(config, prompt, conversation_history)
+
+    module.call_api = chatty_call_api
+    with patch("src.providers.get_provider_module", return_value=module):
+        run_batch(LaskConfig(), input_path, sys.stdout, tmp_path / "checkpoint", 2)
+
+    captured = capsys.readouterr()
+    assert [json.loads(line)["id"] for line in captured.out.splitlines()] == [
+        "a",
+        "2",
+        "3",
+        "d",
+    ]
+    assert captured.err.count("Warning: chatty provider") == 4
+
+
+@pytest.mark.parametrize("line", ["42", "null", '["a", "b"]'])
+def test_rows_must_be_objects_or_strings(tmp_path, line):
+    """Test that other JSON values are reported with their line number."""
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text(json.dumps("first") + "\n" + line + "\n")
+
+    with pytest.raises(ValueError, match="prompts.jsonl:2: expected an object"):
+        list(read_rows(input_path))
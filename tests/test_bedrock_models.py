@@ -0,0 +1,227 @@
+"""
+Tests for the Bedrock model families, their stream decoders and the
+Converse API.
+"""
+
+import sys
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_servers import FakeBedrockClient, StreamProfile, response_texts
+from src import metrics
+from src.config import LaskConfig, ProviderConfig
+from src.providers import aws, bedrock_models, call_provider_api
+
+PROFILE = StreamProfile(tokens=20, chunk_tokens=3)
+
+MODELS = [
+    "anthropic.claude-3-haiku-20240307-v1:0",
+    "amazon.titan-text-express-v1",
+    "meta.llama3-1-70b-instruct-v1:0",
+    "mistral.mistral-7b-instruct-v0:2",
+    "cohere.command-text-v14",
+]
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    """Replace boto3 and the Bedrock client with the stand-in client."""
+    client = FakeBedrockClient(PROFILE)
+    monkeypatch.setitem(sys.modules, "boto3", ModuleType("boto3"))
+    monkeypatch.setattr(aws, "get_client", lambda aws_config: client)
+    return client
+
+
+def make_config(model_id: str, **settings) -> LaskConfig:
+    config = LaskConfig(system_prompt="Be brief.")
+    config.providers["aws"] = ProviderConfig(model_id=model_id, **settings)
+    return config
+
+
+def test_model_family_lookup():
+    """Test that model IDs, inference profiles and ARNs find their family."""
+    families = bedrock_models.MODEL_FAMILIES
+    assert bedrock_models.model_family(MODELS[0]) is families["anthropic."]
+    assert (
+        bedrock_models.model_family("us.meta.llama3-2-90b-instruct-v1:0")
+        is families["meta.llama"]
+    )
+    assert (
+        bedrock_models.model_family(
+            "arn:aws:bedrock:us-east-1:123456789012:inference-profile/"
+            "eu.anthropic.claude-3-5-sonnet-20240620-v1:0"
+        )
+        is families["anthropic."]
+    )
+    # The longest prefix wins
+    assert (
+        bedrock_models.model_family("cohere.command-r-plus-v1:0")
+        is families["cohere.command-r"]
+    )
+    assert (
+        bedrock_models.model_family("ai21.j2-ultra-v1") is bedrock_models.DEFAULT_FAMILY
+    )
+
+
+@pytest.mark.parametrize("model_id", MODELS)
+def test_every_family_streams(bedrock, model_id):
+    """Test that streaming is the default and each stream format is decoded."""
+    result = aws.call_api(
+        make_config(model_id), "hi", [{"role": "user", "content": "hi"}]
+    )
+    assert not isinstance(result, str)
+    assert list(result) == response_texts(PROFILE)
+
+
+@pytest.mark.parametrize("model_id", MODELS)
+def test_every_family_without_streaming(bedrock, model_id):
+    """Test that whole responses are decoded per family."""
+    config = make_config(model_id, streaming=False)
+    result = aws.call_api(config, "hi", [{"role": "user", "content": "hi"}])
+    assert result == "".join(response_texts(PROFILE))
+
+
+def test_request_bodies(bedrock):
+    """Test that each family gets its own parameter names."""
+    history = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "hi"},
+    ]
+    for model_id in MODELS:
+        list(aws.call_api(make_config(model_id, max_tokens=100), "hi", history))
+    anthropic, titan, llama, mistral, cohere = bedrock.bodies
+
+    assert anthropic["system"] and anthropic["stream"] is True
+    assert titan["textGenerationConfig"] == {"maxTokenCount": 100}
+    assert titan["inputText"] == "System: Be brief.\n\nUser: hi"
+    assert llama["max_gen_len"] == 100 and "stream" not in llama
+    assert llama["prompt"].endswith("<|start_header_id|>assistant<|end_header_id|>\n\n")
+    assert mistral["prompt"] == "<s>[INST] Be brief.\n\nhi [/INST]"
+    assert cohere["stream"] is True and cohere["max_tokens"] == 100
+
+
+def test_cohere_chat_body():
+    """Test that Command R gets the chat history and preamble separately."""
+    family = bedrock_models.model_family("cohere.command-r-v1:0")
+    body = family.build_body(
+        [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "hello"},
+            {"role": "user", "content": "again"},
+        ],
+        ProviderConfig(),
+        "cohere.command-r-v1:0",
+    )
+    assert body["preamble"] == "Be brief."
+    assert body["message"] == "again"
+    assert body["chat_history"] == [
+        {"role": "USER", "message": "hi"},
+        {"role": "CHATBOT", "message": "hello"},
+    ]
+    assert family.stream_text({"event_type": "text-generation", "text": "a"}) == "a"
+    assert family.stream_text({"event_type": "stream-end", "text": "all"}) is None
+
+
+def test_unknown_family_uses_converse(bedrock):
+    """Test that models without a known InvokeModel format stream through Converse."""
+    result = aws.call_api(make_config("ai21.jamba-1-5-large-v1:0"), "hi", [])
+    assert list(result) == response_texts(PROFILE)
+    assert bedrock.bodies == [{"messages": []}]
+
+
+def test_unknown_family_with_invoke_model(bedrock, monkeypatch):
+    """Test that InvokeModel can still be chosen for unknown families."""
+    calls = []
+    monkeypatch.setattr(
+        aws,
+        "non_streaming_aws_response",
+        lambda *args: calls.append(args) or "done",
+    )
+    config = make_config("ai21.j2-ultra-v1", bedrock_api="invoke_model")
+    assert aws.call_api(config, "hi", []) == "done"
+    assert calls[0][2]["prompt"] == ""
+
+
+def test_converse_request():
+    """Test that the whole conversation is sent with alternating roles."""
+    messages = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "summary of earlier turns"},
+        {"role": "user", "content": "again"},
+    ]
+    request = aws.build_converse_request(
+        messages, ProviderConfig(max_tokens=100), "meta.llama3-1-8b-instruct-v1:0"
+    )
+    assert request == {
+        "system": [{"text": "Be brief."}],
+        "messages": [
+            {"role": "user", "content": [{"text": "hi"}]},
+            {"role": "assistant", "content": [{"text": "hello"}]},
+            {
+                "role": "user",
+                "content": [{"text": "summary of earlier turns"}, {"text": "again"}],
+            },
+        ],
+        "inferenceConfig": {"maxTokens": 100},
+    }
+
+
+def test_converse_cache_points():
+    """Test that Anthropic models get cache points at the cache breakpoints."""
+    request = aws.build_converse_request(
+        [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "hello"},
+            {"role": "user", "content": "again"},
+        ],
+        ProviderConfig(),
+        "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+    )
+    assert request["system"] == [{"text": "Be brief."}, aws.CACHE_POINT]
+    assert request["messages"][-1]["content"] == [{"text": "again"}, aws.CACHE_POINT]
+    assert "inferenceConfig" not in request
+
+
+@pytest.mark.parametrize(
+    "model_id, settings",
+    [
+        (MODELS[0], {"bedrock_api": "converse"}),
+        (MODELS[0], {"bedrock_api": "converse", "streaming": False}),
+        # InvokeModel streams report usage in their last chunk
+        (MODELS[2], {}),
+    ],
+)
+def test_usage_in_metrics(bedrock, model_id, settings):
+    """Test that Bedrock's token usage and latency reach the call's metrics."""
+    config = make_config(model_id, prompt_cache=False, **settings)
+    config.provider = "aws"
+    config.stats = True
+    metrics.keep_finished()
+    metrics.drain()
+    try:
+        result = call_provider_api("aws", config, "hi", [])
+        assert "".join(result) == "".join(response_texts(PROFILE))
+        (request_metrics,) = metrics.drain()
+    finally:
+        metrics.keep_finished(False)
+
+    assert request_metrics.input_tokens == 12
+    assert request_metrics.output_tokens == request_metrics.tokens == PROFILE.tokens
+    assert request_metrics.provider_latency == 0.25
+    assert "12 tokens in, 20 out" in request_metrics.format()
+    assert request_metrics.as_dict()["provider_latency_ms"] == 250.0
+
+
+def test_invalid_bedrock_api(bedrock):
+    """Test that unknown bedrock_api values are rejected."""
+    with pytest.raises(ValueError, match="Unknown bedrock_api 'chat'"):
+        aws.call_api(make_config(MODELS[0], bedrock_api="chat"), "hi", [])
@@ -0,0 +1,116 @@
+"""
+Tests for the offline benchmark suite and its stand-in provider servers.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks import bench_suite
+from benchmarks.mock_servers import (
+    FakeBedrockClient,
+    MockProviderServer,
+    StreamProfile,
+    response_texts,
+)
+from src import metrics
+from src.config import LaskConfig, ProviderConfig
+from src.providers import aws, call_provider_api, transport
+
+PROFILE = StreamProfile(tokens=40, chunk_tokens=3)
+HISTORY = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def server():
+    """Serve the emulated provider APIs on localhost."""
+    with MockProviderServer(PROFILE) as httpd:
+        transport.close_sessions()
+        metrics.keep_finished()
+        metrics.drain()
+        yield httpd
+        metrics.keep_finished(False)
+        transport.close_sessions()
+
+
+def make_config(server: MockProviderServer) -> LaskConfig:
+    config = LaskConfig(stats=True)
+    for provider in ("openai", "azure", "anthropic"):
+        config.providers[provider] = ProviderConfig(
+            api_key="test", base_url=server.base_url(provider)
+        )
+    config.providers["azure"].deployment_id = "mock"
+    return config
+
+
+@pytest.mark.parametrize("provider", ["openai", "azure", "anthropic"])
+def test_mock_streams_are_decoded(server, provider):
+    """Test that lask reads the emulated streams and reuses the connection."""
+    config = make_config(server)
+    expected = "".join(response_texts(PROFILE))
+    for _ in range(2):
+        chunks = list(call_provider_api(provider, config, "", list(HISTORY)))
+        assert "".join(chunks) == expected
+        assert len(chunks) == len(response_texts(PROFILE))
+
+    first, second = metrics.drain()
+    assert first.connections == 1
+    # The chunked body is read to its end, so the connection goes back to the pool
+    assert second.connections == 0
+
+
+def test_mock_non_streaming_response(server):
+    """Test that non-streaming requests get the whole text at once."""
+    config = make_config(server)
+    config.providers["openai"].streaming = False
+    assert call_provider_api("openai", config, "", list(HISTORY)) == (
+        "".join(response_texts(PROFILE)).strip()
+    )
+
+
+def test_fake_bedrock_stream():
+    """Test that the stand-in Bedrock client streams Anthropic deltas."""
+    chunks = aws.stream_aws_response(
+        FakeBedrockClient(PROFILE), "anthropic.claude-mock", {}, ProviderConfig()
+    )
+    assert list(chunks) == response_texts(PROFILE)
+
+
+def test_run_suite():
+    """Test that the suite reports every metric."""
+    results = bench_suite.run_suite(StreamProfile(tokens=20), rounds=1)
+    for provider in bench_suite.PROVIDERS:
+        assert results[f"overhead.{provider}"].value > 0
+        assert f"ttft.{provider}" in results
+    assert results["sse.anthropic"].higher_is_better
+    assert results["render.tty"].unit == "µs/chunk"
+
+
+def test_compare_flags_regressions():
+    """Test that only metrics worse than the tolerance are flagged."""
+    results = {
+        "sse.openai": bench_suite.Metric(70.0, "MB/s", True),
+        "render.pipe": bench_suite.Metric(1.2, "µs/chunk"),
+        "ttft.openai": bench_suite.Metric(2.0, "ms"),
+        "overhead.aws": bench_suite.Metric(9.0, "µs/token"),
+    }
+    baseline = {"sse.openai": 100.0, "render.pipe": 1.0, "ttft.openai": 4.0}
+    regressions = bench_suite.compare(results, baseline, tolerance=0.25)
+    assert list(regressions) == ["sse.openai"]
+    assert regressions["sse.openai"] == pytest.approx(-0.3)
+
+
+def test_baseline_is_tied_to_its_profile(tmp_path, capsys):
+    """Test that baselines recorded with another profile aren't compared."""
+    path = tmp_path / "baseline.json"
+    results = {"render.pipe": bench_suite.Metric(1.0, "µs/chunk")}
+    bench_suite.save_baseline(path, PROFILE, results)
+
+    assert bench_suite.load_baseline(path, PROFILE) == {"render.pipe": 1.0}
+    assert bench_suite.load_baseline(path, PROFILE._replace(latency=1)) is None
+    assert "different profile" in capsys.readouterr().err
+    assert bench_suite.load_baseline(tmp_path / "missing.json", PROFILE) is None
@@ -0,0 +1,130 @@
+"""
+Tests for the on-disk response cache.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import cache
+from src.cache import ResponseCache, make_key
+from src.config import LaskConfig, ProviderConfig
+from src.providers import call_provider_api
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def test_key_depends_on_request_parameters():
+    """Test that every keyed parameter changes the key."""
+    base = make_key("openai", "gpt-4", 0.7, 100, MESSAGES)
+
+    assert base == make_key("openai", "gpt-4", 0.7, 100, list(MESSAGES))
+    assert base != make_key("anthropic", "gpt-4", 0.7, 100, MESSAGES)
+    assert base != make_key("openai", "gpt-4o", 0.7, 100, MESSAGES)
+    assert base != make_key("openai", "gpt-4", 0.5, 100, MESSAGES)
+    assert base != make_key("openai", "gpt-4", 0.7, 200, MESSAGES)
+    assert base != make_key(
+        "openai", "gpt-4", 0.7, 100, [{"role": "user", "content": "Hi"}]
+    )
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    """Test that stored chunks are returned unchanged."""
+    response_cache = ResponseCache(tmp_path)
+    response_cache.put("ab" * 32, ["Hel", "lo ", "✓"])
+
+    assert response_cache.get("ab" * 32) == ["Hel", "lo ", "✓"]
+    assert response_cache.get("cd" * 32) is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    """Test that entries older than the TTL are not returned."""
+    response_cache = ResponseCache(tmp_path, ttl=60)
+    response_cache.put("ab" * 32, ["old"])
+
+    with patch("time.time", return_value=time.time() + 120):
+        assert response_cache.get("ab" * 32) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Test that eviction keeps the cache under its size budget, oldest access first."""
+    response_cache = ResponseCache(tmp_path)
+    keys = [str(i) * 64 for i in range(3)]
+    for i, key in enumerate(keys):
+        response_cache.put(key, [os.urandom(2000).hex()])
+        path = response_cache._path(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+    # Touch the oldest entry so the second one becomes least recently used
+    assert response_cache.get(keys[0]) is not None
+
+    entry_size = response_cache._path(keys[0]).stat().st_size
+    response_cache.max_size = entry_size * 2 + 100
+    response_cache.evict()
+
+    assert response_cache.get(keys[0]) is not None
+    assert response_cache.get(keys[1]) is None
+    assert response_cache.get(keys[2]) is not None
+
+
+def test_put_scans_only_when_estimate_exceeds_budget(tmp_path, monkeypatch):
+    """Test that writes keep a running size estimate instead of scanning every entry."""
+    response_cache = ResponseCache(tmp_path)
+    scans = []
+    evict = response_cache._evict
+    monkeypatch.setattr(response_cache, "_evict", lambda: scans.append(1) or evict())
+
+    # The first write finds no estimate and scans to create it
+    response_cache.put("0" * 64, ["a" * 100])
+    response_cache.put("1" * 64, ["b" * 100])
+    response_cache.put("1" * 64, ["c" * 100])
+    assert len(scans) == 1
+    sizes = [response_cache._path(k * 64).stat().st_size for k in "01"]
+    assert response_cache._read_size() == sum(sizes)
+
+    response_cache.max_size = sum(sizes) + 10
+    response_cache.put("2" * 64, [os.urandom(100).hex()])
+    assert len(scans) == 2
+    assert response_cache._read_size() <= response_cache.max_size
+
+
+def test_call_provider_api_replays_cached_stream(tmp_path):
+    """Test that a second identical call is served from the cache as a stream."""
+    calls = []
+
+    def call_api(config, prompt, conversation_history=None):
+        calls.append(prompt)
+        return iter(["Hi", " there"])
+
+    fake_module = SimpleNamespace(call_api=call_api, DEFAULT_MODEL="fake-model")
+    config = LaskConfig(cache=True, cache_dir=str(tmp_path))
+    config.providers["openai"] = ProviderConfig(temperature=0.2)
+
+    with patch("src.providers.get_provider_module", return_value=fake_module):
+        first = call_provider_api("openai", config, "Hello")
+        assert "".join(first) == "Hi there"
+
+        second = call_provider_api("openai", config, "Hello")
+        assert not isinstance(second, str)
+        assert list(second) == ["Hi", " there"]
+
+        config.cache = False
+        assert "".join(call_provider_api("openai", config, "Hello")) == "Hi there"
+
+    assert calls == ["Hello", "Hello"]
+
+
+def test_interrupted_stream_is_not_cached(tmp_path):
+    """Test that a stream abandoned part way through is not stored."""
+    response_cache = ResponseCache(tmp_path)
+    stream = cache.record(iter(["a", "b"]), response_cache, "ab" * 32)
+    next(stream)
+    stream.close()
+
+    assert response_cache.get("ab" * 32) is None
@@ -0,0 +1,96 @@
+"""
+Tests for the pluggable JSON codec.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.providers import codec, openai, sse
+
+OPENAI_PATH = ("choices", 0, "delta", "content")
+
+
+@pytest.fixture(autouse=True)
+def restore_codec(monkeypatch):
+    """Keep the backend selected by a test from leaking into others."""
+    monkeypatch.setattr(codec, "_codec", None)
+
+
+@pytest.fixture(params=codec.BACKENDS)
+def backend(request):
+    """Select each installed backend in turn."""
+    try:
+        return codec.use(request.param)
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+
+
+def test_round_trip(backend):
+    """Test that request bodies are compact UTF-8 JSON on every backend."""
+    body = {"messages": [{"role": "user", "content": "naïve — 🙂"}], "stream": True}
+    encoded = codec.dumps(body)
+    assert isinstance(encoded, bytes)
+    assert "naïve — 🙂".encode() in encoded
+    assert b": " not in encoded
+    assert codec.loads(encoded) == codec.loads(encoded.decode()) == body
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ('{"id":"x","choices":[{"index":0,"delta":{"content":"Hi"}}]}', "Hi"),
+        ('{"choices":[]}', None),
+        ('{"choices":null}', None),
+        ('{"choices":[{"delta":null}]}', None),
+        ('{"choices":[{"delta":{"role":"assistant"}}]}', None),
+        ('{"choices":[{"delta":{"content":5}}]}', None),
+        ('{"choices":"text"}', None),
+        ("[]", None),
+    ],
+)
+def test_delta_decoder(backend, data, expected):
+    """Test that only a string at the path is returned, whatever the event's shape."""
+    decode = codec.delta_decoder(*OPENAI_PATH)
+    assert decode(data) == expected
+    assert decode(data.encode()) == expected
+    # Decoders are built once per backend and path
+    assert codec.delta_decoder(*OPENAI_PATH) is decode
+
+
+def test_delta_decoder_rejects_invalid_json(backend):
+    """Test that malformed events raise DecodeError."""
+    with pytest.raises(codec.DecodeError):
+        codec.delta_decoder("delta", "text")('{"delta": {"text": "unterminated')
+
+
+def test_invalid_event_is_skipped(backend, capsys):
+    """Test that stream parsers warn about malformed events and go on."""
+    assert openai._parse_openai_event(sse.ServerSentEvent(data="{oops")) is None
+    assert "Could not parse JSON" in capsys.readouterr().out
+
+
+def test_backend_from_environment(monkeypatch, capsys):
+    """Test that LASK_JSON selects the backend and bad values fall back."""
+    monkeypatch.setenv(codec.JSON_ENV, "json")
+    assert codec.codec().name == "json"
+
+    monkeypatch.setattr(codec, "_codec", None)
+    monkeypatch.setenv(codec.JSON_ENV, "simdjson")
+    assert codec.codec().name in codec.BACKENDS
+    assert "Unknown JSON backend 'simdjson'" in capsys.readouterr().out
+
+
+def test_default_prefers_installed_fast_backend(monkeypatch):
+    """Test that the first backend that imports is used."""
+
+    def missing():
+        raise ImportError("not installed")
+
+    factories = dict(codec._FACTORIES, msgspec=missing, orjson=missing)
+    monkeypatch.setattr(codec, "_FACTORIES", factories)
+    assert codec.use().name == "json"
@@ -3,6 +3,7 @@ Tests for the LaskConfig class to ensure proper configuration parsing.
 """
 
 import os
+import re
 import sys
 import tempfile
 from pathlib import Path
@@ -14,6 +15,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.config import LaskConfig, ProviderConfig
 
+ROOT = Path(__file__).parent.parent
+
 # Sample configuration for testing
 SAMPLE_CONFIG = """
 [default]
@@ -268,3 +271,91 @@ def test_supported_providers_constant():
     assert "anthropic" in LaskConfig.SUPPORTED_PROVIDERS
     assert "aws" in LaskConfig.SUPPORTED_PROVIDERS
     assert "azure" in LaskConfig.SUPPORTED_PROVIDERS
+
+
+def test_config_snapshot_is_reused_until_file_changes(tmp_path):
+    """Test that a parsed config is reused from the snapshot until the file changes."""
+    config_path = tmp_path / "lask-config"
+    config_path.write_text(SAMPLE_CONFIG.replace("api_key = anthropic-api-key", ""))
+
+    with patch.object(LaskConfig, "CONFIG_PATH", config_path):
+        first = LaskConfig.load()
+        assert LaskConfig.snapshot_path().exists()
+
+        # A second load is served from the snapshot without parsing the file
+        with patch("configparser.ConfigParser") as mock_parser:
+            second = LaskConfig.load()
+            mock_parser.assert_not_called()
+        assert second == first
+        assert second.get_provider_config("aws").max_tokens == 8192
+
+        # Editing the file invalidates the snapshot
+        config_path.write_text(SAMPLE_CONFIG.replace("max_tokens = 8192", ""))
+        os.utime(config_path, ns=(0, 0))
+        assert LaskConfig.load().get_provider_config("aws").max_tokens is None
+
+
+def test_config_with_api_keys_is_not_snapshotted(tmp_path):
+    """Test that API keys from the config file are never written to the cache."""
+    config_path = tmp_path / "lask-config"
+    config_path.write_text(SAMPLE_CONFIG.replace("api_key = anthropic-api-key", ""))
+
+    with patch.object(LaskConfig, "CONFIG_PATH", config_path):
+        LaskConfig.load()
+        assert LaskConfig.snapshot_path().exists()
+
+        # Adding a key removes the snapshot of the earlier file
+        config_path.write_text(SAMPLE_CONFIG)
+        os.utime(config_path, ns=(0, 0))
+        config = LaskConfig.load()
+        assert config.get_provider_config("anthropic").api_key == "anthropic-api-key"
+        assert not LaskConfig.snapshot_path().exists()
+
+
+def test_request_template_is_built_once():
+    """Test that provider request templates are cached per config object."""
+    config = LaskConfig()
+    calls = []
+
+    def build(config):
+        calls.append(config)
+        return object()
+
+    template = config.request_template("openai", build)
+    assert config.request_template("openai", build) is template
+    assert len(calls) == 1
+    assert LaskConfig().request_template("openai", build) is not template
+
+
+def load_documented_config(tmp_path, capsys, text):
+    """Load a config file's text, failing on any warning or inline comment."""
+    config_path = tmp_path / "lask-config"
+    config_path.write_text(text)
+    with patch.object(LaskConfig, "CONFIG_PATH", config_path):
+        config = LaskConfig.load()
+    assert "Warning" not in capsys.readouterr().out
+    for values in [config.__dict__, *(p.__dict__ for p in config.providers.values())]:
+        assert not any("#" in str(value) for value in values.values())
+    return config
+
+
+def test_example_config_loads_with_every_setting(tmp_path, capsys):
+    """Test that the example config is valid with all its settings uncommented."""
+    text = (ROOT / "examples" / "example.lask-config").read_text()
+    text = re.sub(r"(?m)^# ?(\[\w+\]|[a-z_]+ = .*)$", r"\1", text)
+    config = load_documented_config(tmp_path, capsys, text)
+
+    assert config.hedge_provider == "azure"
+    assert config.context_strategy == "summarize"
+    assert config.get_provider_config("openai").rpm == 500
+    assert config.get_provider_config("openai").retry_max_delay == 30
+    assert config.get_provider_config("aws").max_retries == 2
+    assert config.get_provider_config("vllm").base_url == "http://10.0.0.5:8000/v1"
+
+
+def test_readme_config_examples_load(tmp_path, capsys):
+    """Test that every ini example in the README is a valid config file."""
+    blocks = re.findall(r"```ini\n(.*?)```", (ROOT / "README.md").read_text(), re.S)
+    assert blocks
+    for block in blocks:
+        load_documented_config(tmp_path, capsys, block)
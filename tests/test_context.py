@@ -0,0 +1,104 @@
+"""
+Tests for token-budgeted REPL context management.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import LaskConfig, ProviderConfig
+from src.context import (
+    DEFAULT_CONTEXT_BUDGET,
+    ContextManager,
+    context_budget,
+    estimate_tokens,
+)
+from src.providers import strip_metadata
+
+
+def make_conversation(turns):
+    """Build a conversation with a system prompt and `turns` 40-token turns."""
+    conversation = [{"role": "system", "content": "Be brief."}]
+    for i in range(turns):
+        conversation.append({"role": "user", "content": f"question {i} " + "x" * 140})
+        conversation.append(
+            {"role": "assistant", "content": f"answer {i} " + "y" * 140}
+        )
+    return conversation
+
+
+def test_fit_evicts_oldest_turns_and_keeps_system_prompt():
+    """Test that whole turns are evicted oldest first until the budget fits."""
+    conversation = make_conversation(5)
+    conversation.append({"role": "user", "content": "latest"})
+    context = ContextManager(budget=150)
+
+    evicted = context.fit(conversation)
+
+    assert context.usage(conversation) <= 150
+    assert conversation[0]["content"] == "Be brief."
+    assert conversation[1]["role"] == "user"
+    assert conversation[-1]["content"] == "latest"
+    assert evicted[0]["content"].startswith("question 0")
+    assert context.evicted == evicted
+
+
+def test_fit_keeps_latest_message_even_over_budget():
+    """Test that the prompt being sent is never evicted."""
+    conversation = [{"role": "user", "content": "z" * 1000}]
+    context = ContextManager(budget=10)
+    assert context.fit(conversation) == []
+    assert len(conversation) == 1
+
+
+def test_fit_summarizes_evicted_turns():
+    """Test that evicted turns are replaced by a summary that isn't sent as metadata."""
+    summarized = []
+
+    def summarize(messages):
+        summarized.append(messages)
+        return "They talked about x and y."
+
+    conversation = make_conversation(5)
+    conversation.append({"role": "user", "content": "latest"})
+    context = ContextManager(budget=200, summarize=summarize)
+    context.fit(conversation)
+
+    assert summarized and summarized[0][0]["content"].startswith("question 0")
+    summary = conversation[1]
+    assert summary["role"] == "system"
+    assert "They talked about x and y." in summary["content"]
+    assert context.usage(conversation) <= 200
+    assert strip_metadata(conversation)[1] == {
+        "role": "system",
+        "content": summary["content"],
+    }
+
+    # The next eviction folds the previous summary into the new one
+    conversation.extend(make_conversation(3)[1:])
+    context.fit(conversation)
+    assert summarized[1][0] is summary
+    assert summary not in context.evicted
+
+
+def test_context_budget_from_config_and_model():
+    """Test that configured budgets win over the model's window."""
+    config = LaskConfig(context_budget=5000)
+    assert context_budget(config, "openai", "gpt-4o") == 5000
+
+    config = LaskConfig(
+        providers={"openai": ProviderConfig(context_budget=2000, max_tokens=1000)}
+    )
+    assert context_budget(config, "openai", "gpt-4o") == 2000
+
+    config = LaskConfig(providers={"openai": ProviderConfig(max_tokens=1000)})
+    assert context_budget(config, "openai", "gpt-4") == 8192 - 1000
+    assert context_budget(config, "openai", "gpt-4o") == DEFAULT_CONTEXT_BUDGET
+    assert context_budget(config, "openai", "unknown-model") == DEFAULT_CONTEXT_BUDGET
+
+
+def test_estimate_tokens():
+    """Test the length-based token estimate."""
+    assert estimate_tokens({"role": "user", "content": "x" * 400}) == 104
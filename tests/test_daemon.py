@@ -0,0 +1,74 @@
+"""
+Tests for the resident daemon and its thin client.
+"""
+
+import socket
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import daemon
+from src.config import LaskConfig
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets"
+)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Run a daemon on a temporary socket for the duration of a test."""
+    # Keep the path short; Unix socket paths are limited to about 100 bytes
+    path = Path(f"/tmp/lask-test-{tmp_path.name}.sock")
+    monkeypatch.setenv("LASK_SOCKET", str(path))
+    server = daemon.create_server(LaskConfig(), path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    path.unlink()
+
+
+def test_client_streams_response_from_daemon(server, capsys, monkeypatch):
+    """Test that a prompt handed to the daemon is streamed back to the client."""
+    # Route output printed while handling the request, as serve() does
+    monkeypatch.setattr(sys, "stdout", daemon._RoutedStream("stdout", sys.stdout))
+
+    def fake_hedged_call(provider, config, prompt, conversation_history=None):
+        print(f"Prompting {provider}: {prompt}")
+        return provider, iter(["Hi", " there"])
+
+    with patch("src.race.hedged_call", side_effect=fake_hedged_call):
+        assert daemon.run_client("Hello", None, cache=True) == 0
+
+    assert capsys.readouterr().out == "Prompting openai: Hello\nHi there\n"
+
+
+def test_client_reports_provider_errors(server, capsys):
+    """Test that errors and exit codes from the daemon reach the client."""
+
+    def failing_call(provider, config, prompt, conversation_history=None):
+        raise Exception("boom")
+
+    with patch("src.race.hedged_call", side_effect=failing_call):
+        assert daemon.run_client("Hello", None, cache=True) == 1
+    assert "Error: boom" in capsys.readouterr().out
+
+
+def test_client_falls_back_without_daemon(tmp_path, monkeypatch):
+    """Test that the client runs in-process when no daemon is listening."""
+    monkeypatch.setenv("LASK_SOCKET", str(tmp_path / "missing.sock"))
+    assert daemon.run_client("Hello", None, cache=True) is None
+
+
+def test_second_daemon_refuses_to_start(server):
+    """Test that a running daemon's socket isn't taken over."""
+    with pytest.raises(RuntimeError, match="already running"):
+        daemon.create_server(LaskConfig(), daemon.socket_path())
@@ -0,0 +1,74 @@
+"""
+Tests that keep the startup of one-off lask runs fast.
+
+Importing src.main is what every `lask "question"` pays before doing any
+work, so modules only some modes need must be imported lazily.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Generous enough for slow CI machines; importing requests alone exceeds it
+IMPORT_BUDGET_MS = float(os.environ.get("LASK_IMPORT_BUDGET_MS", "100"))
+
+# Modules the one-off and pipe paths must not import up front
+DEFERRED_MODULES = [
+    "requests",
+    "urllib3",
+    "readline",
+    "configparser",
+    "concurrent.futures",
+    "src.batch",
+    "src.cache",
+    "src.context",
+    "src.mapreduce",
+    "src.ratelimit",
+    "src.sessions",
+    "src.tracing",
+    "sqlite3",
+]
+
+
+def import_times() -> Dict[str, int]:
+    """Import src.main in a fresh interpreter and return cumulative times in µs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    """Test that modules only some modes need are imported lazily."""
+    imported = import_times()
+    for module in DEFERRED_MODULES:
+        assert module not in imported, f"{module} is imported at startup"
+
+
+@pytest.mark.skipif(
+    os.environ.get("LASK_SKIP_IMPORT_BUDGET") == "1", reason="budget check disabled"
+)
+def test_import_time_budget():
+    """Test that importing src.main stays within the startup budget."""
+    # Take the best of a few runs to keep the check stable on busy machines
+    best_ms = min(import_times()["src.main"] for _ in range(3)) / 1000
+    assert best_ms < IMPORT_BUDGET_MS, (
+        f"importing src.main took {best_ms:.1f} ms, budget is {IMPORT_BUDGET_MS:.0f} ms"
+    )
@@ -0,0 +1,96 @@
+"""
+Tests for map-reduce over oversized piped input.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import mapreduce
+from src.config import LaskConfig
+
+
+def test_chunks_end_at_paragraph_or_line_breaks():
+    """Test that chunks stay within the size and prefer paragraph breaks."""
+    lines = ["a" * 9 + "\n"] * 6 + ["\n"] + ["b" * 9 + "\n"] * 5
+    chunks = list(mapreduce.iter_chunks(lines, max_chars=100))
+
+    assert chunks == ["".join(lines[:7]), "".join(lines[7:])]
+
+    # Without a paragraph break the chunk ends at a line break
+    chunks = list(mapreduce.iter_chunks(["x" * 30 + "\n"] * 5, max_chars=100))
+    assert [len(chunk) for chunk in chunks] == [93, 62]
+
+
+def test_long_lines_are_split_and_blank_chunks_skipped():
+    """Test that a line longer than a chunk is cut, and whitespace is dropped."""
+    chunks = list(mapreduce.iter_chunks(["\n" * 3, "y" * 250, "\n"], max_chars=100))
+    assert chunks == ["y" * 100, "y" * 100, "y" * 50 + "\n"]
+
+
+def test_map_reduce_combines_partial_answers():
+    """Test that every part is answered and the answers are combined in order."""
+    prompts = []
+    lock = threading.Lock()
+
+    def fake_hedged_call(provider, config, prompt, conversation_history=None):
+        with lock:
+            prompts.append(prompt)
+        if prompt.startswith("Count"):
+            if "Below are answers" in prompt:
+                return provider, iter(["combined"])
+            return provider, f"answer {prompt.count('line')}"
+        raise AssertionError(prompt)
+
+    lines = (f"line {i}\n" for i in range(100))
+    with patch("src.mapreduce.hedged_call", side_effect=fake_hedged_call):
+        result = mapreduce.map_reduce(
+            LaskConfig(), "openai", lines, "Count the lines", chunk_tokens=50
+        )
+        assert "".join(result) == "combined"
+
+    map_prompts = [p for p in prompts if "this is part" in p]
+    assert len(map_prompts) == len(prompts) - 1
+    reduce_prompt = prompts[-1]
+    assert reduce_prompt.index("Part 1:") < reduce_prompt.index("Part 2:")
+
+
+def test_map_reads_input_as_it_is_needed():
+    """Test that only a bounded window of prompts is read ahead of the workers."""
+    read = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def prompts():
+        for i in range(50):
+            read.append(i)
+            yield f"prompt {i}"
+
+    def slow_call(provider, config, prompt, conversation_history=None):
+        started.set()
+        release.wait(5)
+        return provider, "ok"
+
+    with patch("src.mapreduce.hedged_call", side_effect=slow_call):
+        thread = threading.Thread(
+            target=mapreduce.run_prompts,
+            args=(LaskConfig(), "openai", prompts(), 2),
+        )
+        thread.start()
+        started.wait(5)
+        assert len(read) <= 2 * mapreduce.WINDOW_FACTOR + 1
+        release.set()
+        thread.join(5)
+    assert len(read) == 50
+
+
+def test_empty_input_is_an_error():
+    """Test that whitespace-only input is rejected."""
+    with pytest.raises(ValueError, match="empty"):
+        mapreduce.map_reduce(LaskConfig(), "openai", ["\n", "  \n"])
@@ -0,0 +1,155 @@
+"""
+Tests for per-request latency and throughput metrics.
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import metrics
+from src.config import LaskConfig, ProviderConfig
+from src.providers import call_provider_api, openai, transport
+
+STREAM_BODY = (
+    b"".join(
+        b"data: "
+        + json.dumps({"choices": [{"delta": {"content": text}}]}).encode()
+        + b"\n\n"
+        for text in ("Hello", " there", "!")
+    )
+    + b"data: [DONE]\n\n"
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.startswith("/fail/"):
+            body = b'{"error": {"message": "bad request"}}'
+            self.send_response(400)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = STREAM_BODY
+        if not request.get("stream"):
+            body = json.dumps(
+                {"choices": [{"message": {"content": "Hello there!"}}]}
+            ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve OpenAI-style responses on localhost."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    monkeypatch.setattr(
+        openai, "API_URL", f"http://127.0.0.1:{httpd.server_port}/v1/chat/completions"
+    )
+    transport.close_sessions()
+    metrics.keep_finished()
+    metrics.drain()
+    yield httpd
+    metrics.keep_finished(False)
+    transport.close_sessions()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_config(streaming: bool = True) -> LaskConfig:
+    config = LaskConfig(stats=True)
+    config.providers["openai"] = ProviderConfig(api_key="test", streaming=streaming)
+    return config
+
+
+def test_streaming_call_is_measured(server):
+    """Test that every phase of a streamed call is recorded."""
+    config = make_config()
+    assert "".join(call_provider_api("openai", config, "hi")) == "Hello there!"
+
+    (first,) = metrics.drain()
+    assert first.provider == "openai"
+    assert first.streaming
+    assert first.connections == 1 and first.connect > 0
+    assert 0 < first.headers <= first.first_token <= first.total
+    assert first.bytes == len(STREAM_BODY)
+    assert first.chunks == 3
+    assert first.error is None
+    assert "connect" in first.format() and "3 chunks" in first.format()
+
+    # The pooled connection is reused by the next call
+    "".join(call_provider_api("openai", config, "hi"))
+    (second,) = metrics.drain()
+    assert second.connections == 0
+    assert "connection reused" in second.format()
+
+
+def test_non_streaming_call_is_measured(server):
+    """Test that a non-streaming call counts its whole body as one chunk."""
+    assert call_provider_api("openai", make_config(streaming=False), "hi") == (
+        "Hello there!"
+    )
+
+    (request_metrics,) = metrics.drain()
+    assert not request_metrics.streaming
+    assert request_metrics.chunks == 1
+    assert request_metrics.bytes > 0
+    assert request_metrics.headers <= request_metrics.total
+
+
+def test_unmeasured_calls_record_nothing(server):
+    """Test that calls are only measured with --stats or LASK_METRICS_FILE."""
+    config = make_config()
+    config.stats = False
+    "".join(call_provider_api("openai", config, "hi"))
+    assert metrics.drain() == []
+
+
+def test_closed_stream_is_recorded_as_cancelled(server):
+    """Test that a stream abandoned by its consumer is still reported."""
+    stream = call_provider_api("openai", make_config(), "hi")
+    assert next(stream) == "Hello"
+    stream.close()
+
+    (request_metrics,) = metrics.drain()
+    assert request_metrics.error == "cancelled"
+    assert request_metrics.chunks == 1
+
+
+def test_metrics_file(server, tmp_path, monkeypatch):
+    """Test that LASK_METRICS_FILE gets one JSON line per call."""
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv(metrics.METRICS_FILE_ENV, str(path))
+    config = make_config()
+    config.stats = False
+
+    for _ in range(2):
+        "".join(call_provider_api("openai", config, "hi"))
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["provider"] == "openai"
+    assert lines[0]["chunks"] == 3
+    assert lines[0]["bytes"] == len(STREAM_BODY)
+    assert lines[0]["connections"] == 1 and lines[1]["connections"] == 0
+    assert lines[0]["first_token_ms"] <= lines[0]["total_ms"]
+    assert lines[0]["error"] is None
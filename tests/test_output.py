@@ -0,0 +1,89 @@
+"""
+Tests for the coalescing output sink.
+"""
+
+import io
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.output import OutputSink
+
+
+class FakeTerminal(io.StringIO):
+    """A StringIO that claims to be a terminal and counts flushes."""
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def isatty(self):
+        return True
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+
+def test_collects_full_text_and_adds_newline():
+    """Test that all chunks are written and collected in order."""
+    stream = io.StringIO()
+    sink = OutputSink(stream)
+    for chunk in ["Hello", ", ", "world"]:
+        sink.write(chunk)
+    sink.close()
+
+    assert sink.getvalue() == "Hello, world"
+    assert stream.getvalue() == "Hello, world\n"
+
+
+def test_pipe_output_is_buffered_until_close():
+    """Test that piped output is held back until the buffer fills or the sink closes."""
+    stream = io.StringIO()
+    sink = OutputSink(stream, pipe_buffer_size=10)
+    sink.write("abc")
+    sink.write("def")
+    assert stream.getvalue() == ""
+
+    sink.write("ghijk")
+    assert stream.getvalue() == "abcdefghijk"
+
+    sink.write("l")
+    sink.close(newline=False)
+    assert stream.getvalue() == "abcdefghijkl"
+
+
+def test_terminal_output_is_coalesced():
+    """Test that deltas arriving within the flush interval share one flush."""
+    stream = FakeTerminal()
+    sink = OutputSink(stream, flush_interval=60, flush_size=1000)
+    for _ in range(100):
+        sink.write("x")
+
+    # The first delta is shown immediately, the rest wait for the interval
+    assert stream.getvalue() == "x"
+    assert stream.flushes == 1
+
+    sink.close()
+    assert stream.getvalue() == "x" * 100 + "\n"
+    assert stream.flushes == 2
+
+
+def test_pending_text_is_flushed_during_a_pause():
+    """Test that text held back by the interval is shown without another delta."""
+    stream = FakeTerminal()
+    sink = OutputSink(stream, flush_interval=0.05, flush_size=1000)
+    sink.write("a")
+    sink.write("b")
+    assert stream.getvalue() == "a"
+
+    deadline = time.monotonic() + 5
+    while stream.getvalue() != "ab" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stream.getvalue() == "ab"
+
+    sink.close()
+    assert stream.getvalue() == "ab\n"
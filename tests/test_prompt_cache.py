@@ -0,0 +1,108 @@
+"""
+Tests for Anthropic prompt caching and its usage reporting.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import LaskConfig, ProviderConfig
+from src.providers import anthropic, prompt_cache, sse
+
+CONVERSATION = [
+    {"role": "system", "content": "You are terse."},
+    {"role": "user", "content": "first"},
+    {"role": "assistant", "content": "one"},
+    {"role": "user", "content": "second"},
+    {"role": "assistant", "content": "two"},
+    {"role": "user", "content": "third"},
+]
+
+
+@pytest.fixture(autouse=True)
+def clean_usage(monkeypatch):
+    """Start every test with empty usage counters."""
+    monkeypatch.setattr(
+        prompt_cache, "_usage_counts", dict.fromkeys(prompt_cache._usage_counts, 0)
+    )
+    monkeypatch.setattr(prompt_cache, "_last_usage", {})
+
+
+def test_conversation_prefix_gets_breakpoints():
+    """Test that the system prompt and the last two user turns are cached."""
+    system, messages = prompt_cache.build_messages(CONVERSATION, cache=True)
+
+    assert system == [
+        {
+            "type": "text",
+            "text": "You are terse.",
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    assert all(m["role"] != "system" for m in messages)
+    marked = [m for m in messages if isinstance(m["content"], list)]
+    assert [m["content"][0]["text"] for m in marked] == ["second", "third"]
+    assert messages[0] == {"role": "user", "content": "first"}
+
+
+def test_single_prompt_only_caches_system_prompt():
+    """Test that one-off prompts don't pay for cache writes of the user message."""
+    system, messages = prompt_cache.build_messages(CONVERSATION[:2], cache=True)
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    assert messages == [{"role": "user", "content": "first"}]
+
+    system, messages = prompt_cache.build_messages(CONVERSATION, cache=False)
+    assert system == [{"type": "text", "text": "You are terse."}]
+    assert messages == CONVERSATION[1:]
+
+
+def test_anthropic_request_uses_top_level_system(monkeypatch):
+    """Test that the Anthropic request sends the system prompt as a field."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    config = LaskConfig(
+        providers={"anthropic": ProviderConfig(system_prompt="Be brief.")}
+    )
+    _, data = anthropic.build_request(config, "Hello")
+
+    assert data["system"][0]["text"] == "Be brief."
+    assert data["messages"] == [{"role": "user", "content": "Hello"}]
+
+    config = LaskConfig(providers={"anthropic": ProviderConfig(prompt_cache=False)})
+    _, data = anthropic.build_request(config, "Hello", CONVERSATION)
+    assert "cache_control" not in json.dumps(data)
+
+
+def test_usage_is_recorded_from_stream():
+    """Test that cache reads and writes from message_start are counted."""
+    usage = {
+        "input_tokens": 12,
+        "cache_read_input_tokens": 2000,
+        "cache_creation_input_tokens": 30,
+    }
+    event = sse.ServerSentEvent(
+        event="message_start",
+        data=json.dumps({"type": "message_start", "message": {"usage": usage}}),
+    )
+    assert anthropic._parse_anthropic_event(event) is None
+
+    stats = prompt_cache.usage_stats()
+    assert stats["last"] == usage
+    assert stats["total"]["requests"] == 1
+    assert prompt_cache.format_usage(stats["last"]) == (
+        "2000 of 2042 input tokens read from the prompt cache, 30 written to it"
+    )
+
+
+def test_bedrock_model_support():
+    """Test that older Bedrock Claude models don't get breakpoints."""
+    assert not prompt_cache.bedrock_supports_caching(
+        "anthropic.claude-3-sonnet-20240229-v1:0"
+    )
+    assert prompt_cache.bedrock_supports_caching(
+        "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+    )
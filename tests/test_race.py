@@ -0,0 +1,123 @@
+"""
+Tests for racing several providers against each other.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import LaskConfig, ProviderConfig
+from src.providers import strip_metadata, transport
+from src.race import hedge_stats, hedged_call, race_providers
+
+
+def test_fastest_provider_wins_and_losers_are_cancelled():
+    """Test that the first provider with content is streamed and the others cancelled."""
+    slow_closed = threading.Event()
+    release_slow = threading.Event()
+    scopes = {}
+
+    def fake_call(provider, config, prompt, conversation_history=None):
+        scopes[provider] = transport._local.scope
+
+        def stream():
+            if provider == "anthropic":
+                try:
+                    release_slow.wait(5)
+                    yield "slow"
+                finally:
+                    slow_closed.set()
+            else:
+                yield "Hi"
+                yield " there"
+
+        return stream()
+
+    with patch("src.race.call_provider_api", side_effect=fake_call):
+        winner, result = race_providers(["anthropic", "openai"], LaskConfig(), "Hello")
+        assert winner == "openai"
+        assert "".join(result) == "Hi there"
+
+        assert scopes["anthropic"].cancelled
+        assert not scopes["openai"].cancelled
+        # The loser closes its stream as soon as it produces its first chunk
+        release_slow.set()
+        assert slow_closed.wait(5)
+
+
+def test_failed_providers_lose():
+    """Test that a failing provider doesn't win, and all failing raises."""
+
+    def fake_call(provider, config, prompt, conversation_history=None):
+        if provider == "openai":
+            raise Exception("boom")
+        return "Hi there"
+
+    with patch("src.race.call_provider_api", side_effect=fake_call):
+        assert race_providers(["openai", "azure"], LaskConfig(), "Hello") == (
+            "azure",
+            "Hi there",
+        )
+        with pytest.raises(Exception, match="boom"):
+            race_providers(["openai"], LaskConfig(), "Hello")
+
+
+def test_hedge_is_sent_when_first_chunk_is_late():
+    """Test that a slow provider is hedged to the backup, and a fast one isn't."""
+    release_slow = threading.Event()
+    calls = []
+
+    def fake_call(provider, config, prompt, conversation_history=None):
+        calls.append(provider)
+
+        def stream():
+            if provider == "openai":
+                release_slow.wait(5)
+            yield f"from {provider}"
+
+        return stream()
+
+    config = LaskConfig(hedge_delay=0.05)
+    config.providers["openai"] = ProviderConfig(hedge_provider="azure")
+    before = hedge_stats()
+    with patch("src.race.call_provider_api", side_effect=fake_call):
+        provider, result = hedged_call("openai", config, "Hello")
+        assert provider == "azure"
+        assert "".join(result) == "from azure"
+        release_slow.set()
+
+        provider, result = hedged_call("openai", config, "Hello")
+        assert "".join(result) == "from openai"
+
+    assert calls == ["openai", "azure", "openai"]
+    after = hedge_stats()
+    assert after["requests"] - before["requests"] == 2
+    assert after["hedged"] - before["hedged"] == 1
+    assert after["hedge_won"] - before["hedge_won"] == 1
+
+
+def test_cancelled_scope_rejects_new_requests():
+    """Test that a request made in a cancelled scope is never sent."""
+    scope = transport.CancelScope()
+    scope.cancel()
+    with transport.cancel_scope(scope):
+        with pytest.raises(transport.RequestCancelled):
+            transport.post("https://example.invalid/v1")
+
+
+def test_strip_metadata_keeps_role_and_content():
+    """Test that bookkeeping keys are removed before messages are sent."""
+    messages = [{"role": "user", "content": "Hello"}]
+    assert strip_metadata(messages) is messages
+
+    recorded = messages + [{"role": "assistant", "content": "Hi", "provider": "openai"}]
+    assert strip_metadata(recorded) == [
+        {"role": "user", "content": "Hello"},
+        {"role": "assistant", "content": "Hi"},
+    ]
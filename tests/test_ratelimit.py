@@ -0,0 +1,154 @@
+"""
+Tests for the client-side rate limiter shared between lask processes.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import ratelimit
+from src.config import LaskConfig, ProviderConfig
+from src.providers import transport
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze the limiter's clock; tests move it forward by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    return now
+
+
+def test_requests_within_the_limit_do_not_wait(tmp_path):
+    """Test that a full bucket lets requests through at once."""
+    limiter = ratelimit.RateLimiter("openai/gpt-4.1", rpm=3, directory=tmp_path)
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_requests_over_the_limit_queue(tmp_path, clock):
+    """Test that each request past the limit waits behind the previous one."""
+    limiter = ratelimit.RateLimiter("openai/gpt-4.1", rpm=60, directory=tmp_path)
+    for _ in range(60):
+        limiter.reserve()
+    assert limiter.reserve() == pytest.approx(1.0)
+    assert limiter.reserve() == pytest.approx(2.0)
+    # Waiting pays the debt back
+    clock[0] += 2
+    assert limiter.reserve() == pytest.approx(1.0)
+
+
+def test_async_reserve_runs_off_the_event_loop(tmp_path, monkeypatch):
+    """Test that aacquire takes the file lock on an executor thread."""
+    limiter = ratelimit.RateLimiter("openai/gpt-4.1", rpm=3, directory=tmp_path)
+    threads = []
+    reserve = limiter.reserve
+
+    def record(tokens=0):
+        threads.append(threading.current_thread())
+        return reserve(tokens)
+
+    monkeypatch.setattr(limiter, "reserve", record)
+    asyncio.run(limiter.aacquire())
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_processes_share_buckets(tmp_path):
+    """Test that limiters with separate state (as in separate processes) coordinate."""
+    first = ratelimit.RateLimiter("openai/gpt-4.1", rpm=2, directory=tmp_path)
+    second = ratelimit.RateLimiter("openai/gpt-4.1", rpm=2, directory=tmp_path)
+    other_model = ratelimit.RateLimiter("openai/gpt-4o", rpm=2, directory=tmp_path)
+
+    assert first.reserve() == 0.0
+    assert second.reserve() == 0.0
+    assert first.reserve() > 0
+    # Other models have buckets of their own
+    assert other_model.reserve() == 0.0
+
+
+def test_token_limit(tmp_path, clock):
+    """Test tokens-per-minute limits, including requests larger than the bucket."""
+    limiter = ratelimit.RateLimiter("anthropic/claude", tpm=6000, directory=tmp_path)
+    assert limiter.reserve(4000) == 0.0
+    # 2000 tokens short at 100 tokens per second
+    assert limiter.reserve(4000) == pytest.approx(20.0)
+
+    big = ratelimit.RateLimiter("anthropic/big", tpm=1000, directory=tmp_path)
+    assert big.reserve(5000) == 0.0
+    assert big.reserve(5000) == pytest.approx(60.0)
+
+
+def test_full_buckets_are_dropped(tmp_path, clock):
+    """Test that the state file only keeps buckets that aren't full."""
+    ratelimit.RateLimiter("openai/gpt-4.1", rpm=10, directory=tmp_path).reserve()
+    state = json.loads((tmp_path / ratelimit.STATE_FILE).read_text())
+    assert list(state) == ["openai/gpt-4.1:rpm"]
+
+    clock[0] += 60
+    ratelimit.RateLimiter("openai/gpt-4o", rpm=10, directory=tmp_path).reserve()
+    state = json.loads((tmp_path / ratelimit.STATE_FILE).read_text())
+    assert list(state) == ["openai/gpt-4o:rpm"]
+
+
+def test_corrupt_state_is_reset(tmp_path):
+    """Test that an unreadable state file counts as full buckets."""
+    (tmp_path / ratelimit.STATE_FILE).write_text("{not json")
+    limiter = ratelimit.RateLimiter("openai/gpt-4.1", rpm=1, directory=tmp_path)
+    assert limiter.reserve() == 0.0
+
+
+def test_call_provider_api_waits_for_limits(monkeypatch, clock):
+    """Test that provider calls go through the limiter only when limits are set."""
+    from src import providers
+    from src.providers import openai
+
+    monkeypatch.setattr(openai, "call_api", lambda *args: "answer")
+    waits = []
+    monkeypatch.setattr(transport, "sleep", waits.append)
+
+    config = LaskConfig(cache=False)
+    config.providers["openai"] = ProviderConfig(api_key="test", rpm=1, max_tokens=10)
+    assert providers.call_provider_api("openai", config, "hi") == "answer"
+    assert providers.call_provider_api("openai", config, "hi") == "answer"
+    assert len(waits) == 1
+    assert waits[0] == pytest.approx(60.0)
+
+    config.providers["openai"].rpm = None
+    providers.call_provider_api("openai", config, "hi")
+    assert len(waits) == 1
+
+
+def test_retries_wait_for_limits(monkeypatch, clock):
+    """Test that every retry of a call is charged against the limiter."""
+    from src import providers
+    from src.providers import openai, retry
+
+    def call_api(config, prompt, conversation_history=None):
+        def attempt():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise retry.ProviderError("429", status=429, retryable=True)
+            yield "answer"
+
+        return retry.stream(attempt, config.get_provider_config("openai"), "openai")
+
+    attempts = []
+    monkeypatch.setattr(openai, "call_api", call_api)
+    waits = []
+    monkeypatch.setattr(transport, "sleep", waits.append)
+
+    config = LaskConfig(cache=False)
+    config.providers["openai"] = ProviderConfig(
+        api_key="test", rpm=1, max_retries=1, retry_max_delay=1.0
+    )
+    assert "".join(providers.call_provider_api("openai", config, "hi")) == "answer"
+    assert len(attempts) == 2
+    # The retry's backoff, then the limiter's wait for the second request
+    assert len(waits) == 2
+    assert waits[1] == pytest.approx(60.0)
@@ -0,0 +1,162 @@
+"""
+Tests for the provider registry, named instances and base_url.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_servers import MockProviderServer, StreamProfile, response_texts
+from src.config import LaskConfig, ProviderConfig
+from src.providers import (
+    anthropic,
+    azure,
+    call_provider_api,
+    get_provider_module,
+    openai,
+    registry,
+    transport,
+)
+
+PROFILE = StreamProfile(tokens=12, chunk_tokens=4)
+HISTORY = [{"role": "user", "content": "hi"}]
+
+
+def make_config() -> LaskConfig:
+    config = LaskConfig()
+    config.providers["vllm"] = ProviderConfig(
+        type="openai", base_url="http://10.0.0.5:8000/v1/", model="llama"
+    )
+    return config
+
+
+@pytest.fixture
+def fake_plugin(monkeypatch):
+    """Install a provider plugin through a stand-in entry point."""
+    module = types.SimpleNamespace(
+        call_api=lambda config, prompt, history=None, **kwargs: f"echo {prompt}",
+        DEFAULT_MODEL="echo-1",
+    )
+    entry_point = types.SimpleNamespace(name="echo", load=lambda: module)
+    monkeypatch.setattr(registry, "_plugins", {"echo": entry_point})
+    monkeypatch.setattr(registry, "_dispatch", dict(registry._dispatch))
+    return module
+
+
+def test_builtin_providers_are_loaded_once():
+    """Test that the dispatch table keeps each imported module."""
+    assert get_provider_module("openai") is openai
+    assert registry._dispatch["openai"] is openai
+    assert get_provider_module("openai") is registry.load("openai")
+
+
+def test_named_instance_uses_its_type():
+    """Test that a section with a type is handled by that provider's module."""
+    config = make_config()
+    assert registry.provider_type("vllm", config) == "openai"
+    assert get_provider_module("vllm", config) is openai
+    assert registry.call_kwargs("vllm", config) == {"provider": "vllm"}
+    assert registry.call_kwargs("openai", config) == {}
+    assert registry.is_supported("vllm", config)
+    assert "vllm" in registry.available(config)
+
+
+def test_unknown_provider(fake_plugin):
+    """Test that names without a module are rejected."""
+    assert not registry.is_supported("nope")
+    with pytest.raises(ImportError, match="'nope' is not supported"):
+        get_provider_module("nope")
+
+
+def test_plugin_provider(fake_plugin):
+    """Test that entry point providers are loaded and called like built-ins."""
+    assert registry.is_supported("echo")
+    assert "echo" in registry.available()
+    assert get_provider_module("echo") is fake_plugin
+    assert call_provider_api("echo", LaskConfig(), "hi") == "echo hi"
+
+
+def test_registered_provider(monkeypatch):
+    """Test that providers registered from code are dispatched to."""
+    monkeypatch.setattr(registry, "_dispatch", dict(registry._dispatch))
+    module = types.SimpleNamespace(call_api=lambda config, prompt, history: "ok")
+    registry.register("inline", module)
+    assert registry.is_supported("inline")
+    assert call_provider_api("inline", LaskConfig(), "hi") == "ok"
+
+
+def test_base_url_templates(monkeypatch):
+    """Test that base_url replaces each provider's public endpoint."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    config = make_config()
+    template = openai.build_template(config, "vllm")
+    assert template.url == "http://10.0.0.5:8000/v1/chat/completions"
+    # Local servers need no API key
+    assert "Authorization" not in template.headers
+    assert template.model == "llama"
+
+    config.providers["anthropic"] = ProviderConfig(base_url="http://gateway")
+    template = anthropic.build_template(config)
+    assert template.url == "http://gateway/v1/messages"
+    assert "x-api-key" not in template.headers
+
+    config.providers["azure"] = ProviderConfig(
+        api_key="key", base_url="http://gateway/", deployment_id="gpt"
+    )
+    assert azure.build_template(config).url.startswith(
+        "http://gateway/openai/deployments/gpt/chat/completions?"
+    )
+
+
+def test_openai_key_is_required_without_base_url(monkeypatch):
+    """Test that api.openai.com still needs an API key."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        openai.build_template(LaskConfig())
+
+
+def test_named_instance_call():
+    """Test that calls to a named instance go to its base_url."""
+    with MockProviderServer(PROFILE) as server:
+        transport.close_sessions()
+        config = LaskConfig()
+        config.providers["openai"] = ProviderConfig(api_key="unused")
+        config.providers["local"] = ProviderConfig(
+            type="openai", base_url=server.base_url("openai")
+        )
+        chunks = call_provider_api("local", config, "", list(HISTORY))
+        assert "".join(chunks) == "".join(response_texts(PROFILE))
+        # The instance has its own template, next to the provider's
+        assert set(config._templates) == {"local"}
+        transport.close_sessions()
+
+
+def test_config_file_sections(tmp_path, monkeypatch):
+    """Test that any section of the config file can configure a provider."""
+    path = tmp_path / "lask-config"
+    path.write_text(
+        "[default]\n"
+        "provider = vLLM\n"
+        "[vLLM]\n"
+        "type = openai\n"
+        "base_url = http://10.0.0.5:8000/v1\n"
+        "max_tokens = 256\n"
+    )
+    monkeypatch.setattr(LaskConfig, "CONFIG_PATH", path)
+    monkeypatch.setattr(
+        LaskConfig, "snapshot_path", classmethod(lambda cls: tmp_path / "snapshot")
+    )
+    config = LaskConfig.load()
+    vllm = config.providers["vllm"]
+    assert (vllm.type, vllm.base_url, vllm.max_tokens) == (
+        "openai",
+        "http://10.0.0.5:8000/v1",
+        256,
+    )
+    assert registry.is_supported(config.provider.lower(), config)
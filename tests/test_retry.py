@@ -0,0 +1,170 @@
+"""
+Tests for retries of rate-limited and failed provider requests.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import ProviderConfig
+from src.providers import retry, transport
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry waits instead of sleeping."""
+    waits = []
+    monkeypatch.setattr(transport, "sleep", waits.append)
+    return waits
+
+
+def test_retry_after_headers():
+    """Test the server's wait hints, in order of precedence."""
+    assert retry.retry_after({"retry-after-ms": "1500", "retry-after": "9"}) == 1.5
+    assert retry.retry_after({"retry-after": "3"}) == 3.0
+    assert retry.retry_after({}) is None
+
+    # Exhausted rate limits wait for the later reset
+    headers = {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert retry.retry_after(headers) == 360.0
+    # Limits that aren't exhausted don't count
+    headers["x-ratelimit-remaining-tokens"] = "120"
+    assert retry.retry_after(headers) == 1.0
+
+
+def test_parse_duration():
+    """Test Go-style durations as sent in OpenAI rate limit headers."""
+    assert retry._parse_duration("20ms") == pytest.approx(0.02)
+    assert retry._parse_duration("1.5s") == 1.5
+    assert retry._parse_duration("1m30s") == 90.0
+    assert retry._parse_duration("soon") is None
+    assert retry._parse_duration("12") is None
+
+
+def test_fatal_errors_are_not_retried(sleeps):
+    """Test that errors like bad requests fail at once."""
+    attempts = []
+
+    def send():
+        attempts.append(1)
+        raise retry.ProviderError("400 bad request", status=400)
+
+    with pytest.raises(retry.ProviderError):
+        retry.call(send, ProviderConfig(max_retries=3), "api.example.com")
+    assert len(attempts) == 1
+    assert sleeps == []
+
+
+def test_call_retries_rate_limits(sleeps):
+    """Test that a 429 is retried after the wait the server asked for."""
+    results = [
+        retry.ProviderError("429", status=429, retryable=True, retry_after=2.0),
+        "answer",
+    ]
+
+    def send():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert retry.call(send, ProviderConfig(max_retries=2), "api.example.com") == (
+        "answer"
+    )
+    assert len(sleeps) == 1
+    # Retry-After plus a little jitter
+    assert 2.0 <= sleeps[0] <= 2.2
+
+
+def test_retries_give_up(sleeps):
+    """Test that max_retries bounds the attempts and long waits aren't taken."""
+    error = retry.ProviderError("503", status=503, retryable=True)
+    config = ProviderConfig(max_retries=2, retry_base_delay=1.0, retry_max_delay=8.0)
+
+    def send():
+        raise error
+
+    with pytest.raises(retry.ProviderError):
+        retry.call(send, config, "api.example.com")
+    assert len(sleeps) == 2
+    # Exponential backoff, at least half of the ceiling
+    assert 0.5 <= sleeps[0] <= 1.0
+    assert 1.0 <= sleeps[1] <= 2.0
+
+    sleeps.clear()
+    error.retry_after = 60.0
+    with pytest.raises(retry.ProviderError):
+        retry.call(send, config, "api.example.com")
+    assert sleeps == []
+
+
+def test_before_retry_runs_before_each_retry(sleeps):
+    """Test that the hook runs once per retry, not for the first attempt."""
+    error = retry.ProviderError("503", status=503, retryable=True)
+    calls = []
+
+    def send():
+        raise error
+
+    with pytest.raises(retry.ProviderError):
+        retry.call(
+            send,
+            ProviderConfig(max_retries=2),
+            "api.example.com",
+            before_retry=lambda: calls.append(len(sleeps)),
+        )
+    # Each retry is charged after its backoff
+    assert calls == [1, 2]
+
+
+def test_stream_retried_before_first_chunk(sleeps):
+    """Test that a stream failing before its first chunk is opened again."""
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        if len(opened) == 1:
+            raise retry.ProviderError("529 overloaded", status=529, retryable=True)
+        yield "Hello"
+        yield " world"
+
+    chunks = retry.stream(open_stream, ProviderConfig(max_retries=2), "api.example.com")
+    assert "".join(chunks) == "Hello world"
+    assert len(opened) == 2
+    assert len(sleeps) == 1
+
+
+def test_stream_not_retried_after_first_chunk(sleeps):
+    """Test that a stream failing midway is not restarted."""
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        yield "Hello"
+        raise retry.ProviderError("overloaded", retryable=True)
+
+    chunks = retry.stream(open_stream, ProviderConfig(max_retries=2), "api.example.com")
+    assert next(chunks) == "Hello"
+    with pytest.raises(retry.ProviderError):
+        next(chunks)
+    assert len(opened) == 1
+    assert sleeps == []
+
+
+def test_cancelled_requests_are_not_retried():
+    """Test that requests aborted by a race are not retried."""
+    scope = transport.CancelScope()
+    with transport.cancel_scope(scope):
+        scope.cancel()
+        error = retry.ProviderError("503", status=503, retryable=True)
+        assert not retry.is_retryable(error)
+    assert retry.is_retryable(error)
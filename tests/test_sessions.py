@@ -0,0 +1,139 @@
+"""
+Tests for the persistent REPL session store.
+"""
+
+import os
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.main import parse_args
+from src.sessions import Session, SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Open a session store in a temporary directory."""
+    store = SessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def add_turns(store, session_id, turns):
+    """Append `turns` prompt/answer pairs to a session."""
+    for i in range(turns):
+        store.append(session_id, {"role": "user", "content": f"question {i}"})
+        store.append(
+            session_id,
+            {"role": "assistant", "content": f"answer {i}", "provider": "openai"},
+        )
+
+
+def test_session_is_created_on_first_message(store):
+    """Test that sessions without messages aren't stored."""
+    session = Session(store, "openai")
+    assert store.latest() is None
+
+    session.save({"role": "user", "content": "How do   I resume?"})
+    session.save({"role": "assistant", "content": "With --resume."})
+
+    info = store.latest()
+    assert info.id == session.id
+    assert info.title == "How do I resume?"
+    assert list(store.iter_messages(session.id)) == [
+        {"role": "user", "content": "How do   I resume?"},
+        {"role": "assistant", "content": "With --resume."},
+    ]
+
+
+def test_load_reads_latest_turns_within_budget(store):
+    """Test that resuming only loads the newest whole turns that fit."""
+    session_id = store.create("openai")
+    add_turns(store, session_id, 50)
+
+    messages = store.load(session_id, budget=30)
+
+    assert messages[0]["role"] == "user"
+    assert messages[-1]["content"] == "answer 49"
+    assert messages[-1]["provider"] == "openai"
+    assert len(messages) < 10
+    assert len(store.load(session_id, budget=100000)) == 100
+
+
+def test_search_finds_sessions_by_words(store):
+    """Test full-text search over stored messages."""
+    first = store.create("openai")
+    store.append(
+        first, {"role": "user", "content": "How do sqlite WAL checkpoints work?"}
+    )
+    second = store.create("anthropic")
+    store.append(second, {"role": "user", "content": "Explain Python generators"})
+    store.append(second, {"role": "assistant", "content": "Generators use yield."})
+
+    results = store.search("generators")
+    assert [result.session.id for result in results] == [second]
+    assert "generators" in results[0].snippet.lower()
+
+    assert [r.session.id for r in store.search("WAL checkpoints")] == [first]
+    assert store.search('wal "unbalanced') == []
+    assert store.search("nothing matches this") == []
+
+
+def test_search_without_fts(store):
+    """Test the LIKE fallback used when SQLite lacks FTS5."""
+    session_id = store.create()
+    store.append(session_id, {"role": "user", "content": "Explain Python generators"})
+    store.fts = False
+    assert [r.session.id for r in store.search("python GENERATORS")] == [session_id]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_database_is_private(tmp_path):
+    """Test that the data directory and database files are owner-only."""
+    path = tmp_path / "lask" / "sessions.db"
+    store = SessionStore(path)
+    try:
+        store.append(store.create(), {"role": "user", "content": "secret"})
+        assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+        for name in (path, Path(f"{path}-wal"), Path(f"{path}-shm")):
+            assert stat.S_IMODE(name.stat().st_mode) == 0o600
+    finally:
+        store.close()
+
+    # Files created with looser permissions are tightened
+    path.chmod(0o644)
+    SessionStore(path).close()
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_resume_flag():
+    """Test that --resume defaults to the most recent session."""
+    assert parse_args(["--resume"]).resume == "last"
+    assert parse_args(["--resume", "12"]).resume == "12"
+    assert parse_args(["hello"]).resume is None
+
+
+@pytest.mark.parametrize(
+    "argv", [["--resume", "what", "is", "x"], ["--resume", "12", "what", "is", "x"]]
+)
+def test_resume_rejects_prompt(argv, capsys):
+    """Test that words after --resume are reported instead of dropped."""
+    with pytest.raises(SystemExit) as excinfo:
+        parse_args(argv)
+    assert excinfo.value.code == 2
+    assert "resumed REPL session" in capsys.readouterr().err
+
+
+def test_prompts_starting_with_a_dash():
+    """Test that abbreviations and unknown options are taken as the prompt."""
+    args = parse_args(["--res", "the", "bug"])
+    assert args.resume is None and args.prompt == ["--res", "the", "bug"]
+    args = parse_args(["--stats", "-v", "means", "verbose?"])
+    assert args.stats and args.prompt == ["-v", "means", "verbose?"]
+    args = parse_args(["--", "--serve", "flag"])
+    assert not args.serve and args.prompt == ["--serve", "flag"]
@@ -0,0 +1,96 @@
+"""
+Tests for the incremental server-sent events parser.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.providers.sse import ServerSentEvent, SSEParser, iter_sse_events
+
+RECORDING = (
+    Path(__file__).parent.parent / "benchmarks" / "data" / "anthropic_messages.sse"
+)
+
+
+def parse_bytewise(payload: bytes):
+    """Feed the payload one byte at a time."""
+    return list(iter_sse_events(payload[i : i + 1] for i in range(len(payload))))
+
+
+def test_data_and_event_fields():
+    """Test basic data lines and named events."""
+    payload = b'data: {"a": 1}\n\nevent: ping\ndata: {}\n\n'
+    events = list(iter_sse_events([payload]))
+
+    assert events == [
+        ServerSentEvent(event="message", data='{"a": 1}'),
+        ServerSentEvent(event="ping", data="{}"),
+    ]
+
+
+def test_multiline_data_is_joined():
+    """Test that consecutive data fields are joined with newlines."""
+    events = list(iter_sse_events([b"data: first\ndata:second\ndata\n\n"]))
+
+    assert events == [ServerSentEvent(data="first\nsecond\n")]
+
+
+def test_comments_and_unknown_fields_are_ignored():
+    """Test that keep-alive comments and unknown fields produce no events."""
+    events = list(iter_sse_events([b": keep-alive\n\nfoo: bar\ndata: x\n\n"]))
+
+    assert events == [ServerSentEvent(data="x")]
+
+
+def test_id_and_retry_fields():
+    """Test that id and retry are attached to the events that follow."""
+    events = list(iter_sse_events([b"id: 7\nretry: 1500\ndata: x\n\ndata: y\n\n"]))
+
+    assert events[0] == ServerSentEvent(data="x", id="7", retry=1500)
+    assert events[1].id == "7"
+
+
+def test_crlf_and_cr_line_endings():
+    """Test CRLF and bare CR line endings, including a CRLF split across reads."""
+    crlf = [b"event: a\r\ndata: 1\r", b"\n\r\n"]
+    cr = [b"data: 2\r\r"]
+
+    assert list(iter_sse_events(crlf)) == [ServerSentEvent(event="a", data="1")]
+    assert list(iter_sse_events(cr)) == [ServerSentEvent(data="2")]
+
+
+def test_utf8_split_across_reads():
+    """Test that a multi-byte character split between reads is decoded correctly."""
+    payload = "data: héllo ✓\n\n".encode("utf-8")
+
+    assert parse_bytewise(payload) == [ServerSentEvent(data="héllo ✓")]
+
+
+def test_bom_is_stripped():
+    """Test that a leading UTF-8 byte order mark is ignored."""
+    assert parse_bytewise(b"\xef\xbb\xbfdata: x\n\n") == [ServerSentEvent(data="x")]
+
+
+def test_unterminated_event_is_discarded():
+    """Test that an event without a trailing blank line is dropped at end of stream."""
+    parser = SSEParser()
+
+    assert parser.feed(b"data: complete\n\ndata: partial\n") == [
+        ServerSentEvent(data="complete")
+    ]
+    assert parser.close() == []
+
+
+def test_recording_is_independent_of_read_size():
+    """Test that the recorded stream parses the same regardless of read size."""
+    payload = RECORDING.read_bytes()
+    whole = list(iter_sse_events([payload]))
+
+    assert len(whole) > 100
+    assert whole[0].event == "message_start"
+    for read_size in (1, 7, 512):
+        chunks = [payload[i : i + read_size] for i in range(0, len(payload), read_size)]
+        assert list(iter_sse_events(chunks)) == whole
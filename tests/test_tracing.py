@@ -0,0 +1,137 @@
+"""
+Tests for the lifecycle hooks around provider calls and the span exporter.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import hooks, tracing
+from src.providers import call_provider_api
+from tests.test_metrics import STREAM_BODY, make_config, server  # noqa: F401
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def events():
+    """Collect the events of every call made in the test."""
+    collected = []
+    hooks.add_hook(collected.append)
+    yield collected
+    hooks.remove_hook(collected.append)
+
+
+@pytest.mark.usefixtures("server")
+def test_event_order(events):
+    """Test that a streamed call emits its lifecycle events in order."""
+    config = make_config()
+    config.stats = False
+    "".join(call_provider_api("openai", config, "hi"))
+    "".join(call_provider_api("openai", config, "hi"))
+
+    first = [e for e in events if e.call_id == events[0].call_id]
+    assert [e.name for e in first] == [
+        "request_built",
+        "connection_acquired",
+        "headers_received",
+        "first_chunk",
+        "chunk",
+        "chunk",
+        "chunk",
+        "complete",
+    ]
+    assert first[0].size == len("hi")
+    assert first[1].attributes["reused"] is False
+    assert first[-1].size == len(STREAM_BODY)
+    # Timestamps are monotonic and the wall clock follows them
+    stamps = [e.monotonic_ns for e in first]
+    assert stamps == sorted(stamps)
+    assert first[-1].time_ns - first[0].time_ns == stamps[-1] - stamps[0]
+
+    second = [e for e in events if e.call_id != events[0].call_id]
+    assert second[1].name == "connection_acquired"
+    assert second[1].attributes["reused"] is True
+
+
+@pytest.mark.usefixtures("server")
+def test_cancelled_and_failed_calls(events, monkeypatch):
+    """Test that abandoned and failing calls end with the matching event."""
+    stream = call_provider_api("openai", make_config(), "hi")
+    next(stream)
+    stream.close()
+    assert events[-1].name == "cancelled"
+
+    from src.providers import openai
+
+    monkeypatch.setattr(openai, "API_URL", openai.API_URL.replace("/v1/", "/fail/"))
+    with pytest.raises(Exception, match="bad request"):
+        "".join(call_provider_api("openai", make_config(), "hi"))
+    assert events[-1].name == "error"
+    assert events[-1].attributes["status"] == 400
+    assert events[-1].attributes["error_type"] == "ProviderError"
+
+
+@pytest.mark.usefixtures("server")
+def test_failing_hook_does_not_break_calls(capsys):
+    """Test that an exception in a hook is reported and the call goes on."""
+
+    def broken(event):
+        raise RuntimeError("oops")
+
+    hooks.add_hook(broken)
+    try:
+        assert "".join(call_provider_api("openai", make_config(), "hi")) == (
+            "Hello there!"
+        )
+    finally:
+        hooks.remove_hook(broken)
+    assert capsys.readouterr().err.count("A lask hook failed: oops") == 1
+
+
+@pytest.mark.usefixtures("server")
+def test_span_export(tmp_path, monkeypatch):
+    """Test that each call is written as an OTLP/JSON span."""
+    monkeypatch.setenv(tracing.TRACEPARENT_ENV, TRACEPARENT)
+    path = tmp_path / "spans.jsonl"
+    exporter = tracing.SpanExporter(path)
+    hooks.add_hook(exporter)
+    try:
+        "".join(call_provider_api("openai", make_config(), "hi"))
+    finally:
+        hooks.remove_hook(exporter)
+
+    (line,) = path.read_text().splitlines()
+    resource_spans = json.loads(line)["resourceSpans"][0]
+    (span,) = resource_spans["scopeSpans"][0]["spans"]
+    assert span["traceId"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert span["parentSpanId"] == "00f067aa0ba902b7"
+    assert len(span["spanId"]) == 16
+    assert span["name"] == "chat gpt-4.1"
+    assert span["kind"] == tracing.SPAN_KIND_CLIENT
+    assert span["status"] == {"code": tracing.STATUS_OK}
+    assert int(span["startTimeUnixNano"]) < int(span["endTimeUnixNano"])
+    assert [e["name"] for e in span["events"]] == [
+        "connection_acquired",
+        "headers_received",
+        "first_chunk",
+    ]
+    attributes = {a["key"]: a["value"] for a in span["attributes"]}
+    assert attributes["gen_ai.system"] == {"stringValue": "openai"}
+    assert attributes["lask.response.chunks"] == {"intValue": "3"}
+
+
+def test_parse_traceparent():
+    """Test that only valid W3C traceparent values are used."""
+    assert tracing.parse_traceparent(TRACEPARENT) == (
+        "4bf92f3577b34da6a3ce929d0e0e4736",
+        "00f067aa0ba902b7",
+    )
+    assert tracing.parse_traceparent(None) is None
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert tracing.parse_traceparent("garbage") is None
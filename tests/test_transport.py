@@ -0,0 +1,50 @@
+"""
+Tests for the shared HTTP transport used by the requests-based providers.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import ProviderConfig
+from src.providers import transport
+
+
+@pytest.fixture(autouse=True)
+def clean_sessions():
+    """Start every test with an empty session cache."""
+    transport.close_sessions()
+    yield
+    transport.close_sessions()
+
+
+def test_session_is_reused_per_host():
+    """Test that requests to the same host share one session."""
+    first = transport.get_session("https://api.openai.com/v1/chat/completions")
+    second = transport.get_session("https://api.openai.com/v1/other")
+    other_host = transport.get_session("https://api.anthropic.com/v1/messages")
+
+    assert first is second
+    assert first is not other_host
+
+
+def test_session_uses_provider_pool_settings():
+    """Test that the pool size comes from the provider config and retries are left to retry.py."""
+    provider_config = ProviderConfig(pool_size=3, max_retries=5)
+    session = transport.get_session("https://example.com/v1", provider_config)
+
+    adapter = session.get_adapter("https://example.com/v1")
+    assert adapter._pool_maxsize == 3
+    assert adapter.max_retries.total == 0
+
+
+def test_timeout_defaults_and_overrides():
+    """Test that connect and read timeouts are taken from the provider config."""
+    assert transport.get_timeout() == (transport.DEFAULT_CONNECT_TIMEOUT, None)
+
+    provider_config = ProviderConfig(timeout=30.0, connect_timeout=2.5)
+    assert transport.get_timeout(provider_config) == (2.5, 30.0)